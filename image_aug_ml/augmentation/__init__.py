@@ -1 +1,9 @@
 from .augment import augment_images
+from .chunk import IOConf
+from .loader import (
+    get_augment_name,
+    load_augment_op,
+    load_batch_augment_op,
+    load_tf_augment_op,
+)
+from .registry import register_op, resolve_op_path, resolve_tf_op_path
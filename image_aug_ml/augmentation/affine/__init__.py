@@ -1,4 +1,6 @@
+from .affine_transform import sampling_map_cache
+from .compose import compose
 from .flip import flip_horizontal, flip_vertical
-from .resize import resize
-from .rotate import rotate
-from .translate import translate
+from .resize import resize, resize_batch
+from .rotate import rotate, rotate_batch
+from .translate import translate, translate_batch
@@ -1,7 +1,349 @@
+from typing import Optional, Tuple
+
 import numpy as np
 
+from image_aug_ml.utils import BufferPool, get_buffer
+
+from .map_cache import SamplingMapCache
+
+
+INTERPOLATIONS = ("nearest", "bilinear")
+
+# tolerance within which a matrix entry is treated as an integer
+LATTICE_TOL = 1e-9
+
+# nearest-neighbour sampling maps of ops drawing snapped parameters
+sampling_map_cache = SamplingMapCache()
+
+
+def map_coords(
+    img_shape: Tuple[int, ...], transform_mat: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Maps every output pixel coordinate to its (fractional) source coordinate.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of the image being transformed, only the first two dims are used
+    transform_mat : np.ndarray
+        transformation matrix for affine transform, 3x3 matrix or (N, 3, 3) stack
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        source row and source column coordinate maps, each of shape img_shape[:2],
+        or (N, *img_shape[:2]) for a stack of matrices
+    """
+    # build output coordinate grid
+    rows, cols = np.ogrid[: img_shape[0], : img_shape[1]]
+
+    # map the whole grid through the matrix at once
+    mat = np.asarray(transform_mat, dtype=np.float64)[..., None, None]
+    src_rows = mat[..., 0, 0, :, :] * rows + mat[..., 0, 1, :, :] * cols
+    src_rows += mat[..., 0, 2, :, :]
+    src_cols = mat[..., 1, 0, :, :] * rows + mat[..., 1, 1, :, :] * cols
+    src_cols += mat[..., 1, 2, :, :]
+
+    return src_rows, src_cols
+
+
+def nearest_map(
+    img_shape: Tuple[int, ...], transform_mat: np.ndarray
+) -> Tuple[Tuple[np.ndarray, ...], np.ndarray]:
+    """Builds nearest-neighbour sampling map for the affine transform.
+
+    Source coordinates are rounded half to even, matching python's round().
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of the image being transformed
+    transform_mat : np.ndarray
+        transformation matrix for affine transform, 3x3 matrix or (N, 3, 3) stack
+
+    Returns
+    -------
+    Tuple[Tuple[np.ndarray, ...], np.ndarray]
+        source index arrays of valid pixels (image index, row, column for a stack of
+        matrices, otherwise row, column), and boolean mask of output pixels that map
+        inside the source image
+    """
+    # round source coordinates to nearest pixel
+    src_rows, src_cols = map(np.rint, map_coords(img_shape, transform_mat))
+
+    # find output pixels that land inside the source image
+    valid = (0 <= src_rows) & (src_rows < img_shape[0])
+    valid &= (0 <= src_cols) & (src_cols < img_shape[1])
+
+    # index stacked images by their position in the stack
+    batch_idx = np.nonzero(valid)[:-2]
+
+    src_idx = (
+        *batch_idx,
+        *(src[valid].astype(np.intp) for src in (src_rows, src_cols)),
+    )
+
+    return src_idx, valid
+
 
-def affine_transform(orig_img: np.ndarray, transform_mat: np.ndarray) -> np.ndarray:
+def axis_slices(
+    out_size: int, src_size: int, step: int, offset: int
+) -> Tuple[slice, slice]:
+    """Finds matching output, source slices along one axis of a lattice transform.
+
+    Output index i maps to source index step * i + offset, for step of 1 or -1.
+
+    Parameters
+    ----------
+    out_size : int
+        size of output axis
+    src_size : int
+        size of source axis
+    step : int
+        source step per output index, either 1 or -1
+    offset : int
+        source index of output index 0
+
+    Returns
+    -------
+    Tuple[slice, slice]
+        output slice and source slice covering all output indices that map inside
+        the source axis
+    """
+    # find range of output indices that land inside the source
+    if step == 1:
+        out_start, out_stop = max(0, -offset), min(out_size, src_size - offset)
+    else:
+        out_start, out_stop = max(0, offset - src_size + 1), min(out_size, offset + 1)
+
+    # no overlap between output and source
+    if out_start >= out_stop:
+        return slice(0, 0), slice(0, 0)
+
+    # find source slice walking in step direction
+    src_start, src_stop = step * out_start + offset, step * out_stop + offset
+    return (
+        slice(out_start, out_stop),
+        slice(src_start, src_stop if src_stop >= 0 else None, step),
+    )
+
+
+def lattice_slices(
+    img_shape: Tuple[int, ...], transform_mat: np.ndarray
+) -> Optional[Tuple[bool, Tuple[slice, slice], Tuple[slice, slice]]]:
+    """Detects matrices that only permute pixels on the integer lattice.
+
+    These are flips, 90/180/270 degree rotations and integer translations, whose
+    result is a strided view of the source copied into a zero-filled output.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of the image being transformed
+    transform_mat : np.ndarray
+        transformation matrix for affine transform, 3x3 matrix
+
+    Returns
+    -------
+    Optional[Tuple[bool, Tuple[slice, slice], Tuple[slice, slice]]]
+        whether source rows and columns are swapped, output slices and source
+        slices, or None if the matrix is not a lattice permutation
+    """
+    # check that matrix entries are integers
+    transform_mat = np.asarray(transform_mat, dtype=np.float64)
+    int_mat = np.rint(transform_mat)
+    if not np.allclose(transform_mat, int_mat, rtol=0, atol=LATTICE_TOL):
+        return None
+    int_mat = int_mat.astype(int)
+
+    # check that matrix is a signed permutation plus translation
+    if not (int_mat[2] == [0, 0, 1]).all():
+        return None
+    (row_row, row_col, row_offset), (col_row, col_col, col_offset) = int_mat[:2]
+    transpose = row_row == 0
+    if transpose:
+        # output rows walk source columns, output columns walk source rows
+        off_diag = (row_row, col_col)
+        steps, offsets = (col_row, row_col), (col_offset, row_offset)
+        src_shape = img_shape[1::-1]
+    else:
+        off_diag = (row_col, col_row)
+        steps, offsets = (row_row, col_col), (row_offset, col_offset)
+        src_shape = img_shape[:2]
+    if any(off_diag) or not all(abs(step) == 1 for step in steps):
+        return None
+
+    # find output, source slices along each axis
+    out_slices, src_slices = zip(
+        *map(axis_slices, img_shape[:2], src_shape, steps, offsets)
+    )
+
+    return transpose, out_slices, src_slices
+
+
+def zero_output(orig_img: np.ndarray, out: Optional[np.ndarray]) -> np.ndarray:
+    """Zero fills output array of a transform, allocating it if not provided.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image being transformed
+    out : Optional[np.ndarray]
+        array to write transformed image to, or None to allocate one
+
+    Returns
+    -------
+    np.ndarray
+        zero-filled output array, shaped like the original image
+    """
+    if out is None:
+        return np.zeros_like(orig_img)
+
+    assert out.shape == orig_img.shape, "Output must match shape of original image"
+    out.fill(0)
+    return out
+
+
+def sample_lattice(
+    orig_img: np.ndarray,
+    lattice: Tuple[bool, Tuple[slice, slice], Tuple[slice, slice]],
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Copies a strided view of the source into a zero-filled output image.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to sample from
+    lattice : Tuple[bool, Tuple[slice, slice], Tuple[slice, slice]]
+        transpose flag, output slices and source slices, as built by lattice_slices
+    out : Optional[np.ndarray], optional
+        array to write sampled image to, by default a new array
+
+    Returns
+    -------
+    np.ndarray
+        sampled image, zero where the lattice falls outside the source image
+    """
+    transpose, out_slices, src_slices = lattice
+
+    # view source with rows and columns swapped if required
+    src_img = orig_img.swapaxes(0, 1) if transpose else orig_img
+
+    # zero fill, then copy strided source view
+    transformed_img = zero_output(orig_img, out)
+    transformed_img[out_slices] = src_img[src_slices]
+
+    return transformed_img
+
+
+def sample_nearest(
+    orig_img: np.ndarray,
+    sampling_map: Tuple[Tuple[np.ndarray, ...], np.ndarray],
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Gathers source pixels in bulk using a nearest-neighbour sampling map.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image (or stack of images) to sample from
+    sampling_map : Tuple[Tuple[np.ndarray, ...], np.ndarray]
+        source index arrays and validity mask, as built by nearest_map
+    out : Optional[np.ndarray], optional
+        array to write sampled image to, by default a new array
+
+    Returns
+    -------
+    np.ndarray
+        sampled image, zero where the map falls outside the source image
+    """
+    src_idx, valid = sampling_map
+
+    # zero fill, then gather valid pixels
+    transformed_img = zero_output(orig_img, out)
+    transformed_img[valid] = orig_img[src_idx]
+
+    return transformed_img
+
+
+def sample_bilinear(
+    orig_img: np.ndarray,
+    src_rows: np.ndarray,
+    src_cols: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Bilinearly samples image at fractional source coordinates.
+
+    Neighbours that fall outside the source image contribute zero.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to sample from, (H, W, C) image or (N, H, W, C) stack
+        when the coordinate maps are stacked
+    src_rows : np.ndarray
+        fractional source row coordinates
+    src_cols : np.ndarray
+        fractional source column coordinates
+    out : Optional[np.ndarray], optional
+        array to write sampled image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take the accumulation buffer from, by default a new buffer
+
+    Returns
+    -------
+    np.ndarray
+        sampled image, same dtype as the original image
+    """
+    height, width = src_rows.shape[-2:]
+
+    # index stacked images by their position in the stack
+    batch_idx = tuple(np.ogrid[tuple(slice(dim) for dim in src_rows.shape[:-2])])
+    batch_idx = tuple(idx[..., None, None] for idx in batch_idx)
+
+    # find top left neighbour and fractional offsets
+    row_0, col_0 = np.floor(src_rows), np.floor(src_cols)
+    frac_rows, frac_cols = src_rows - row_0, src_cols - col_0
+    row_0, col_0 = row_0.astype(np.intp), col_0.astype(np.intp)
+
+    # broadcast weights over channels
+    if orig_img.ndim > src_rows.ndim:
+        frac_rows, frac_cols = frac_rows[..., None], frac_cols[..., None]
+
+    # accumulate weighted contribution of each of the four neighbours
+    sampled_img = get_buffer(workspace, "bilinear", orig_img.shape, np.float64)
+    sampled_img.fill(0)
+    for d_row, d_col in np.ndindex(2, 2):
+        rows, cols = row_0 + d_row, col_0 + d_col
+        valid = (0 <= rows) & (rows < height) & (0 <= cols) & (cols < width)
+        weights = (frac_rows if d_row else 1 - frac_rows) * (
+            frac_cols if d_col else 1 - frac_cols
+        )
+        neighbours = orig_img[(*batch_idx, rows * valid, cols * valid)]
+        sampled_img[valid] += (weights * neighbours)[valid]
+
+    # round back to integer types
+    if np.issubdtype(orig_img.dtype, np.integer):
+        info = np.iinfo(orig_img.dtype)
+        np.rint(sampled_img, out=sampled_img)
+        np.clip(sampled_img, info.min, info.max, out=sampled_img)
+
+    if out is None:
+        return sampled_img.astype(orig_img.dtype)
+    np.copyto(out, sampled_img, casting="unsafe")
+    return out
+
+
+def affine_transform(
+    orig_img: np.ndarray,
+    transform_mat: np.ndarray,
+    interpolation: str = "nearest",
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+    map_cache: Optional[SamplingMapCache] = None,
+) -> np.ndarray:
     """Performs affine transformation on image and returns result.
 
     Parameters
@@ -10,21 +352,112 @@ def affine_transform(orig_img: np.ndarray, transform_mat: np.ndarray) -> np.ndar
         original image to transform
     transform_mat : np.ndarray
         transformation matrix for affine transform, 3x3 matrix
+    interpolation : str, optional
+        sampling method, one of "nearest" or "bilinear", by default "nearest"
+    out : Optional[np.ndarray], optional
+        array to write transformed image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+    map_cache : Optional[SamplingMapCache], optional
+        cache of nearest-neighbour sampling maps, only worth passing if the same
+        matrix is used again, by default None (map built for this call)
 
     Returns
     -------
     np.ndarray
         affine transformed image
     """
-    # init transformed image
-    transformed_img = np.zeros_like(orig_img)
+    assert interpolation in INTERPOLATIONS, f"Unknown interpolation: {interpolation}"
+
+    # serve pure pixel permutations with slice copies, identical for any interpolation
+    lattice = lattice_slices(orig_img.shape, transform_mat)
+    if lattice is not None:
+        return sample_lattice(orig_img, lattice, out)
 
     # map each pixel in the output to a pixel in the input
-    for ii, jj in np.ndindex(orig_img.shape[:2]):
-        x, y, _ = transform_mat @ np.array([ii, jj, 1])
+    if interpolation == "nearest":
+        if map_cache is None:
+            sampling_map = nearest_map(orig_img.shape, transform_mat)
+        else:
+            sampling_map = map_cache.get_map(
+                orig_img.shape, transform_mat, nearest_map
+            )
+        return sample_nearest(orig_img, sampling_map, out)
 
-        if 0 < round(x) < orig_img.shape[0] and 0 < round(y) < orig_img.shape[1]:
-            transformed_img[ii][jj] = orig_img[round(x)][round(y)]
+    return sample_bilinear(
+        orig_img, *map_coords(orig_img.shape, transform_mat), out, workspace
+    )
 
-    # return transformed image
-    return transformed_img
+
+def affine_transform_batch(
+    orig_imgs: np.ndarray,
+    transform_mats: np.ndarray,
+    interpolation: str = "nearest",
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+    map_cache: Optional[SamplingMapCache] = None,
+) -> np.ndarray:
+    """Performs a per-image affine transformation on a stack of same-shape images.
+
+    Parameters
+    ----------
+    orig_imgs : np.ndarray
+        stack of original images to transform, (N, H, W) or (N, H, W, C) array
+    transform_mats : np.ndarray
+        transformation matrix for each image, (N, 3, 3) array
+    interpolation : str, optional
+        sampling method, one of "nearest" or "bilinear", by default "nearest"
+    out : Optional[np.ndarray], optional
+        array to write stack of transformed images to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+    map_cache : Optional[SamplingMapCache], optional
+        cache of nearest-neighbour sampling maps, looked up for each image in turn
+        instead of mapping the whole stack at once, only worth passing if the same
+        matrices are used again, by default None (maps built for this call)
+
+    Returns
+    -------
+    np.ndarray
+        stack of affine transformed images
+    """
+    assert interpolation in INTERPOLATIONS, f"Unknown interpolation: {interpolation}"
+    assert transform_mats.shape == (
+        len(orig_imgs),
+        3,
+        3,
+    ), "Must provide one 3x3 transformation matrix per image"
+
+    # serve stacks of pure pixel permutations with slice copies
+    lattices = [
+        lattice_slices(orig_imgs.shape[1:], transform_mat)
+        for transform_mat in transform_mats
+    ]
+    if all(lattice is not None for lattice in lattices):
+        transformed_imgs = np.empty_like(orig_imgs) if out is None else out
+        for orig_img, lattice, transformed_img in zip(
+            orig_imgs, lattices, transformed_imgs
+        ):
+            sample_lattice(orig_img, lattice, transformed_img)
+        return transformed_imgs
+
+    # transform each image with its cached map
+    if interpolation == "nearest" and map_cache is not None:
+        transformed_imgs = np.empty_like(orig_imgs) if out is None else out
+        for orig_img, transform_mat, transformed_img in zip(
+            orig_imgs, transform_mats, transformed_imgs
+        ):
+            affine_transform(
+                orig_img, transform_mat, out=transformed_img, map_cache=map_cache
+            )
+        return transformed_imgs
+
+    # map each pixel in every output to a pixel in its input
+    if interpolation == "nearest":
+        return sample_nearest(
+            orig_imgs, nearest_map(orig_imgs.shape[1:], transform_mats), out
+        )
+
+    return sample_bilinear(
+        orig_imgs, *map_coords(orig_imgs.shape[1:], transform_mats), out, workspace
+    )
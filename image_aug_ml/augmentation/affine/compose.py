@@ -0,0 +1,117 @@
+from functools import reduce
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from image_aug_ml.utils import BufferPool
+
+from .affine_transform import affine_transform, sampling_map_cache
+from .flip import flip_horizontal_mat, flip_vertical_mat
+from .resize import resize_mat
+from .rotate import rotate_mat
+from .translate import translate_mat
+
+
+AFFINE_MATS: Dict[str, Callable[..., np.ndarray]] = {
+    "resize": resize_mat,
+    "rotate": rotate_mat,
+    "translate": translate_mat,
+    "flip_vertical": flip_vertical_mat,
+    "flip_horizontal": flip_horizontal_mat,
+}
+
+# matrix builder arguments snapping the parameters each random op draws
+QUANTUM_ARGS = {
+    "resize": "scale_quantum",
+    "rotate": "theta_quantum",
+    "translate": "shift_quantum",
+}
+
+
+def compose_mat(
+    img_shape: tuple,
+    ops: Sequence[str],
+    op_kwargs: Optional[Dict[str, Dict]] = None,
+) -> np.ndarray:
+    """Samples the matrix of each affine op and composes them into a single matrix.
+
+    Each matrix maps output coordinates to input coordinates, so applying ops
+    A then B is equivalent to the single matrix A @ B.
+
+    Parameters
+    ----------
+    img_shape : tuple
+        shape of image to transform
+    ops : Sequence[str]
+        names of affine ops to chain, in the order they are applied
+    op_kwargs : Optional[Dict[str, Dict]], optional
+        keyword arguments for each op's matrix builder, keyed by op name, by default none
+
+    Returns
+    -------
+    np.ndarray
+        composed transformation matrix, 3x3 matrix
+    """
+    op_kwargs = op_kwargs or {}
+
+    # sample each op's matrix and multiply together
+    return reduce(
+        np.matmul,
+        [AFFINE_MATS[op](img_shape, **op_kwargs.get(op, {})) for op in ops],
+        np.eye(3),
+    )
+
+
+def compose(
+    orig_img: np.ndarray,
+    ops: Sequence[str] = ("resize", "rotate", "translate"),
+    op_kwargs: Optional[Dict[str, Dict]] = None,
+    interpolation: str = "nearest",
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Applies a chain of affine ops to an image with a single resample.
+
+    If every random op in the chain snaps its parameters, composed matrices repeat,
+    so their sampling maps are cached.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to transform
+    ops : Sequence[str], optional
+        names of affine ops to chain, in the order they are applied,
+        by default ("resize", "rotate", "translate")
+    op_kwargs : Optional[Dict[str, Dict]], optional
+        keyword arguments for each op's matrix builder, keyed by op name, by default none
+    interpolation : str, optional
+        sampling method, one of "nearest" or "bilinear", by default "nearest"
+    out : Optional[np.ndarray], optional
+        array to write transformed image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        transformed image
+    """
+    assert all(op in AFFINE_MATS for op in ops), f"Unknown affine op in {ops}"
+
+    # reuse sampling maps if every drawn parameter is snapped
+    op_kwargs = op_kwargs or {}
+    snapped = all(
+        op_kwargs.get(op, {}).get(QUANTUM_ARGS[op]) is not None
+        for op in ops
+        if op in QUANTUM_ARGS
+    )
+
+    # compose matrices, then transform and return image
+    return affine_transform(
+        orig_img,
+        compose_mat(orig_img.shape, ops, op_kwargs),
+        interpolation=interpolation,
+        out=out,
+        workspace=workspace,
+        map_cache=sampling_map_cache if snapped else None,
+    )
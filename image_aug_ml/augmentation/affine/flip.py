@@ -1,49 +1,101 @@
+from typing import Optional, Tuple
+
 import numpy as np
 
+from image_aug_ml.utils import BufferPool
+
 from .affine_transform import affine_transform
 
 
-def flip_vertical(orig_img: np.ndarray) -> np.ndarray:
-    """Flips an image vertically.
+def flip_vertical_mat(img_shape: Tuple[int, ...]) -> np.ndarray:
+    """Builds vertical flip matrix for an image of the given shape.
 
     Parameters
     ----------
-    orig_img : np.ndarray
-        original image to flip vertically
+    img_shape : Tuple[int, ...]
+        shape of image to flip vertically
 
     Returns
     -------
     np.ndarray
-        vertically flipped image
+        vertical flip matrix, 3x3 matrix
     """
     # find height
-    img_height = orig_img.shape[0]
+    img_height = img_shape[0]
 
     # build vertical flip matrix
-    vert_flip_mat = np.array([[-1, 0, img_height - 1], [0, 1, 0], [0, 0, 1]])
+    return np.array([[-1, 0, img_height - 1], [0, 1, 0], [0, 0, 1]])
+
+
+def flip_horizontal_mat(img_shape: Tuple[int, ...]) -> np.ndarray:
+    """Builds horizontal flip matrix for an image of the given shape.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of image to flip horizontally
+
+    Returns
+    -------
+    np.ndarray
+        horizontal flip matrix, 3x3 matrix
+    """
+    # find width
+    img_width = img_shape[1]
+
+    # build horizontal flip matrix
+    return np.array([[1, 0, 0], [0, -1, img_width - 1], [0, 0, 1]])
+
+
+def flip_vertical(
+    orig_img: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Flips an image vertically.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to flip vertically
+    out : Optional[np.ndarray], optional
+        array to write vertically flipped image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
 
+    Returns
+    -------
+    np.ndarray
+        vertically flipped image
+    """
     # flip vertically and return image
-    return affine_transform(orig_img, vert_flip_mat)
+    return affine_transform(
+        orig_img, flip_vertical_mat(orig_img.shape), out=out, workspace=workspace
+    )
 
 
-def flip_horizontal(orig_img: np.ndarray) -> np.ndarray:
+def flip_horizontal(
+    orig_img: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
     """Flips an image horizontally.
 
     Parameters
     ----------
     orig_img : np.ndarray
         original image to flip horizontally
+    out : Optional[np.ndarray], optional
+        array to write horizontally flipped image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
 
     Returns
     -------
     np.ndarray
         horizontally flipped image
     """
-    # find width
-    img_width = orig_img.shape[1]
-
-    # build horizontal flip matrix
-    horiz_flip_mat = np.array([[1, 0, 0], [0, -1, img_width - 1], [0, 0, 1]])
-
     # flip horizontally and return image
-    return affine_transform(orig_img, horiz_flip_mat)
+    return affine_transform(
+        orig_img, flip_horizontal_mat(orig_img.shape), out=out, workspace=workspace
+    )
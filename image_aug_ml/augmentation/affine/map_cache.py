@@ -0,0 +1,98 @@
+from typing import Callable, Hashable, Optional, Tuple, Union
+
+import numpy as np
+
+from image_aug_ml.utils import LRUCache
+
+
+SamplingMap = Tuple[Tuple[np.ndarray, ...], np.ndarray]
+
+
+def snap(
+    value: Union[float, np.ndarray], quantum: Optional[float] = None
+) -> Union[float, np.ndarray]:
+    """Snaps drawn transform parameters to a grid, so that the matrices built from
+    them repeat and their sampling maps can be cached.
+
+    Parameters
+    ----------
+    value : Union[float, np.ndarray]
+        drawn parameter, or one per image
+    quantum : Optional[float], optional
+        grid to snap to, by default None (no snapping)
+
+    Returns
+    -------
+    Union[float, np.ndarray]
+        snapped parameter
+    """
+    if quantum is None:
+        return value
+    return np.round(np.asarray(value) / quantum) * quantum
+
+
+class SamplingMapCache(LRUCache):
+    """Bounded, memory-capped LRU cache of sampling maps, keyed by image shape and
+    exact transformation matrix.
+
+    Only worth passing to transforms whose matrices repeat, such as fixed or snapped
+    parameters; maps of randomly drawn matrices are never reused.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 2 ** 20):
+        """Creates empty cache.
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            maximum number of maps to hold, by default 64
+        max_bytes : int, optional
+            maximum total size of held maps in bytes, by default 256 MiB
+        """
+        super().__init__(max_entries, max_bytes)
+
+    def key(self, img_shape: Tuple[int, ...], transform_mat: np.ndarray) -> Hashable:
+        """Builds cache key from image shape and the exact bytes of the matrix, so
+        that a hit always returns the map nearest_map would build.
+
+        Parameters
+        ----------
+        img_shape : Tuple[int, ...]
+            shape of the image being transformed
+        transform_mat : np.ndarray
+            transformation matrix for affine transform, 3x3 matrix
+
+        Returns
+        -------
+        Hashable
+            cache key
+        """
+        exact_mat = np.ascontiguousarray(transform_mat, dtype=np.float64)
+        return tuple(img_shape[:2]), exact_mat.tobytes()
+
+    def get_map(
+        self,
+        img_shape: Tuple[int, ...],
+        transform_mat: np.ndarray,
+        build_map: Callable[[Tuple[int, ...], np.ndarray], SamplingMap],
+    ) -> SamplingMap:
+        """Returns cached sampling map, building and caching it on a miss.
+
+        Parameters
+        ----------
+        img_shape : Tuple[int, ...]
+            shape of the image being transformed
+        transform_mat : np.ndarray
+            transformation matrix for affine transform, 3x3 matrix
+        build_map : Callable[[Tuple[int, ...], np.ndarray], SamplingMap]
+            function building the sampling map from image shape and matrix
+
+        Returns
+        -------
+        SamplingMap
+            sampling map for image shape and matrix
+        """
+        return self.get_or_build(
+            self.key(img_shape, transform_mat),
+            lambda: build_map(img_shape, transform_mat),
+        )
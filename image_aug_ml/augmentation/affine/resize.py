@@ -1,37 +1,48 @@
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 
-from .affine_transform import affine_transform
+from image_aug_ml.utils import BufferPool, get_rng
 
+from .affine_transform import (
+    affine_transform,
+    affine_transform_batch,
+    sampling_map_cache,
+)
+from .map_cache import snap
 
-def resize(
-    orig_img: np.ndarray,
+
+def resize_mat(
+    img_shape: Tuple[int, ...],
     scale_x_range: Tuple[float, float] = (0.5, 2),
     scale_y_range: Tuple[float, float] = (0.5, 2),
+    scale_quantum: Optional[float] = None,
 ) -> np.ndarray:
-    """Resizes an image by scale in provided scale range.
+    """Builds resize matrix with scale sampled from provided scale range.
 
     Parameters
     ----------
-    orig_img : np.ndarray
-        original image to resize
+    img_shape : Tuple[int, ...]
+        shape of image to resize
     scale_x_range : Tuple[float, float], optional
         range of x scale factors, by default (0.5, 2)
     scale_y_range : Tuple[float, float], optional
         range of y scale factors, by default (0.5, 2)
+    scale_quantum : Optional[float], optional
+        grid to snap scale factors to, so that repeated scales reuse cached sampling
+        maps, by default no snapping
 
     Returns
     -------
     np.ndarray
-        resized image
+        resize matrix, 3x3 matrix
     """
     # find scale factors
-    scale_x = np.random.uniform(*scale_x_range)
-    scale_y = np.random.uniform(*scale_y_range)
+    scale_x = snap(get_rng().uniform(*scale_x_range), scale_quantum)
+    scale_y = snap(get_rng().uniform(*scale_y_range), scale_quantum)
 
     # build resize matrix
-    resize_mat = np.array(
+    return np.array(
         [
             [scale_x, 0, 0],
             [0, scale_y, 0],
@@ -39,5 +50,130 @@ def resize(
         ]
     )
 
+
+def resize_mats(
+    img_shape: Tuple[int, ...],
+    num_imgs: int,
+    scale_x_range: Tuple[float, float] = (0.5, 2),
+    scale_y_range: Tuple[float, float] = (0.5, 2),
+    scale_quantum: Optional[float] = None,
+) -> np.ndarray:
+    """Builds stack of resize matrices, drawing all scales up front.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of each image to resize
+    num_imgs : int
+        number of matrices to build
+    scale_x_range : Tuple[float, float], optional
+        range of x scale factors, by default (0.5, 2)
+    scale_y_range : Tuple[float, float], optional
+        range of y scale factors, by default (0.5, 2)
+    scale_quantum : Optional[float], optional
+        grid to snap scale factors to, so that repeated scales reuse cached sampling
+        maps, by default no snapping
+
+    Returns
+    -------
+    np.ndarray
+        stack of resize matrices, (num_imgs, 3, 3) array
+    """
+    # find scale factors
+    scale_x = snap(get_rng().uniform(*scale_x_range, size=num_imgs), scale_quantum)
+    scale_y = snap(get_rng().uniform(*scale_y_range, size=num_imgs), scale_quantum)
+
+    # build resize matrices
+    resize_mat_stack = np.tile(np.eye(3), (num_imgs, 1, 1))
+    resize_mat_stack[:, 0, 0] = scale_x
+    resize_mat_stack[:, 1, 1] = scale_y
+
+    return resize_mat_stack
+
+
+def resize(
+    orig_img: np.ndarray,
+    scale_x_range: Tuple[float, float] = (0.5, 2),
+    scale_y_range: Tuple[float, float] = (0.5, 2),
+    scale_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Resizes an image by scale in provided scale range.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to resize
+    scale_x_range : Tuple[float, float], optional
+        range of x scale factors, by default (0.5, 2)
+    scale_y_range : Tuple[float, float], optional
+        range of y scale factors, by default (0.5, 2)
+    scale_quantum : Optional[float], optional
+        grid to snap scale factors to, so that repeated scales reuse cached sampling
+        maps, by default no snapping
+    out : Optional[np.ndarray], optional
+        array to write resized image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        resized image
+    """
     # resize and return image
-    return affine_transform(orig_img, resize_mat)
+    return affine_transform(
+        orig_img,
+        resize_mat(orig_img.shape, scale_x_range, scale_y_range, scale_quantum),
+        out=out,
+        workspace=workspace,
+        map_cache=None if scale_quantum is None else sampling_map_cache,
+    )
+
+
+def resize_batch(
+    orig_imgs: np.ndarray,
+    scale_x_range: Tuple[float, float] = (0.5, 2),
+    scale_y_range: Tuple[float, float] = (0.5, 2),
+    scale_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Resizes each image in a stack by its own scale in provided scale range.
+
+    Parameters
+    ----------
+    orig_imgs : np.ndarray
+        stack of original images to resize, (N, H, W, C) array
+    scale_x_range : Tuple[float, float], optional
+        range of x scale factors, by default (0.5, 2)
+    scale_y_range : Tuple[float, float], optional
+        range of y scale factors, by default (0.5, 2)
+    scale_quantum : Optional[float], optional
+        grid to snap scale factors to, so that repeated scales reuse cached sampling
+        maps, by default no snapping
+    out : Optional[np.ndarray], optional
+        array to write stack of resized images to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        stack of resized images
+    """
+    # resize and return images
+    return affine_transform_batch(
+        orig_imgs,
+        resize_mats(
+            orig_imgs.shape[1:],
+            len(orig_imgs),
+            scale_x_range,
+            scale_y_range,
+            scale_quantum,
+        ),
+        out=out,
+        workspace=workspace,
+        map_cache=None if scale_quantum is None else sampling_map_cache,
+    )
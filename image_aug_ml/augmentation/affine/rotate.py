@@ -1,30 +1,46 @@
+from typing import Optional, Tuple
+
 import numpy as np
 
-from .affine_transform import affine_transform
+from image_aug_ml.utils import BufferPool, get_rng
 
+from .affine_transform import (
+    affine_transform,
+    affine_transform_batch,
+    sampling_map_cache,
+)
+from .map_cache import snap
 
-def rotate(orig_img: np.ndarray, max_theta: float = 360) -> np.ndarray:
-    """Rotates an image by up to max_theta.
+
+def rotate_mat(
+    img_shape: Tuple[int, ...],
+    max_theta: float = 360,
+    theta_quantum: Optional[float] = None,
+) -> np.ndarray:
+    """Builds rotation matrix about the image center, rotating by up to max_theta.
 
     Parameters
     ----------
-    orig_img : np.ndarray
-        original image to rotate
+    img_shape : Tuple[int, ...]
+        shape of image to rotate
     max_theta : float, optional
         maximum positive rotation (in degrees), by default 360
+    theta_quantum : Optional[float], optional
+        grid (in degrees) to snap rotations to, so that repeated rotations reuse
+        cached sampling maps, by default no snapping
 
     Returns
     -------
     np.ndarray
-        rotated image array
+        rotation matrix, 3x3 matrix
     """
     # find rotation (in radians)
-    theta = np.random.uniform(0, max_theta) * np.pi / 180.0
+    theta = snap(get_rng().uniform(0, max_theta), theta_quantum) * np.pi / 180.0
 
     # build rotation matrix
-    c_x, c_y = map(lambda x: x / 2, orig_img.shape[:2])
+    c_x, c_y = map(lambda x: x / 2, img_shape[:2])
     cos_theta, sin_theta = np.cos(theta), np.sin(theta)
-    rotate_mat = np.array(
+    return np.array(
         [
             [cos_theta, sin_theta, (1 - cos_theta) * c_x - (sin_theta * c_y)],
             [-sin_theta, cos_theta, (sin_theta * c_x) + (1 - cos_theta) * c_y],
@@ -32,5 +48,122 @@ def rotate(orig_img: np.ndarray, max_theta: float = 360) -> np.ndarray:
         ]
     )
 
+
+def rotate_mats(
+    img_shape: Tuple[int, ...],
+    num_imgs: int,
+    max_theta: float = 360,
+    theta_quantum: Optional[float] = None,
+) -> np.ndarray:
+    """Builds stack of rotation matrices about the image center, drawing all angles
+    up front.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of each image to rotate
+    num_imgs : int
+        number of matrices to build
+    max_theta : float, optional
+        maximum positive rotation (in degrees), by default 360
+    theta_quantum : Optional[float], optional
+        grid (in degrees) to snap rotations to, so that repeated rotations reuse
+        cached sampling maps, by default no snapping
+
+    Returns
+    -------
+    np.ndarray
+        stack of rotation matrices, (num_imgs, 3, 3) array
+    """
+    # find rotations (in radians)
+    theta = get_rng().uniform(0, max_theta, size=num_imgs)
+    theta = snap(theta, theta_quantum) * np.pi / 180.0
+
+    # build rotation matrices
+    c_x, c_y = map(lambda x: x / 2, img_shape[:2])
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    rotate_mat_stack = np.tile(np.eye(3), (num_imgs, 1, 1))
+    rotate_mat_stack[:, 0, :] = np.stack(
+        [cos_theta, sin_theta, (1 - cos_theta) * c_x - (sin_theta * c_y)], axis=-1
+    )
+    rotate_mat_stack[:, 1, :] = np.stack(
+        [-sin_theta, cos_theta, (sin_theta * c_x) + (1 - cos_theta) * c_y], axis=-1
+    )
+
+    return rotate_mat_stack
+
+
+def rotate(
+    orig_img: np.ndarray,
+    max_theta: float = 360,
+    theta_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Rotates an image by up to max_theta.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to rotate
+    max_theta : float, optional
+        maximum positive rotation (in degrees), by default 360
+    theta_quantum : Optional[float], optional
+        grid (in degrees) to snap rotations to, so that repeated rotations reuse
+        cached sampling maps, by default no snapping
+    out : Optional[np.ndarray], optional
+        array to write rotated image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        rotated image array
+    """
     # rotate and return image
-    return affine_transform(orig_img, rotate_mat)
+    return affine_transform(
+        orig_img,
+        rotate_mat(orig_img.shape, max_theta, theta_quantum),
+        out=out,
+        workspace=workspace,
+        map_cache=None if theta_quantum is None else sampling_map_cache,
+    )
+
+
+def rotate_batch(
+    orig_imgs: np.ndarray,
+    max_theta: float = 360,
+    theta_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Rotates each image in a stack by its own angle of up to max_theta.
+
+    Parameters
+    ----------
+    orig_imgs : np.ndarray
+        stack of original images to rotate, (N, H, W, C) array
+    max_theta : float, optional
+        maximum positive rotation (in degrees), by default 360
+    theta_quantum : Optional[float], optional
+        grid (in degrees) to snap rotations to, so that repeated rotations reuse
+        cached sampling maps, by default no snapping
+    out : Optional[np.ndarray], optional
+        array to write stack of rotated images to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        stack of rotated images
+    """
+    # rotate and return images
+    return affine_transform_batch(
+        orig_imgs,
+        rotate_mats(orig_imgs.shape[1:], len(orig_imgs), max_theta, theta_quantum),
+        out=out,
+        workspace=workspace,
+        map_cache=None if theta_quantum is None else sampling_map_cache,
+    )
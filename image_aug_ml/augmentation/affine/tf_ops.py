@@ -0,0 +1,427 @@
+from functools import reduce
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import math
+
+import tensorflow as tf
+
+from .affine_transform import INTERPOLATIONS
+
+
+def mat_stack(
+    row_0: Sequence[tf.Tensor], row_1: Sequence[tf.Tensor], num_imgs: tf.Tensor
+) -> tf.Tensor:
+    """Builds stack of affine matrices from the entries of their first two rows.
+
+    Parameters
+    ----------
+    row_0 : Sequence[tf.Tensor]
+        three entries of first row, each a scalar or (num_imgs,) tensor
+    row_1 : Sequence[tf.Tensor]
+        three entries of second row, each a scalar or (num_imgs,) tensor
+    num_imgs : tf.Tensor
+        number of matrices to build
+
+    Returns
+    -------
+    tf.Tensor
+        stack of affine matrices, (num_imgs, 3, 3) float32 tensor
+    """
+
+    def stack_row(row: Sequence[tf.Tensor]) -> tf.Tensor:
+        return tf.stack(
+            [tf.broadcast_to(tf.cast(entry, tf.float32), [num_imgs]) for entry in row],
+            axis=-1,
+        )
+
+    return tf.stack([stack_row(row_0), stack_row(row_1), stack_row((0, 0, 1))], axis=1)
+
+
+def spatial_dims(orig_imgs: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Finds height and width of a stack of images.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images, (B, H, W, C) tensor
+
+    Returns
+    -------
+    Tuple[tf.Tensor, tf.Tensor]
+        height and width, as float32 scalars
+    """
+    img_shape = tf.shape(orig_imgs)
+    return tf.cast(img_shape[1], tf.float32), tf.cast(img_shape[2], tf.float32)
+
+
+def resize_mats(
+    orig_imgs: tf.Tensor,
+    scale_x_range: Tuple[float, float] = (0.5, 2),
+    scale_y_range: Tuple[float, float] = (0.5, 2),
+) -> tf.Tensor:
+    """Builds resize matrix of each image in a stack, like resize.resize_mats.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to resize, (B, H, W, C) tensor
+    scale_x_range : Tuple[float, float], optional
+        range of x scale factors, by default (0.5, 2)
+    scale_y_range : Tuple[float, float], optional
+        range of y scale factors, by default (0.5, 2)
+
+    Returns
+    -------
+    tf.Tensor
+        stack of resize matrices, (B, 3, 3) tensor
+    """
+    num_imgs = tf.shape(orig_imgs)[0]
+
+    # find scale factors
+    scale_x = tf.random.uniform([num_imgs], *scale_x_range)
+    scale_y = tf.random.uniform([num_imgs], *scale_y_range)
+
+    # build resize matrices
+    return mat_stack((scale_x, 0, 0), (0, scale_y, 0), num_imgs)
+
+
+def rotate_mats(orig_imgs: tf.Tensor, max_theta: float = 360) -> tf.Tensor:
+    """Builds rotation matrix of each image in a stack, like rotate.rotate_mats.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to rotate, (B, H, W, C) tensor
+    max_theta : float, optional
+        maximum positive rotation (in degrees), by default 360
+
+    Returns
+    -------
+    tf.Tensor
+        stack of rotation matrices, (B, 3, 3) tensor
+    """
+    num_imgs = tf.shape(orig_imgs)[0]
+
+    # find rotations (in radians)
+    theta = tf.random.uniform([num_imgs], 0, max_theta) * math.pi / 180.0
+
+    # build rotation matrices
+    c_x, c_y = map(lambda x: x / 2, spatial_dims(orig_imgs))
+    cos_theta, sin_theta = tf.cos(theta), tf.sin(theta)
+    return mat_stack(
+        (cos_theta, sin_theta, (1 - cos_theta) * c_x - (sin_theta * c_y)),
+        (-sin_theta, cos_theta, (sin_theta * c_x) + (1 - cos_theta) * c_y),
+        num_imgs,
+    )
+
+
+def translate_mats(
+    orig_imgs: tf.Tensor, max_tx: float = 0.3, max_ty: float = 0.3
+) -> tf.Tensor:
+    """Builds translation matrix of each image in a stack, like
+    translate.translate_mats.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to translate, (B, H, W, C) tensor
+    max_tx : float, optional
+        maximum horizontal distance to translate image (proportion of pixels), by default 0.3
+    max_ty : float, optional
+        maximum vertical distance to translate image (proportion of pixels), by default 0.3
+
+    Returns
+    -------
+    tf.Tensor
+        stack of translation matrices, (B, 3, 3) tensor
+    """
+    num_imgs = tf.shape(orig_imgs)[0]
+    height, _ = spatial_dims(orig_imgs)
+
+    # find translations (in pixels)
+    tx_pix = height * tf.random.uniform([num_imgs], -max_tx, max_tx)
+    ty_pix = height * tf.random.uniform([num_imgs], -max_ty, max_ty)
+
+    # build translation matrices
+    return mat_stack((1, 0, tx_pix), (0, 1, ty_pix), num_imgs)
+
+
+def flip_vertical_mats(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Builds vertical flip matrix of each image in a stack, like
+    flip.flip_vertical_mat.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to flip, (B, H, W, C) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of vertical flip matrices, (B, 3, 3) tensor
+    """
+    height, _ = spatial_dims(orig_imgs)
+    return mat_stack((-1, 0, height - 1), (0, 1, 0), tf.shape(orig_imgs)[0])
+
+
+def flip_horizontal_mats(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Builds horizontal flip matrix of each image in a stack, like
+    flip.flip_horizontal_mat.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to flip, (B, H, W, C) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of horizontal flip matrices, (B, 3, 3) tensor
+    """
+    _, width = spatial_dims(orig_imgs)
+    return mat_stack((1, 0, 0), (0, -1, width - 1), tf.shape(orig_imgs)[0])
+
+
+AFFINE_MATS: Dict[str, Callable[..., tf.Tensor]] = {
+    "resize": resize_mats,
+    "rotate": rotate_mats,
+    "translate": translate_mats,
+    "flip_vertical": flip_vertical_mats,
+    "flip_horizontal": flip_horizontal_mats,
+}
+
+
+def sample_pixels(
+    orig_imgs: tf.Tensor, src_rows: tf.Tensor, src_cols: tf.Tensor
+) -> tf.Tensor:
+    """Gathers source pixels of each image at integer source coordinates.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to sample from, (B, H, W, C) tensor
+    src_rows : tf.Tensor
+        integer source row coordinates, (B, H, W) tensor
+    src_cols : tf.Tensor
+        integer source column coordinates, (B, H, W) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        sampled images, zero where coordinates fall outside the source image
+    """
+    img_shape = tf.shape(orig_imgs)
+
+    # find coordinates that land inside the source image
+    valid = (0 <= src_rows) & (src_rows < img_shape[1])
+    valid &= (0 <= src_cols) & (src_cols < img_shape[2])
+
+    # gather from clamped coordinates, then zero out invalid pixels
+    src_idx = tf.stack(
+        [
+            tf.clip_by_value(src_rows, 0, img_shape[1] - 1),
+            tf.clip_by_value(src_cols, 0, img_shape[2] - 1),
+        ],
+        axis=-1,
+    )
+    sampled_imgs = tf.gather_nd(orig_imgs, src_idx, batch_dims=1)
+    return tf.where(valid[..., None], sampled_imgs, tf.zeros_like(sampled_imgs))
+
+
+def affine_transform(
+    orig_imgs: tf.Tensor, transform_mats: tf.Tensor, interpolation: str = "nearest"
+) -> tf.Tensor:
+    """Performs a per-image affine transformation on a stack of images, like
+    affine_transform.affine_transform_batch.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to transform, (B, H, W, C) tensor
+    transform_mats : tf.Tensor
+        transformation matrix for each image, (B, 3, 3) tensor
+    interpolation : str, optional
+        sampling method, one of "nearest" or "bilinear", by default "nearest"
+
+    Returns
+    -------
+    tf.Tensor
+        stack of affine transformed images
+    """
+    assert interpolation in INTERPOLATIONS, f"Unknown interpolation: {interpolation}"
+    img_shape = tf.shape(orig_imgs)
+
+    # map every output pixel coordinate to its source coordinate
+    rows = tf.cast(tf.range(img_shape[1]), tf.float32)[:, None]
+    cols = tf.cast(tf.range(img_shape[2]), tf.float32)[None, :]
+    mats = tf.cast(transform_mats, tf.float32)[:, :, :, None, None]
+    src_rows = mats[:, 0, 0] * rows + mats[:, 0, 1] * cols + mats[:, 0, 2]
+    src_cols = mats[:, 1, 0] * rows + mats[:, 1, 1] * cols + mats[:, 1, 2]
+
+    # round source coordinates half to even, like nearest_map
+    if interpolation == "nearest":
+        return sample_pixels(
+            orig_imgs,
+            tf.cast(tf.round(src_rows), tf.int32),
+            tf.cast(tf.round(src_cols), tf.int32),
+        )
+
+    # find top left neighbour and fractional offsets
+    row_0, col_0 = tf.floor(src_rows), tf.floor(src_cols)
+    frac_rows, frac_cols = (src_rows - row_0)[..., None], (src_cols - col_0)[..., None]
+    row_0, col_0 = tf.cast(row_0, tf.int32), tf.cast(col_0, tf.int32)
+
+    # accumulate weighted contribution of each of the four neighbours
+    sampled_imgs = tf.zeros(img_shape, dtype=tf.float32)
+    for d_row, d_col in ((0, 0), (0, 1), (1, 0), (1, 1)):
+        weights = (frac_rows if d_row else 1 - frac_rows) * (
+            frac_cols if d_col else 1 - frac_cols
+        )
+        neighbours = sample_pixels(orig_imgs, row_0 + d_row, col_0 + d_col)
+        sampled_imgs += weights * tf.cast(neighbours, tf.float32)
+
+    # round back to integer types
+    if orig_imgs.dtype.is_integer:
+        sampled_imgs = tf.clip_by_value(
+            tf.round(sampled_imgs), orig_imgs.dtype.min, orig_imgs.dtype.max
+        )
+
+    return tf.cast(sampled_imgs, orig_imgs.dtype)
+
+
+def resize(
+    orig_imgs: tf.Tensor,
+    scale_x_range: Tuple[float, float] = (0.5, 2),
+    scale_y_range: Tuple[float, float] = (0.5, 2),
+) -> tf.Tensor:
+    """Resizes each image in a stack by its own scale in provided scale range.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to resize, (B, H, W, C) tensor
+    scale_x_range : Tuple[float, float], optional
+        range of x scale factors, by default (0.5, 2)
+    scale_y_range : Tuple[float, float], optional
+        range of y scale factors, by default (0.5, 2)
+
+    Returns
+    -------
+    tf.Tensor
+        stack of resized images
+    """
+    return affine_transform(
+        orig_imgs, resize_mats(orig_imgs, scale_x_range, scale_y_range)
+    )
+
+
+def rotate(orig_imgs: tf.Tensor, max_theta: float = 360) -> tf.Tensor:
+    """Rotates each image in a stack by its own angle of up to max_theta.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to rotate, (B, H, W, C) tensor
+    max_theta : float, optional
+        maximum positive rotation (in degrees), by default 360
+
+    Returns
+    -------
+    tf.Tensor
+        stack of rotated images
+    """
+    return affine_transform(orig_imgs, rotate_mats(orig_imgs, max_theta))
+
+
+def translate(
+    orig_imgs: tf.Tensor, max_tx: float = 0.3, max_ty: float = 0.3
+) -> tf.Tensor:
+    """Translates each image in a stack by its own offset of up to max_tx, max_ty.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to translate, (B, H, W, C) tensor
+    max_tx : float, optional
+        maximum horizontal distance to translate image (proportion of pixels), by default 0.3
+    max_ty : float, optional
+        maximum vertical distance to translate image (proportion of pixels), by default 0.3
+
+    Returns
+    -------
+    tf.Tensor
+        stack of translated images
+    """
+    return affine_transform(orig_imgs, translate_mats(orig_imgs, max_tx, max_ty))
+
+
+def flip_vertical(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Flips each image in a stack vertically.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to flip, (B, H, W, C) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of vertically flipped images
+    """
+    # a flip is a pure pixel permutation, so reverse rather than resample
+    return tf.reverse(orig_imgs, axis=[1])
+
+
+def flip_horizontal(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Flips each image in a stack horizontally.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to flip, (B, H, W, C) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of horizontally flipped images
+    """
+    # a flip is a pure pixel permutation, so reverse rather than resample
+    return tf.reverse(orig_imgs, axis=[2])
+
+
+def compose(
+    orig_imgs: tf.Tensor,
+    ops: Sequence[str] = ("resize", "rotate", "translate"),
+    op_kwargs: Optional[Dict[str, Dict]] = None,
+    interpolation: str = "nearest",
+) -> tf.Tensor:
+    """Applies a chain of affine ops to each image in a stack with a single resample.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to transform, (B, H, W, C) tensor
+    ops : Sequence[str], optional
+        names of affine ops to chain, in the order they are applied,
+        by default ("resize", "rotate", "translate")
+    op_kwargs : Optional[Dict[str, Dict]], optional
+        keyword arguments for each op's matrix builder, keyed by op name, by default none
+    interpolation : str, optional
+        sampling method, one of "nearest" or "bilinear", by default "nearest"
+
+    Returns
+    -------
+    tf.Tensor
+        stack of transformed images
+    """
+    assert all(op in AFFINE_MATS for op in ops), f"Unknown affine op in {ops}"
+    op_kwargs = op_kwargs or {}
+
+    # sample each op's matrices and multiply together
+    transform_mats = reduce(
+        tf.matmul,
+        [AFFINE_MATS[op](orig_imgs, **op_kwargs.get(op, {})) for op in ops],
+        mat_stack((1, 0, 0), (0, 1, 0), tf.shape(orig_imgs)[0]),
+    )
+
+    # transform and return images
+    return affine_transform(orig_imgs, transform_mats, interpolation=interpolation)
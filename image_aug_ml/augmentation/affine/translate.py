@@ -1,33 +1,49 @@
+from typing import Optional, Tuple
+
 import numpy as np
 
-from .affine_transform import affine_transform
+from image_aug_ml.utils import BufferPool, get_rng
 
+from .affine_transform import (
+    affine_transform,
+    affine_transform_batch,
+    sampling_map_cache,
+)
+from .map_cache import snap
 
-def translate(
-    orig_img: np.ndarray, max_tx: float = 0.3, max_ty: float = 0.3
+
+def translate_mat(
+    img_shape: Tuple[int, ...],
+    max_tx: float = 0.3,
+    max_ty: float = 0.3,
+    shift_quantum: Optional[float] = None,
 ) -> np.ndarray:
-    """Translates an image by up to max_tx, max_ty.
+    """Builds translation matrix, translating by up to max_tx, max_ty.
 
     Parameters
     ----------
-    orig_img : np.ndarray
-        original image to translate
+    img_shape : Tuple[int, ...]
+        shape of image to translate
     max_tx : float, optional
         maximum horizontal distance to translate image (proportion of pixels), by default 0.3
     max_ty : float, optional
         maximum vertical distance to translate image (proportion of pixels), by default 0.3
+    shift_quantum : Optional[float], optional
+        grid (in pixels) to snap translations to, so that repeated translations
+        reuse cached sampling maps (whole pixels are copied without maps), by
+        default no snapping
 
     Returns
     -------
     np.ndarray
-        translated image array
+        translation matrix, 3x3 matrix
     """
     # find translation (in pixels)
-    tx_pix = orig_img.shape[0] * np.random.uniform(-max_tx, max_tx)
-    ty_pix = orig_img.shape[0] * np.random.uniform(-max_ty, max_ty)
+    tx_pix = snap(img_shape[0] * get_rng().uniform(-max_tx, max_tx), shift_quantum)
+    ty_pix = snap(img_shape[0] * get_rng().uniform(-max_ty, max_ty), shift_quantum)
 
     # build translation matrix
-    translate_mat = np.array(
+    return np.array(
         [
             [1, 0, tx_pix],
             [0, 1, ty_pix],
@@ -35,5 +51,130 @@ def translate(
         ]
     )
 
+
+def translate_mats(
+    img_shape: Tuple[int, ...],
+    num_imgs: int,
+    max_tx: float = 0.3,
+    max_ty: float = 0.3,
+    shift_quantum: Optional[float] = None,
+) -> np.ndarray:
+    """Builds stack of translation matrices, drawing all translations up front.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, ...]
+        shape of each image to translate
+    num_imgs : int
+        number of matrices to build
+    max_tx : float, optional
+        maximum horizontal distance to translate image (proportion of pixels), by default 0.3
+    max_ty : float, optional
+        maximum vertical distance to translate image (proportion of pixels), by default 0.3
+    shift_quantum : Optional[float], optional
+        grid (in pixels) to snap translations to, so that repeated translations
+        reuse cached sampling maps (whole pixels are copied without maps), by
+        default no snapping
+
+    Returns
+    -------
+    np.ndarray
+        stack of translation matrices, (num_imgs, 3, 3) array
+    """
+    # find translations (in pixels)
+    tx_pix = img_shape[0] * get_rng().uniform(-max_tx, max_tx, size=num_imgs)
+    ty_pix = img_shape[0] * get_rng().uniform(-max_ty, max_ty, size=num_imgs)
+    tx_pix, ty_pix = snap(tx_pix, shift_quantum), snap(ty_pix, shift_quantum)
+
+    # build translation matrices
+    translate_mat_stack = np.tile(np.eye(3), (num_imgs, 1, 1))
+    translate_mat_stack[:, 0, 2] = tx_pix
+    translate_mat_stack[:, 1, 2] = ty_pix
+
+    return translate_mat_stack
+
+
+def translate(
+    orig_img: np.ndarray,
+    max_tx: float = 0.3,
+    max_ty: float = 0.3,
+    shift_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Translates an image by up to max_tx, max_ty.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        original image to translate
+    max_tx : float, optional
+        maximum horizontal distance to translate image (proportion of pixels), by default 0.3
+    max_ty : float, optional
+        maximum vertical distance to translate image (proportion of pixels), by default 0.3
+    shift_quantum : Optional[float], optional
+        grid (in pixels) to snap translations to, so that repeated translations
+        reuse cached sampling maps (whole pixels are copied without maps), by
+        default no snapping
+    out : Optional[np.ndarray], optional
+        array to write translated image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        translated image array
+    """
     # translate and return image
-    return affine_transform(orig_img, translate_mat)
+    return affine_transform(
+        orig_img,
+        translate_mat(orig_img.shape, max_tx, max_ty, shift_quantum),
+        out=out,
+        workspace=workspace,
+        map_cache=None if shift_quantum is None else sampling_map_cache,
+    )
+
+
+def translate_batch(
+    orig_imgs: np.ndarray,
+    max_tx: float = 0.3,
+    max_ty: float = 0.3,
+    shift_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Translates each image in a stack by its own offset of up to max_tx, max_ty.
+
+    Parameters
+    ----------
+    orig_imgs : np.ndarray
+        stack of original images to translate, (N, H, W, C) array
+    max_tx : float, optional
+        maximum horizontal distance to translate image (proportion of pixels), by default 0.3
+    max_ty : float, optional
+        maximum vertical distance to translate image (proportion of pixels), by default 0.3
+    shift_quantum : Optional[float], optional
+        grid (in pixels) to snap translations to, so that repeated translations
+        reuse cached sampling maps (whole pixels are copied without maps), by
+        default no snapping
+    out : Optional[np.ndarray], optional
+        array to write stack of translated images to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        stack of translated images
+    """
+    # translate and return images
+    return affine_transform_batch(
+        orig_imgs,
+        translate_mats(
+            orig_imgs.shape[1:], len(orig_imgs), max_tx, max_ty, shift_quantum
+        ),
+        out=out,
+        workspace=workspace,
+        map_cache=None if shift_quantum is None else sampling_map_cache,
+    )
@@ -1,21 +1,65 @@
-from typing import Callable, Dict, List, Optional
-import importlib
+from typing import Dict, List, Optional
+import concurrent.futures
+import os
 import pathlib
 import tqdm
 
-import cv2
 import numpy as np
 
-from image_aug_ml.utils import get_all_original_train_images, save_to_file
+from image_aug_ml.augmentation.chunk import (
+    RUN_COUNTERS,
+    IOConf,
+    augment_chunk,
+    plan_chunk,
+    profile_chunk,
+)
+from image_aug_ml.augmentation.loader import get_augment_name
+from image_aug_ml.augmentation.manifest import (
+    append_manifest,
+    load_manifest,
+    manifest_seed,
+    packed_outputs,
+    write_manifest,
+)
+from image_aug_ml.augmentation.pipeline import PipelineConf
+from image_aug_ml.utils import (
+    BufferPool,
+    Profiler,
+    close_shard_writers,
+    compact_shards,
+    get_all_original_train_images,
+    profile,
+)
 
 
 def augment_images(
     augmentation_conf: Dict,
     image_dir: pathlib.Path,
+    *,
     subsample_pct: Optional[float] = None,
-):
+    batch_size: int = 1,
+    workers: int = 1,
+    chunk_size: int = 64,
+    seed: Optional[int] = None,
+    pipeline_conf: Optional[PipelineConf] = None,
+    io_conf: IOConf = IOConf(),
+    force: bool = False,
+    dry_run: bool = False,
+    profiler: Optional[Profiler] = None,
+    buffer_pool_bytes: int = 256 * 2 ** 20,
+    run_stats: Optional[Dict[str, float]] = None,
+) -> Dict[str, int]:
     """Augments training images in image directory and saves to file.
 
+    Every op draws from its own generator, derived from the base seed, the op and the
+    image's path, so output is identical for any number of workers or batch size,
+    and adding or removing images leaves the outputs of the others unchanged.
+
+    Completed outputs are recorded in a manifest in the image directory, along with
+    their source file's size and modification time, op parameters and seed. Outputs
+    that are already up to date are skipped, so interrupted runs resume and ops added
+    to a config are computed alone.
+
     Parameters
     ----------
     augmentation_conf : Dict
@@ -24,35 +68,194 @@ def augment_images(
         directory to load original training images from
     subsample_pct : Optional[float]
         percentage of training images to sample, by default all
+    batch_size : int
+        number of images to load at once, same-shape images are augmented together
+        by ops with a batched variant, by default 1
+    workers : int
+        number of worker processes, by default 1 (augment in this process)
+    chunk_size : int
+        number of images handed to a worker at once, by default 64
+    seed : Optional[int]
+        base seed of augmentation run, by default the seed of the last completed
+        output in the manifest, or drawn from system entropy
+    pipeline_conf : Optional[PipelineConf]
+        thread counts and queue depths of decode and encode stages, run alongside
+        augmentation in each worker, by default None (stages run in turn)
+    io_conf : IOConf
+        decode cache, reduced decoding, output encoding, content store and shard
+        options, by default IOConf() (decode training images at full scale, and
+        save outputs to a file each in the format of their training image)
+    force : bool
+        whether to redo outputs that are already up to date, by default False
+    dry_run : bool
+        whether to only find pending outputs, without augmenting, by default False
+    profiler : Optional[Profiler]
+        profiler to time each stage and op in, showing op throughput in the progress
+        bar, by default None
+    buffer_pool_bytes : int
+        maximum size of output and scratch buffers reused across images, in each
+        worker, by default 256 MiB (0 to allocate buffers for every image)
+    run_stats : Optional[Dict[str, float]]
+        if provided, filled with the number of images augmented, CPU seconds of this
+        process and its workers, bytes of source files read, of decoded images, of
+        decoded images at full scale and of encoded outputs, and seconds spent
+        decoding and encoding summed over threads and workers, by default None
+
+    Returns
+    -------
+    Dict[str, int]
+        number of pending outputs of each augmentation
     """
-    # get all original training image paths
-    train_img_paths: List[pathlib.Path] = get_all_original_train_images(image_dir)
-
-    # import all image augmentation operations
-    augment_ops: List[Callable] = []
-    for augment_path in augmentation_conf["augmentations"]:
-        augment_module, augment_name = augment_path.rsplit(".", maxsplit=1)
-        augment_ops.append(
-            getattr(importlib.import_module(augment_module), augment_name)
-        )
+    assert (
+        io_conf.decode_cache is None or io_conf.reduced_decode_shape is None
+    ), "Images read from a decode cache are already decoded"
+
+    # get all original training image paths, in a reproducible order
+    train_img_paths: List[pathlib.Path] = sorted(
+        get_all_original_train_images(image_dir)
+    )
+
+    # resume with seed of previous run if not provided
+    manifest = load_manifest(image_dir)
+    if seed is None:
+        seed = manifest_seed(manifest)
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
 
     # sample subset of training images
     if subsample_pct is not None:
-        train_img_paths = np.random.choice(
-            train_img_paths,
-            size=int(len(train_img_paths) * subsample_pct),
-            replace=False,
+        train_img_paths = list(
+            np.random.default_rng(seed).choice(
+                train_img_paths,
+                size=int(len(train_img_paths) * subsample_pct),
+                replace=False,
+            )
         )
 
-    # iterate over training images
-    for train_img_path in tqdm.tqdm(train_img_paths):
-        # load image from file
-        train_img = cv2.imread(str(train_img_path))
+    # find packed outputs still held in their shards
+    augment_entries = augmentation_conf["augmentations"]
+    augment_names = [
+        get_augment_name(augment_entry) for augment_entry in augment_entries
+    ]
+    indexed_outputs = None
+    if io_conf.max_shard_bytes is not None:
+        indexed_outputs = packed_outputs(image_dir, augment_names)
+
+    # split training images into chunks, and find their pending outputs
+    chunks = []
+    for chunk_start in range(0, len(train_img_paths), chunk_size):
+        chunk_paths = train_img_paths[chunk_start : chunk_start + chunk_size]
+        img_op_idxs, pending_records = plan_chunk(
+            augment_entries,
+            image_dir,
+            chunk_paths,
+            seed,
+            manifest,
+            force=force,
+            io_conf=io_conf,
+            indexed_outputs=indexed_outputs,
+        )
+        if pending_records:
+            chunks.append((chunk_paths, img_op_idxs, pending_records))
+
+    # count pending outputs of each augmentation, and images to load for them
+    pending = dict.fromkeys(augment_names, 0)
+    pending_imgs = 0
+    for *_, pending_records in chunks:
+        for record in pending_records:
+            pending[get_augment_name(record["op"])] += 1
+        pending_imgs += len({record["source"] for record in pending_records})
+
+    if dry_run or not chunks:
+        return pending
+
+    # compact manifest before appending records of this run
+    write_manifest(image_dir, manifest)
+
+    # pool buffers of each worker, which start empty as pools pickle without buffers
+    buffer_pool = BufferPool(buffer_pool_bytes) if buffer_pool_bytes > 0 else None
+
+    # sum counters of each chunk, and CPU time of this process and joined workers
+    counts = dict.fromkeys(RUN_COUNTERS, 0)
+    start_times = os.times()
+
+    # time whole run alongside its stages
+    with profile(profiler, "run", pending_imgs), tqdm.tqdm(
+        total=pending_imgs
+    ) as progress_bar:
+        # augment chunks in this process
+        if workers == 1:
+            for chunk_paths, img_op_idxs, pending_records in chunks:
+                num_imgs, chunk_counts = augment_chunk(
+                    augment_entries,
+                    chunk_paths,
+                    seed,
+                    batch_size=batch_size,
+                    pipeline_conf=pipeline_conf,
+                    img_op_idxs=img_op_idxs,
+                    io_conf=io_conf,
+                    profiler=profiler,
+                    buffer_pool=buffer_pool,
+                )
+                progress_bar.update(num_imgs)
+                for counter in RUN_COUNTERS:
+                    counts[counter] += chunk_counts[counter]
+                append_manifest(image_dir, pending_records)
+                if profiler is not None:
+                    progress_bar.set_postfix_str(profiler.op_throughput())
+
+        # augment chunks in a process pool
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+                futures = {
+                    pool.submit(
+                        augment_chunk if profiler is None else profile_chunk,
+                        augment_entries,
+                        chunk_paths,
+                        seed,
+                        batch_size=batch_size,
+                        pipeline_conf=pipeline_conf,
+                        img_op_idxs=img_op_idxs,
+                        io_conf=io_conf,
+                        buffer_pool=buffer_pool,
+                    ): pending_records
+                    for chunk_paths, img_op_idxs, pending_records in chunks
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    # merge profiles of workers
+                    if profiler is None:
+                        num_imgs, chunk_counts = future.result()
+                    else:
+                        num_imgs, chunk_counts, chunk_stats = future.result()
+                        profiler.merge(chunk_stats)
+                        progress_bar.set_postfix_str(profiler.op_throughput())
+
+                    progress_bar.update(num_imgs)
+                    for counter in RUN_COUNTERS:
+                        counts[counter] += chunk_counts[counter]
+                    append_manifest(image_dir, futures[future])
+
+    # drop records superseded by this run, once they take up much of the shards
+    if io_conf.max_shard_bytes is not None:
+        with profile(profiler, "compact", 0):
+            close_shard_writers()
+            for augment_name in augment_names:
+                shard_dir = image_dir / augment_name / "train"
+                if shard_dir.is_dir():
+                    compact_shards(shard_dir, io_conf.max_shard_bytes)
+
+    # report CPU time, including that of workers joined on leaving the pool
+    if run_stats is not None:
+        end_times = os.times()
+        run_stats["images"] = pending_imgs
+        run_stats["cpu_seconds"] = sum(
+            end_time - start_time
+            for end_time, start_time in zip(end_times[:4], start_times[:4])
+        )
+        run_stats.update(counts)
 
-        # perform each augmentation on image
-        for augment_op in augment_ops:
-            # augment image
-            augment_img = augment_op(train_img)
+    # evict least recently used outputs beyond store's size cap
+    if io_conf.content_store is not None:
+        io_conf.content_store.evict()
 
-            # save augmented image to file
-            save_to_file(augment_img, train_img_path, augment_op.__name__)
+    return pending
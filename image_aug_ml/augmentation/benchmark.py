@@ -0,0 +1,327 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import json
+import pathlib
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+
+from image_aug_ml.augmentation.loader import load_augment_op, load_batch_augment_op
+from image_aug_ml.utils import use_rng
+
+
+# benchmarked image sizes, as (height, width) of typical imagenette images
+IMAGE_SIZES: Dict[str, Tuple[int, int]] = {
+    "160": (160, 213),
+    "320": (320, 426),
+    "full": (375, 500),
+}
+
+# latency percentiles reported for each op
+PERCENTILES = (50, 90, 99)
+
+
+def synthetic_images(
+    img_shape: Tuple[int, int], num_imgs: int, seed: int = 0
+) -> np.ndarray:
+    """Creates stack of uint8 BGR images of smooth gradients with noise, so that
+    histograms and spectra resemble those of natural images.
+
+    Parameters
+    ----------
+    img_shape : Tuple[int, int]
+        (height, width) of images
+    num_imgs : int
+        number of images to create
+    seed : int, optional
+        random seed, by default 0
+
+    Returns
+    -------
+    np.ndarray
+        (num_imgs, height, width, 3) uint8 array
+    """
+    rng = np.random.default_rng(seed)
+    height, width = img_shape
+
+    # blend a random gradient per channel with pixel noise
+    rows, cols = np.ogrid[:height, :width]
+    gradients = rng.uniform(0, 1, (num_imgs, 1, 1, 3, 2))
+    smooth = (
+        gradients[..., 0] * (rows / height)[..., None]
+        + gradients[..., 1] * (cols / width)[..., None]
+    )
+    noise = rng.normal(0, 0.1, (num_imgs, height, width, 3))
+    return (255 * np.clip(smooth / 2 + 0.25 + noise, 0, 1)).astype(np.uint8)
+
+
+def time_calls(call: Callable[[int], None], num_calls: int) -> np.ndarray:
+    """Times repeated calls of a function.
+
+    Parameters
+    ----------
+    call : Callable[[int], None]
+        function to time, called with the index of each call
+    num_calls : int
+        number of timed calls
+
+    Returns
+    -------
+    np.ndarray
+        latency of each call in seconds
+    """
+    latencies = np.empty(num_calls)
+    for call_idx in range(num_calls):
+        start = time.perf_counter()
+        call(call_idx)
+        latencies[call_idx] = time.perf_counter() - start
+
+    return latencies
+
+
+def peak_memory(call: Callable[[int], None]) -> int:
+    """Measures peak memory allocated by a single call of a function.
+
+    Allocations are traced with tracemalloc, which numpy reports its array buffers
+    to, in a call of its own so that tracing does not slow timed calls.
+
+    Parameters
+    ----------
+    call : Callable[[int], None]
+        function to measure, called with index 0
+
+    Returns
+    -------
+    int
+        peak allocated bytes
+    """
+    tracemalloc.start()
+    try:
+        call(0)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak_bytes
+
+
+def benchmark_op(
+    augment_entry: Union[str, Dict],
+    img_shape: Tuple[int, int],
+    num_calls: int = 10,
+    warmup_calls: int = 1,
+    batch_size: int = 1,
+    seed: int = 0,
+) -> Dict:
+    """Benchmarks an augmentation op on synthetic images of one shape.
+
+    Parameters
+    ----------
+    augment_entry : Union[str, Dict]
+        augmentation config entry of op to benchmark
+    img_shape : Tuple[int, int]
+        (height, width) of images
+    num_calls : int, optional
+        number of timed calls, by default 10
+    warmup_calls : int, optional
+        number of untimed calls made first, filling caches, by default 1
+    batch_size : int, optional
+        number of images per call, augmented by the op's batched variant if it has
+        one, by default 1
+    seed : int, optional
+        random seed of images and op parameters, by default 0
+
+    Returns
+    -------
+    Dict
+        shape, calls, megapixels per second, latency percentiles in ms and peak
+        allocated MiB of op
+    """
+    augment_name, augment_op = load_augment_op(augment_entry)
+    batch_augment_op = load_batch_augment_op(augment_entry)
+
+    # give every call its own image, like augmenting a dataset
+    imgs = synthetic_images(img_shape, warmup_calls + num_calls + 1, seed)
+
+    def call(call_idx: int):
+        img = imgs[call_idx % len(imgs)]
+        if batch_size == 1:
+            augment_op(img)
+        elif batch_augment_op is not None:
+            batch_augment_op(np.repeat(img[None], batch_size, axis=0))
+        else:
+            for _ in range(batch_size):
+                augment_op(img)
+
+    with use_rng(np.random.default_rng(seed)):
+        time_calls(lambda call_idx: call(num_calls + call_idx), warmup_calls)
+        latencies = time_calls(call, num_calls)
+        peak_bytes = peak_memory(call)
+
+    megapixels = batch_size * img_shape[0] * img_shape[1] / 1e6
+    return {
+        "op": augment_name,
+        "shape": [*img_shape, 3],
+        "batch_size": batch_size,
+        "calls": num_calls,
+        "mp_per_s": megapixels * num_calls / latencies.sum(),
+        "latency_ms": {
+            "mean": 1e3 * latencies.mean(),
+            **{
+                f"p{percentile}": 1e3 * np.percentile(latencies, percentile)
+                for percentile in PERCENTILES
+            },
+        },
+        "peak_mb": peak_bytes / 2 ** 20,
+    }
+
+
+def run_benchmarks(
+    augmentation_conf: Dict,
+    sizes: Optional[List[str]] = None,
+    num_calls: int = 10,
+    warmup_calls: int = 1,
+    batch_size: int = 1,
+    seed: int = 0,
+    log: Optional[Callable[[Dict], None]] = None,
+) -> Dict:
+    """Benchmarks every op of an augmentation config at every image size.
+
+    Parameters
+    ----------
+    augmentation_conf : Dict
+        augmentation config, listing ops under "augmentations"
+    sizes : Optional[List[str]], optional
+        names of image sizes to benchmark, keys of IMAGE_SIZES, by default all
+    num_calls : int, optional
+        number of timed calls per op and size, by default 10
+    warmup_calls : int, optional
+        number of untimed calls made first, by default 1
+    batch_size : int, optional
+        number of images per call, by default 1
+    seed : int, optional
+        random seed of images and op parameters, by default 0
+    log : Optional[Callable[[Dict], None]], optional
+        called with the result of each op and size as it finishes, by default none
+
+    Returns
+    -------
+    Dict
+        benchmark environment and results, one per op and size
+    """
+    sizes = list(IMAGE_SIZES) if sizes is None else sizes
+    assert all(size in IMAGE_SIZES for size in sizes), f"Unknown image size in {sizes}"
+
+    results = []
+    for augment_entry in augmentation_conf["augmentations"]:
+        for size in sizes:
+            result = {
+                "size": size,
+                **benchmark_op(
+                    augment_entry,
+                    IMAGE_SIZES[size],
+                    num_calls,
+                    warmup_calls,
+                    batch_size,
+                    seed,
+                ),
+            }
+            results.append(result)
+            if log is not None:
+                log(result)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+
+def save_benchmarks(benchmarks: Dict, output_path: pathlib.Path):
+    """Saves benchmark results as JSON.
+
+    Parameters
+    ----------
+    benchmarks : Dict
+        benchmark environment and results, as returned by run_benchmarks
+    output_path : pathlib.Path
+        path of JSON file to write
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(benchmarks, output_file, indent=2)
+
+
+def load_benchmarks(benchmark_path: pathlib.Path) -> Dict:
+    """Loads benchmark results saved by save_benchmarks.
+
+    Parameters
+    ----------
+    benchmark_path : pathlib.Path
+        path of JSON file
+
+    Returns
+    -------
+    Dict
+        benchmark environment and results
+    """
+    with open(benchmark_path, "r") as benchmark_file:
+        return json.load(benchmark_file)
+
+
+def compare_benchmarks(
+    benchmarks: Dict, baseline: Dict, max_slowdown: float = 1.5
+) -> List[Dict]:
+    """Compares benchmark results against a baseline, by median latency.
+
+    Ops and sizes missing from the baseline are not compared.
+
+    Parameters
+    ----------
+    benchmarks : Dict
+        benchmark results, as returned by run_benchmarks
+    baseline : Dict
+        baseline benchmark results
+    max_slowdown : float, optional
+        largest allowed ratio of median latency to baseline median latency, by
+        default 1.5
+
+    Returns
+    -------
+    List[Dict]
+        op, size, batch size, median latencies and slowdown of every comparison,
+        with whether slowdown exceeds max_slowdown
+    """
+
+    def result_key(result: Dict) -> Tuple[str, str, int]:
+        return result["op"], result["size"], result.get("batch_size", 1)
+
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+
+    comparisons = []
+    for result in benchmarks["results"]:
+        baseline_result = baseline_results.get(result_key(result))
+        if baseline_result is None:
+            continue
+
+        latency_ms = result["latency_ms"]["p50"]
+        baseline_latency_ms = baseline_result["latency_ms"]["p50"]
+        slowdown = latency_ms / baseline_latency_ms
+        comparisons.append(
+            {
+                "op": result["op"],
+                "size": result["size"],
+                "batch_size": result.get("batch_size", 1),
+                "latency_ms": latency_ms,
+                "baseline_latency_ms": baseline_latency_ms,
+                "slowdown": slowdown,
+                "regressed": slowdown > max_slowdown,
+            }
+        )
+
+    return comparisons
@@ -0,0 +1,658 @@
+from typing import (
+    Callable,
+    DefaultDict,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+import collections
+import functools
+import hashlib
+import inspect
+import json
+import pathlib
+import threading
+import time
+
+import numpy as np
+
+from image_aug_ml.augmentation.loader import (
+    augment_op_key,
+    get_augment_name,
+    load_augment_op,
+    load_batch_augment_op,
+)
+from image_aug_ml.augmentation.manifest import is_up_to_date, output_record
+from image_aug_ml.augmentation.pipeline import PipelineConf, run_pipeline
+from image_aug_ml.utils import (
+    BufferPool,
+    ContentStore,
+    DecodeCache,
+    EncodeConf,
+    Profiler,
+    StackRng,
+    decode_image,
+    flush_shard_writers,
+    profile,
+    save_to_file,
+    save_to_shard,
+    use_rng,
+)
+from image_aug_ml.utils.profiler import OP_STAGE_PREFIX
+
+
+# byte counters of each chunk, summed into run stats
+BYTE_COUNTERS = ("source_bytes", "decoded_bytes", "full_decoded_bytes", "encoded_bytes")
+
+# seconds spent decoding and encoding each chunk, timed even when not profiling
+STAGE_TIMERS = ("decode_seconds", "encode_seconds")
+
+# counters of each chunk, summed into run stats
+RUN_COUNTERS = BYTE_COUNTERS + STAGE_TIMERS
+
+
+class IOConf(NamedTuple):
+    """Decode, encode, content store and shard options of an augmentation run."""
+
+    # cache of decoded training images, built from image directory, to read
+    # (resized) images from instead of decoding them
+    decode_cache: Optional[DecodeCache] = None
+
+    # smallest height and width JPEGs are decoded at, by 1/2, 1/4 or 1/8 scale, such
+    # as the classifier's image shape, None for full scale
+    reduced_decode_shape: Optional[Tuple[int, int]] = None
+
+    # output format and quality, None for the format of the training image's suffix
+    # with OpenCV's default quality
+    encode_conf: Optional[EncodeConf] = None
+
+    # store of augmented images shared between configs and image directories,
+    # stored outputs are linked instead of augmented
+    content_store: Optional[ContentStore] = None
+
+    # size of indexed shards augmented images are appended to in each augmentation's
+    # train directory, None to save them to a file each
+    max_shard_bytes: Optional[int] = None
+
+
+def source_key(train_img_path: pathlib.Path) -> int:
+    """Derives a key identifying a training image by its path in its split, that is
+    its class directory and file name.
+
+    Keys do not depend on the image's position among the other training images, so
+    adding, removing or subsampling images leaves the keys of the others unchanged.
+
+    Parameters
+    ----------
+    train_img_path : pathlib.Path
+        path of training image
+
+    Returns
+    -------
+    int
+        64-bit source key
+    """
+    rel_path = train_img_path.relative_to(train_img_path.parents[1]).as_posix()
+    return int.from_bytes(hashlib.sha256(rel_path.encode()).digest()[:8], "little")
+
+
+def augment_rng(seed: int, op_key: int, src_key: int) -> np.random.Generator:
+    """Derives the generator an op draws from for an image.
+
+    Generators depend only on the base seed, the op and the image's path, so results
+    do not depend on how images are batched or split between workers, or on which
+    other images are augmented.
+
+    Parameters
+    ----------
+    seed : int
+        base seed of augmentation run
+    op_key : int
+        key of augmentation op and its parameters
+    src_key : int
+        key of training image, as derived by source_key
+
+    Returns
+    -------
+    np.random.Generator
+        seeded generator
+    """
+    return np.random.default_rng([seed, op_key, src_key])
+
+
+@functools.lru_cache(maxsize=None)
+def accepts_buffers(augment_op: Callable) -> bool:
+    """Checks whether an augmentation op accepts out and workspace buffers.
+
+    Parameters
+    ----------
+    augment_op : Callable
+        augmentation op, or its batched variant
+
+    Returns
+    -------
+    bool
+        whether op takes out and workspace keyword arguments
+    """
+    params = inspect.signature(augment_op).parameters
+    return "out" in params and "workspace" in params
+
+
+def augment_content_key(
+    source_digest: str,
+    op_key: int,
+    seed: int,
+    src_key: int,
+    output_settings: Optional[Dict] = None,
+) -> str:
+    """Derives the content store key of an augmented image.
+
+    Keys do not depend on the image's position among the other training images, so
+    stored images are reused by any directory holding the same image at the same
+    path in its split, such as a subsampled copy.
+
+    Parameters
+    ----------
+    source_digest : str
+        hex digest of training image file
+    op_key : int
+        key of augmentation op and its parameters
+    seed : int
+        base seed of augmentation run
+    src_key : int
+        key of training image the op's generator was derived from
+    output_settings : Optional[Dict], optional
+        decode and encode settings the stored image depends on, by default None
+        (full-scale decode and default encoding, leaving keys unchanged)
+
+    Returns
+    -------
+    str
+        hex key of augmented image
+    """
+    key_parts = [source_digest, op_key, seed, src_key]
+    if output_settings is not None:
+        key_parts.append(output_settings)
+    return hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()
+
+
+def augment_batch(
+    augment_ops: List[Tuple[str, Callable, Optional[Callable], int]],
+    batch_paths: List[pathlib.Path],
+    train_imgs: List[np.ndarray],
+    seed: int,
+    img_op_idxs: Optional[List[List[int]]] = None,
+    source_digests: Optional[List[str]] = None,
+    content_store: Optional[ContentStore] = None,
+    profiler: Optional[Profiler] = None,
+    out_pool: Optional[BufferPool] = None,
+    workspace: Optional[BufferPool] = None,
+    output_settings: Optional[Dict] = None,
+) -> Iterator[Tuple[Optional[np.ndarray], pathlib.Path, str, Optional[str]]]:
+    """Augments a batch of loaded training images.
+
+    Batched ops draw each image's parameters from that image's own generator, so
+    images are augmented alike whether or not they are stacked.
+
+    Parameters
+    ----------
+    augment_ops : List[Tuple[str, Callable, Optional[Callable], int]]
+        name, op, batched op (if any) and op key of each augmentation to perform
+    batch_paths : List[pathlib.Path]
+        paths of training images in batch
+    train_imgs : List[np.ndarray]
+        training images in batch
+    seed : int
+        base seed of augmentation run
+    img_op_idxs : Optional[List[List[int]]], optional
+        indices of augmentation ops to perform on each image, by default all ops on
+        every image
+    source_digests : Optional[List[str]], optional
+        hex digests of training image files, required with a content store
+    content_store : Optional[ContentStore], optional
+        store of augmented images to reuse, by default None
+    profiler : Optional[Profiler], optional
+        profiler to time each op in, by default None
+    out_pool : Optional[BufferPool], optional
+        pool to take output buffers from, reused by every op, so each yielded image
+        must be consumed before the next is requested, by default None
+    workspace : Optional[BufferPool], optional
+        pool to take image stacks and scratch buffers of ops from, by default None
+    output_settings : Optional[Dict], optional
+        decode and encode settings folded into content store keys, by default None
+
+    Yields
+    -------
+    Iterator[Tuple[Optional[np.ndarray], pathlib.Path, str, Optional[str]]]
+        augmented image (None if stored), path of its training image, name of its
+        augmentation and its content store key (None without a store)
+    """
+    if img_op_idxs is None:
+        img_op_idxs = [list(range(len(augment_ops)))] * len(train_imgs)
+    src_keys = [source_key(train_img_path) for train_img_path in batch_paths]
+
+    # perform each augmentation on the images it is pending for
+    op_idxs = sorted({op_idx for op_idxs in img_op_idxs for op_idx in op_idxs})
+    for op_idx in op_idxs:
+        augment_name, augment_op, batch_augment_op, op_key = augment_ops[op_idx]
+        op_stage = f"{OP_STAGE_PREFIX}{augment_name}"
+
+        # group images of the same shape
+        shape_groups: DefaultDict[
+            Tuple[int, ...], List[int]
+        ] = collections.defaultdict(list)
+        for img_idx, train_img in enumerate(train_imgs):
+            if op_idx in img_op_idxs[img_idx]:
+                shape_groups[train_img.shape].append(img_idx)
+
+        for img_shape, img_idxs in shape_groups.items():
+            use_batch = batch_augment_op is not None and len(img_idxs) > 1
+
+            # write uint8 outputs to pooled buffers if op accepts them
+            img_dtype = train_imgs[img_idxs[0]].dtype
+            buffered = img_dtype == np.uint8 and accepts_buffers(
+                batch_augment_op if use_batch else augment_op
+            )
+            out_stack = None
+            if buffered and out_pool is not None:
+                out_stack = out_pool.get("out", (len(img_idxs), *img_shape), np.uint8)
+
+            # find stored outputs, keyed by their source and generator
+            content_keys: List[Optional[str]] = [None] * len(img_idxs)
+            stored = [False] * len(img_idxs)
+            if content_store is not None:
+                content_keys = [
+                    augment_content_key(
+                        source_digests[img_idx],
+                        op_key,
+                        seed,
+                        src_keys[img_idx],
+                        output_settings,
+                    )
+                    for img_idx in img_idxs
+                ]
+                stored = [content_store.contains(key) for key in content_keys]
+
+            # augment images not stored, as a stack if op supports it
+            augment_imgs: List[Optional[np.ndarray]] = [None] * len(img_idxs)
+            if use_batch and not all(stored):
+                in_stack = None
+                if workspace is not None:
+                    in_stack = workspace.get(
+                        "in", (len(img_idxs), *img_shape), img_dtype
+                    )
+                train_stack = np.stack(
+                    [train_imgs[img_idx] for img_idx in img_idxs], out=in_stack
+                )
+                buffer_kwargs = (
+                    {"out": out_stack, "workspace": workspace} if buffered else {}
+                )
+                stack_rng = StackRng(
+                    [augment_rng(seed, op_key, src_keys[idx]) for idx in img_idxs]
+                )
+                with use_rng(stack_rng), profile(
+                    profiler, op_stage, len(img_idxs), train_stack.nbytes
+                ):
+                    augment_imgs = list(batch_augment_op(train_stack, **buffer_kwargs))
+            elif not use_batch:
+                for group_idx, img_idx in enumerate(img_idxs):
+                    if not stored[group_idx]:
+                        train_img = train_imgs[img_idx]
+                        out_img = None if out_stack is None else out_stack[group_idx]
+                        buffer_kwargs = (
+                            {"out": out_img, "workspace": workspace} if buffered else {}
+                        )
+                        img_rng = augment_rng(seed, op_key, src_keys[img_idx])
+                        with use_rng(img_rng), profile(
+                            profiler, op_stage, num_bytes=train_img.nbytes
+                        ):
+                            augment_imgs[group_idx] = augment_op(
+                                train_img, **buffer_kwargs
+                            )
+
+            for img_idx, augment_img, content_key in zip(
+                img_idxs, augment_imgs, content_keys
+            ):
+                yield augment_img, batch_paths[img_idx], augment_name, content_key
+
+
+def augment_chunk(
+    augment_entries: List[Union[str, Dict]],
+    img_paths: List[pathlib.Path],
+    seed: int,
+    *,
+    batch_size: int = 1,
+    pipeline_conf: Optional[PipelineConf] = None,
+    img_op_idxs: Optional[List[List[int]]] = None,
+    io_conf: IOConf = IOConf(),
+    profiler: Optional[Profiler] = None,
+    buffer_pool: Optional[BufferPool] = None,
+) -> Tuple[int, Dict[str, float]]:
+    """Augments a chunk of training images and saves them to file.
+
+    Parameters
+    ----------
+    augment_entries : List[Union[str, Dict]]
+        augmentation config entries of ops to perform
+    img_paths : List[pathlib.Path]
+        paths of training images in chunk
+    seed : int
+        base seed of augmentation run
+    batch_size : int, optional
+        number of images to load at once, same-shape images are augmented together
+        by ops with a batched variant, by default 1
+    pipeline_conf : Optional[PipelineConf], optional
+        if provided, images are decoded and encoded by threads overlapping with
+        augmentation, by default None (decode, augment and encode in turn)
+    img_op_idxs : Optional[List[List[int]]], optional
+        indices of augmentation ops to perform on each image, images without ops
+        are not loaded, by default all ops on every image
+    io_conf : IOConf, optional
+        decode, encode, content store and shard options, by default IOConf()
+        (decode training images at full scale, and save outputs to a file each)
+    profiler : Optional[Profiler], optional
+        profiler to time reading, decoding, each op, encoding and writing in, by
+        default None
+    buffer_pool : Optional[BufferPool], optional
+        pool of scratch buffers reused across images, and of output buffers when
+        stages run in turn, by default None
+
+    Returns
+    -------
+    Tuple[int, Dict[str, float]]
+        number of images augmented, bytes of source files read, of decoded images,
+        of decoded images at full scale and of encoded outputs, and seconds spent
+        decoding and encoding
+    """
+    decode_cache, reduced_decode_shape, encode_conf, content_store, max_shard_bytes = (
+        io_conf
+    )
+
+    # import all image augmentation operations
+    augment_ops: List[Tuple[str, Callable, Optional[Callable], int]] = [
+        (
+            *load_augment_op(augment_entry),
+            load_batch_augment_op(augment_entry),
+            augment_op_key(augment_entry),
+        )
+        for augment_entry in augment_entries
+    ]
+
+    # decode and encode settings stored outputs depend on
+    output_settings = None
+    if reduced_decode_shape is not None or encode_conf is not None:
+        output_settings = {
+            "reduced_decode_shape": reduced_decode_shape,
+            "encoding": None if encode_conf is None else encode_conf._asdict(),
+        }
+
+    # count bytes read, decoded and encoded, and seconds spent decoding and encoding,
+    # from reader and writer threads alike
+    counts = dict.fromkeys(RUN_COUNTERS, 0)
+    counts_lock = threading.Lock()
+
+    def add_counts(**chunk_counts: float):
+        with counts_lock:
+            for counter, count in chunk_counts.items():
+                counts[counter] += count
+
+    # split training images with something to do into batches
+    if img_op_idxs is None:
+        img_op_idxs = [list(range(len(augment_ops)))] * len(img_paths)
+    pending_paths = [
+        img_path for img_path, op_idxs in zip(img_paths, img_op_idxs) if op_idxs
+    ]
+    pending_op_idxs = [op_idxs for op_idxs in img_op_idxs if op_idxs]
+    batches = [
+        (
+            pending_paths[batch_start : batch_start + batch_size],
+            pending_op_idxs[batch_start : batch_start + batch_size],
+        )
+        for batch_start in range(0, len(pending_paths), batch_size)
+    ]
+
+    def read(
+        batch: Tuple[List[pathlib.Path], List[List[int]]],
+    ) -> Tuple[List[np.ndarray], Optional[List[str]]]:
+        # read views of decoded images, or file contents to decode
+        batch_paths, _ = batch
+        with profile(profiler, "read", len(batch_paths)) as timer:
+            if decode_cache is not None:
+                train_bufs = [decode_cache.get_image(path) for path in batch_paths]
+            else:
+                train_bufs = [np.fromfile(path, dtype=np.uint8) for path in batch_paths]
+            timer.num_bytes = read_bytes = sum(buf.nbytes for buf in train_bufs)
+
+        # digest pixels or file contents for content store keys
+        source_digests = None
+        if content_store is not None:
+            with profile(profiler, "digest", len(train_bufs), read_bytes):
+                source_digests = [hashlib.sha256(buf).hexdigest() for buf in train_bufs]
+
+        if decode_cache is not None:
+            add_counts(decoded_bytes=read_bytes, full_decoded_bytes=read_bytes)
+            return train_bufs, source_digests
+
+        # decode images, at reduced scale if much larger than needed
+        with profile(profiler, "decode", len(train_bufs)) as timer:
+            decode_start = time.perf_counter()
+            decoded = [decode_image(buf, reduced_decode_shape) for buf in train_bufs]
+            decode_seconds = time.perf_counter() - decode_start
+            train_imgs = [img for img, _ in decoded]
+            timer.num_bytes = decoded_bytes = sum(img.nbytes for img in train_imgs)
+        add_counts(
+            source_bytes=read_bytes,
+            decoded_bytes=decoded_bytes,
+            full_decoded_bytes=sum(full_bytes for _, full_bytes in decoded),
+            decode_seconds=decode_seconds,
+        )
+        return train_imgs, source_digests
+
+    def compute(
+        batch: Tuple[List[pathlib.Path], List[List[int]]],
+        loaded: Tuple[List[np.ndarray], Optional[List[str]]],
+    ) -> Iterator[Tuple[Tuple, Optional[np.ndarray]]]:
+        batch_paths, batch_op_idxs = batch
+        train_imgs, source_digests = loaded
+        augment_outputs = augment_batch(
+            augment_ops,
+            batch_paths,
+            train_imgs,
+            seed,
+            batch_op_idxs,
+            source_digests,
+            content_store,
+            profiler,
+            # pipelined outputs wait in the write queue, so they get buffers of their own
+            buffer_pool if pipeline_conf is None else None,
+            buffer_pool,
+            output_settings,
+        )
+
+        # keep the training images of stored outputs, to augment them again if evicted
+        train_paths = {path: img for path, img in zip(batch_paths, train_imgs)}
+        for augment_output in augment_outputs:
+            augment_img, train_img_path = augment_output[:2]
+            stored_img = train_paths[train_img_path] if augment_img is None else None
+            yield augment_output, stored_img
+
+    def recompute(
+        train_img: np.ndarray, train_img_path: pathlib.Path, augment_name: str
+    ) -> np.ndarray:
+        (op_idx,) = [
+            op_idx
+            for op_idx, augment_op in enumerate(augment_ops)
+            if augment_op[0] == augment_name
+        ]
+
+        # augment image alone, drawing as before, without shared buffers
+        (augment_output,) = augment_batch(
+            augment_ops, [train_img_path], [train_img], seed, [[op_idx]]
+        )
+        return augment_output[0]
+
+    def save(
+        augment_img: Optional[np.ndarray],
+        train_img_path: pathlib.Path,
+        augment_name: str,
+        content_key: Optional[str],
+    ) -> Tuple[int, float]:
+        # append augmented image to shards
+        if max_shard_bytes is not None:
+            return save_to_shard(
+                augment_img,
+                train_img_path,
+                augment_name,
+                content_store,
+                content_key,
+                max_shard_bytes,
+                profiler,
+                encode_conf,
+            )
+
+        # save augmented image to file, or link it from content store
+        return save_to_file(
+            augment_img,
+            train_img_path,
+            augment_name,
+            content_store,
+            content_key,
+            profiler,
+            encode_conf,
+        )
+
+    def write(computed: Tuple[Tuple, Optional[np.ndarray]]):
+        augment_output, stored_img = computed
+        try:
+            encoded_bytes, encode_seconds = save(*augment_output)
+        except FileNotFoundError:
+            if stored_img is None:
+                raise
+
+            # stored image was evicted since it was looked up, so augment it again
+            augment_img = recompute(stored_img, *augment_output[1:3])
+            encoded_bytes, encode_seconds = save(augment_img, *augment_output[1:])
+
+        add_counts(encoded_bytes=encoded_bytes, encode_seconds=encode_seconds)
+
+    # overlap decode, augment and encode stages
+    if pipeline_conf is not None:
+        run_pipeline(batches, read, compute, write, pipeline_conf)
+
+    # run stages in turn for each batch
+    else:
+        for batch in batches:
+            for computed in compute(batch, read(batch)):
+                write(computed)
+
+    # index shard records before chunk is recorded as complete
+    if max_shard_bytes is not None:
+        with profile(profiler, "flush", 0):
+            flush_shard_writers()
+
+    return len(pending_paths), counts
+
+
+def profile_chunk(
+    *chunk_args, **chunk_kwargs
+) -> Tuple[int, Dict[str, float], Dict[str, List[float]]]:
+    """Augments a chunk of training images with a profiler of its own, for worker
+    processes to send their profiles back.
+
+    Parameters
+    ----------
+    chunk_args
+        positional arguments of augment_chunk
+    chunk_kwargs
+        keyword arguments of augment_chunk, except profiler
+
+    Returns
+    -------
+    Tuple[int, Dict[str, float], Dict[str, List[float]]]
+        number of images augmented, byte and stage time counters of chunk, and
+        counters of each stage
+    """
+    profiler = Profiler()
+    num_imgs, counts = augment_chunk(*chunk_args, profiler=profiler, **chunk_kwargs)
+    return num_imgs, counts, profiler.stats
+
+
+def plan_chunk(
+    augment_entries: List[Union[str, Dict]],
+    image_dir: pathlib.Path,
+    img_paths: List[pathlib.Path],
+    seed: int,
+    manifest: Dict[str, Dict],
+    *,
+    force: bool = False,
+    io_conf: IOConf = IOConf(),
+    indexed_outputs: Optional[Set[str]] = None,
+) -> Tuple[List[List[int]], List[Dict]]:
+    """Finds augmentation outputs of a chunk that are missing or stale.
+
+    Parameters
+    ----------
+    augment_entries : List[Union[str, Dict]]
+        augmentation config entries of ops to perform
+    image_dir : pathlib.Path
+        directory training images are loaded from
+    img_paths : List[pathlib.Path]
+        paths of training images in chunk
+    seed : int
+        base seed of augmentation run
+    manifest : Dict[str, Dict]
+        records of completed outputs
+    force : bool, optional
+        whether to redo every output, by default False
+    io_conf : IOConf, optional
+        decode, encode and shard options outputs depend on, by default IOConf()
+    indexed_outputs : Optional[Set[str]], optional
+        packed outputs held in intact shards, by default none
+
+    Returns
+    -------
+    Tuple[List[List[int]], List[Dict]]
+        indices of augmentation ops to perform on each image, and records of the
+        outputs they write
+    """
+    augment_names = [
+        get_augment_name(augment_entry) for augment_entry in augment_entries
+    ]
+
+    # shape training images are resized to by a decode cache, if any
+    decode_shape = None
+    if io_conf.decode_cache is not None:
+        decode_shape = io_conf.decode_cache.index["image_shape"]
+
+    img_op_idxs: List[List[int]] = []
+    pending_records: List[Dict] = []
+    for train_img_path in img_paths:
+        train_img_stat = train_img_path.stat()
+
+        # check output of each op on image against manifest
+        op_idxs = []
+        for op_idx, augment_entry in enumerate(augment_entries):
+            record = output_record(
+                image_dir,
+                train_img_path,
+                train_img_stat,
+                augment_names[op_idx],
+                augment_entry,
+                seed,
+                io_conf.max_shard_bytes is not None,
+                decode_shape,
+                io_conf.reduced_decode_shape,
+                io_conf.encode_conf,
+            )
+            if force or not is_up_to_date(image_dir, record, manifest, indexed_outputs):
+                op_idxs.append(op_idx)
+                pending_records.append(record)
+
+        img_op_idxs.append(op_idxs)
+
+    return img_op_idxs, pending_records
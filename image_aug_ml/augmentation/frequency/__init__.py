@@ -1,3 +1,4 @@
-from .lowpass_filt import lowpass
-from .bandpass_filt import bandpass
-from .highpass_filt import highpass
+from .freq_filter import distance_grid_cache, gaussian_cache
+from .lowpass_filt import lowpass, lowpass_batch
+from .bandpass_filt import bandpass, bandpass_batch
+from .highpass_filt import highpass, highpass_batch
@@ -1,15 +1,39 @@
+from typing import Optional
+
 import numpy as np
 
-from .freq_filter import freq_filt, gaussian
+from image_aug_ml.utils import BufferPool, get_rng
+
+from .freq_filter import (
+    freq_filt_batch,
+    freq_filt_half,
+    gaussian_half,
+    gaussian_half_batch,
+)
 
 
-def lowpass(orig_img: np.ndarray) -> np.ndarray:
+def lowpass(
+    orig_img: np.ndarray,
+    workers: Optional[int] = None,
+    cutoff_quantum: Optional[float] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
     """Lowpass filters image and returns result.
 
     Parameters
     ----------
     orig_img : np.ndarray
         original image to lowpass filter
+    workers : Optional[int], optional
+        number of FFT worker threads, -1 for all cores, by default one
+    cutoff_quantum : Optional[float], optional
+        grid to snap cutoff frequencies to, so that repeated transfer functions are
+        cached, by default no snapping
+    out : Optional[np.ndarray], optional
+        array to write lowpass filtered image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
 
     Returns
     -------
@@ -17,11 +41,50 @@ def lowpass(orig_img: np.ndarray) -> np.ndarray:
         lowpass filtered image
     """
     # cutoff frequency generation (from 1 to 25)
-    cutoff_freq = np.random.uniform(1, 25)
+    cutoff_freq = get_rng().uniform(1, 25)
 
-    # create gaussian transfer function
+    # create gaussian transfer function, in half-spectrum layout
     M, N = orig_img.shape[:2]
-    transfer_func = gaussian((M * 2, N * 2), cutoff_freq)
+    transfer_func = gaussian_half((M * 2, N * 2), cutoff_freq, cutoff_quantum)
 
     # frequency filter and return image
-    return freq_filt(orig_img, transfer_func)
+    return freq_filt_half(orig_img, transfer_func, workers, out, workspace)
+
+
+def lowpass_batch(
+    orig_imgs: np.ndarray,
+    workers: Optional[int] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Lowpass filters each image in a stack with its own cutoff and returns result.
+
+    Parameters
+    ----------
+    orig_imgs : np.ndarray
+        stack of original images to lowpass filter, (N, M, N, C) array
+    workers : Optional[int], optional
+        number of FFT worker threads, -1 for all cores, by default one
+    out : Optional[np.ndarray], optional
+        array to write stack of lowpass filtered images to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        stack of lowpass filtered images
+    """
+    # cutoff frequency generation (from 1 to 25)
+    cutoff_freqs = get_rng().uniform(1, 25, size=len(orig_imgs))
+
+    # create gaussian transfer functions, one chunk at a time
+    M, N = orig_imgs.shape[1:3]
+
+    def make_transfer_funcs(chunk: slice) -> np.ndarray:
+        return gaussian_half_batch((M * 2, N * 2), cutoff_freqs[chunk])
+
+    # frequency filter and return images
+    return freq_filt_batch(
+        orig_imgs, make_transfer_funcs, workers, out=out, workspace=workspace
+    )
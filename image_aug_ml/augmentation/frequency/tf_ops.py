@@ -0,0 +1,164 @@
+from typing import Tuple
+
+import tensorflow as tf
+
+from .freq_filter import distance_grid_cache, half_distance_grid
+
+
+def gaussian_half_batch(dims: Tuple[int, int], cutoff_freqs: tf.Tensor) -> tf.Tensor:
+    """Creates stack of gaussian transfer functions, one per cutoff frequency, in the
+    half-spectrum layout of a real-input FFT, like freq_filter.gaussian_half_batch.
+
+    Parameters
+    ----------
+    dims : Tuple[int, int]
+        dimensions of (full, centered) gaussian transfer functions
+    cutoff_freqs : tf.Tensor
+        cutoff frequency of each gaussian, (B,) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of transfer functions, (B, dims[0], dims[1] // 2 + 1) float32 tensor
+    """
+    dims = tuple(dims)
+    dist_sq, dist_sq_negated, (dist_sq_min, dist_sq_max) = (
+        distance_grid_cache.get_or_build(
+            ("half", dims), lambda: half_distance_grid(dims)
+        )
+    )
+
+    # compute all transfer functions as one broadcast tensor
+    cutoff_freqs = tf.cast(cutoff_freqs, tf.float32)[:, None, None]
+    scale = -1 / (2 * tf.square(cutoff_freqs))
+    transfer_funcs = (
+        tf.exp(tf.constant(dist_sq, tf.float32) * scale)
+        + tf.exp(tf.constant(dist_sq_negated, tf.float32) * scale)
+    ) / 2
+    tf_max, tf_min = tf.exp(dist_sq_min * scale), tf.exp(dist_sq_max * scale)
+
+    # normalize and return transfer funcs
+    return (transfer_funcs - tf_max) / (tf_max - tf_min)
+
+
+def freq_filt(orig_imgs: tf.Tensor, transfer_funcs: tf.Tensor) -> tf.Tensor:
+    """Frequency filters each image in a stack with its own transfer function, like
+    freq_filter.freq_filt_batch.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to frequency filter, (B, M, N, C) tensor with static
+        height and width
+    transfer_funcs : tf.Tensor
+        transfer function of each image, in the half-spectrum layout returned by
+        gaussian_half_batch, (B, 2M, N + 1) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of frequency filtered uint8 images
+    """
+    M, N = orig_imgs.shape[1:3]
+
+    # pad and center the input images, with channels first for the FFT
+    padded_imgs = tf.pad(
+        tf.transpose(tf.cast(orig_imgs, tf.float32), [0, 3, 1, 2]),
+        [[0, 0], [0, 0], [M // 2, M - M // 2], [N // 2, N - N // 2]],
+    )
+
+    # take fft of images, multiply by their transfer funcs and take ifft
+    f_imgs = tf.signal.rfft2d(padded_imgs)
+    f_imgs *= tf.cast(transfer_funcs[:, None], tf.complex64)
+    filtered_imgs = tf.signal.irfft2d(f_imgs, fft_length=[2 * M, 2 * N])
+
+    # slice to remove padding
+    filtered_imgs = tf.transpose(
+        filtered_imgs[:, :, M // 2 : M // 2 + M, N // 2 : N // 2 + N], [0, 2, 3, 1]
+    )
+
+    # scale each image by its own range
+    imgs_min = tf.reduce_min(filtered_imgs, axis=[1, 2, 3], keepdims=True)
+    imgs_max = tf.reduce_max(filtered_imgs, axis=[1, 2, 3], keepdims=True)
+    return tf.cast(255 * (filtered_imgs - imgs_min) / (imgs_max - imgs_min), tf.uint8)
+
+
+def lowpass(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Lowpass filters each image in a stack with its own cutoff and returns result.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to lowpass filter, (B, M, N, C) tensor with static
+        height and width
+
+    Returns
+    -------
+    tf.Tensor
+        stack of lowpass filtered images
+    """
+    # cutoff frequency generation (from 1 to 25)
+    cutoff_freqs = tf.random.uniform(tf.shape(orig_imgs)[:1], 1, 25)
+
+    # create gaussian transfer functions
+    M, N = orig_imgs.shape[1:3]
+    transfer_funcs = gaussian_half_batch((M * 2, N * 2), cutoff_freqs)
+
+    # frequency filter and return images
+    return freq_filt(orig_imgs, transfer_funcs)
+
+
+def highpass(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Highpass filters each image in a stack with its own cutoff and returns result.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to highpass filter, (B, M, N, C) tensor with static
+        height and width
+
+    Returns
+    -------
+    tf.Tensor
+        stack of highpass filtered images
+    """
+    # cutoff frequency generation (from 1 to 25)
+    cutoff_freqs = tf.random.uniform(tf.shape(orig_imgs)[:1], 1, 25)
+
+    # create gaussian transfer functions
+    M, N = orig_imgs.shape[1:3]
+    transfer_funcs = 1 - gaussian_half_batch((M * 2, N * 2), cutoff_freqs)
+
+    # frequency filter and return images
+    return freq_filt(orig_imgs, transfer_funcs)
+
+
+def bandpass(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Bandpass filters each image in a stack with its own cutoff and returns result.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to bandpass filter, (B, M, N, C) tensor with static
+        height and width
+
+    Returns
+    -------
+    tf.Tensor
+        stack of bandpass filtered images
+    """
+    # cutoff frequencies generation (from 1 to 25)
+    low_cutoff_freqs = tf.random.uniform(tf.shape(orig_imgs)[:1], 1, 12.5)
+    high_cutoff_freqs = low_cutoff_freqs + 5
+    high_cutoff_freqs += tf.random.uniform(tf.shape(orig_imgs)[:1]) * (
+        25 - high_cutoff_freqs
+    )
+
+    # create gaussian transfer functions
+    M, N = orig_imgs.shape[1:3]
+    transfer_funcs = gaussian_half_batch(
+        (M * 2, N * 2), high_cutoff_freqs
+    ) - gaussian_half_batch((M * 2, N * 2), low_cutoff_freqs)
+
+    # frequency filter and return images
+    return freq_filt(orig_imgs, transfer_funcs)
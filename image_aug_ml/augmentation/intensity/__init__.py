@@ -1,3 +1,4 @@
 from .amf import amf
 from .invert import invert
 from .hist_eq import hist_eq
+from .pointwise import pointwise
@@ -1,11 +1,22 @@
-from typing import Tuple
+from typing import Callable, Dict, Optional, Tuple
 
 import numpy as np
 
+from image_aug_ml.utils import BufferPool, get_buffer
 
-def build_kernel(img: np.ndarray, ii: int, jj: int, kernel_size: int) -> np.ndarray:
+
+# largest kernel size for which sorting windows beats running histograms
+HISTOGRAM_KERNEL_THRESHOLD = 25
+
+
+def build_kernel(
+    img: np.ndarray, ii: int, jj: int, kernel_size: int, centered: bool = False
+) -> np.ndarray:
     """Builds kernel from image at coords ii, jj with provided kernel size.
 
+    By default the kernel spans kernel_size - 1 pixels, from kernel_size // 2 before
+    the coordinate up to the coordinate itself, matching the original filter.
+
     Parameters
     ----------
     img : np.ndarray
@@ -16,6 +27,8 @@ def build_kernel(img: np.ndarray, ii: int, jj: int, kernel_size: int) -> np.ndar
         col coordinate
     kernel_size : int
         size of kernel
+    centered : bool, optional
+        whether to center a full kernel_size window on the coordinate, by default False
 
     Returns
     -------
@@ -24,11 +37,12 @@ def build_kernel(img: np.ndarray, ii: int, jj: int, kernel_size: int) -> np.ndar
     """
     # find kernel widths
     kernel_width = int(kernel_size / 2)
+    kernel_end = kernel_width + 1 if centered else kernel_width
 
     # build and return kernel
     return img[
-        max(0, ii - kernel_width) : min(ii + kernel_width, img.shape[0]),
-        max(0, jj - kernel_width) : min(jj + kernel_width, img.shape[1]),
+        max(0, ii - kernel_width) : min(ii + kernel_end, img.shape[0]),
+        max(0, jj - kernel_width) : min(jj + kernel_end, img.shape[1]),
     ]
 
 
@@ -76,9 +90,14 @@ def level_b(z_xy: int, z_min: int, z_med: int, z_max: int) -> int:
 
 
 def level_a(
-    orig_img: np.ndarray, ii: int, jj: int, kernel_size: int, max_kernel_size: int
+    orig_img: np.ndarray,
+    ii: int,
+    jj: int,
+    kernel_size: int,
+    max_kernel_size: int,
+    centered: bool = False,
 ) -> int:
-    """Performs level A of AMF procedure
+    """Performs level A of AMF procedure for a single pixel
 
     Parameters
     ----------
@@ -92,6 +111,8 @@ def level_a(
         size of median filter kernel
     max_kernel_size : int
         maximum size of median filter kernel
+    centered : bool, optional
+        whether to center kernels on the coordinate, by default False
 
     Returns
     -------
@@ -99,7 +120,7 @@ def level_a(
         filtered intensity value at coordinate
     """
     # create kernel
-    kernel = build_kernel(orig_img, ii, jj, kernel_size)
+    kernel = build_kernel(orig_img, ii, jj, kernel_size, centered)
 
     # get kernel statistics
     z_min, z_med, z_max = get_kernel_stats(kernel)
@@ -113,14 +134,239 @@ def level_a(
 
     # if kernel size is less than max, repeat level A
     if kernel_size <= max_kernel_size:
-        return level_a(orig_img, ii, jj, kernel_size, max_kernel_size)
+        return level_a(orig_img, ii, jj, kernel_size, max_kernel_size, centered)
 
     # otherwise return median
     return z_med
 
 
+def window_stats(
+    channel: np.ndarray, kernel_size: int, centered: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Computes minimum, median, and maximum of the kernel around every pixel at once.
+
+    Kernels match build_kernel, including their clipping at the image border.
+
+    Parameters
+    ----------
+    channel : np.ndarray
+        single channel image array
+    kernel_size : int
+        size of kernel
+    centered : bool, optional
+        whether to center kernels on each pixel, by default False
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        minimum, median, and maximum maps, each the shape of the channel
+    """
+    height, width = channel.shape
+
+    # find kernel extent before and after each pixel
+    kernel_width = int(kernel_size / 2)
+    before, after = kernel_width, kernel_width if centered else kernel_width - 1
+    window = before + after + 1
+
+    # pad with NaN so that out-of-image pixels sort after all in-image pixels
+    work_dtype = np.promote_types(channel.dtype, np.float32)
+    padded = np.pad(
+        channel.astype(work_dtype),
+        ((before, after), (before, after)),
+        constant_values=np.nan,
+    )
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (window, window))
+    sorted_windows = np.sort(windows.reshape(height, width, -1), axis=-1)
+
+    # count in-image pixels of each kernel
+    rows, cols = np.ogrid[:height, :width]
+    num_rows = np.minimum(rows + after, height - 1) - np.maximum(rows - before, 0) + 1
+    num_cols = np.minimum(cols + after, width - 1) - np.maximum(cols - before, 0) + 1
+    num_pixels = num_rows * num_cols
+
+    def order_stat(rank: np.ndarray) -> np.ndarray:
+        return np.take_along_axis(sorted_windows, rank[..., None], axis=-1)[..., 0]
+
+    # find statistics, median is the mean of the middle pair for even counts
+    z_min = sorted_windows[..., 0]
+    z_max = order_stat(num_pixels - 1)
+    z_med = (order_stat((num_pixels - 1) // 2) + order_stat(num_pixels // 2)) / 2
+
+    return z_min, z_med, z_max
+
+
+def window_stats_histogram(
+    channel: np.ndarray, kernel_size: int, centered: bool = False
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Computes minimum, median, and maximum of the kernel around every pixel using
+    running histograms, for uint8 channels.
+
+    A 256-bin histogram is kept per column and updated incrementally as the kernel
+    slides down the rows (as in Huang's running median), and kernel histograms are
+    summed from column histograms for a whole row at once, so the cost per pixel
+    does not grow with the kernel size.
+
+    Parameters
+    ----------
+    channel : np.ndarray
+        single channel uint8 image array
+    kernel_size : int
+        size of kernel
+    centered : bool, optional
+        whether to center kernels on each pixel, by default False
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        minimum, median, and maximum maps, each the shape of the channel
+    """
+    assert channel.dtype == np.uint8, "Histogram backend requires a uint8 channel"
+    height, width = channel.shape
+
+    # find kernel extent before and after each pixel
+    kernel_width = int(kernel_size / 2)
+    before, after = kernel_width, kernel_width if centered else kernel_width - 1
+    window = before + after + 1
+    count_dtype = np.int16 if window * window < 2 ** 15 else np.int32
+
+    # find first and last column of each kernel
+    cols = np.arange(width)
+    first_col = np.maximum(cols - before, 0)
+    last_col = np.minimum(cols + after, width - 1)
+
+    # minimum, median pair, and maximum of each kernel, by row
+    order_stats = np.empty((height, width, 4), dtype=np.float32)
+
+    # column histograms, offset by one column so that they can be prefix summed
+    col_hists = np.zeros((width + 1, 256), dtype=count_dtype)
+    col_prefix = np.empty_like(col_hists)
+    for row in range(min(after, height)):
+        col_hists[cols + 1, channel[row]] += 1
+
+    for row in range(height):
+        # slide column histograms down by one row
+        if row + after < height:
+            col_hists[cols + 1, channel[row + after]] += 1
+        if row - before - 1 >= 0:
+            col_hists[cols + 1, channel[row - before - 1]] -= 1
+
+        # sum column histograms over each kernel's columns
+        np.cumsum(col_hists, axis=0, out=col_prefix)
+        kernel_hists = col_prefix[last_col + 1] - col_prefix[first_col]
+
+        # find intensity at each rank from the cumulative histogram
+        cum_hists = np.cumsum(kernel_hists, axis=-1, out=kernel_hists)
+        num_pixels = cum_hists[:, -1:]
+        ranks = np.hstack(
+            [0 * num_pixels, (num_pixels - 1) // 2, num_pixels // 2, num_pixels - 1]
+        )
+        order_stats[row] = np.count_nonzero(
+            cum_hists[:, None, :] <= ranks[:, :, None], axis=-1
+        )
+
+    # median is the mean of the middle pair for even counts
+    z_med = (order_stats[..., 1] + order_stats[..., 2]) / 2
+
+    return order_stats[..., 0], z_med, order_stats[..., 3]
+
+
+AMF_BACKENDS: Dict[str, Callable[..., Tuple[np.ndarray, np.ndarray, np.ndarray]]] = {
+    "sort": window_stats,
+    "histogram": window_stats_histogram,
+}
+
+
+def select_backend(dtype: np.dtype, kernel_size: int) -> str:
+    """Selects AMF window statistics backend for image dtype and kernel size.
+
+    Parameters
+    ----------
+    dtype : np.dtype
+        dtype of image to filter
+    kernel_size : int
+        size of median filter kernel
+
+    Returns
+    -------
+    str
+        "histogram" for uint8 images with large kernels, otherwise "sort"
+    """
+    if dtype == np.uint8 and kernel_size > HISTOGRAM_KERNEL_THRESHOLD:
+        return "histogram"
+    return "sort"
+
+
+def amf_channel(
+    channel: np.ndarray,
+    init_kernel_size: int,
+    max_kernel_size: int,
+    centered: bool = False,
+    backend: Optional[str] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Performs adaptive median filtering on a single channel, resolving level A and
+    level B for every pixel with masks.
+
+    Parameters
+    ----------
+    channel : np.ndarray
+        single channel image array
+    init_kernel_size : int
+        initial size of median filter kernel
+    max_kernel_size : int
+        maximum size of median filter kernel
+    centered : bool, optional
+        whether to center kernels on each pixel, by default False
+    backend : Optional[str], optional
+        window statistics backend, one of AMF_BACKENDS, by default chosen for each
+        kernel size by select_backend
+    workspace : Optional[BufferPool], optional
+        pool to take filtered channel and mask buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        adaptive median filtered channel, in the working float dtype, held by the
+        workspace if one is given
+    """
+    filtered = get_buffer(
+        workspace,
+        "amf.filtered",
+        channel.shape,
+        np.promote_types(channel.dtype, np.float32),
+    )
+    unresolved = get_buffer(workspace, "amf.unresolved", channel.shape, bool)
+    unresolved.fill(True)
+
+    # grow kernel until median is strictly between min and max (level A)
+    for kernel_size in range(
+        init_kernel_size, max(init_kernel_size, max_kernel_size) + 1, 2
+    ):
+        kernel_backend = backend or select_backend(channel.dtype, kernel_size)
+        z_min, z_med, z_max = AMF_BACKENDS[kernel_backend](
+            channel, kernel_size, centered
+        )
+
+        # keep intensity if in range of kernel, otherwise take median (level B)
+        resolved = unresolved & (z_min < z_med) & (z_med < z_max)
+        keep = (z_min < channel) & (channel < z_max)
+        filtered[resolved] = np.where(keep, channel, z_med)[resolved]
+        unresolved &= ~resolved
+
+    # pixels that never resolved take the median of the largest kernel
+    filtered[unresolved] = z_med[unresolved]
+
+    return filtered
+
+
 def amf(
-    orig_img: np.ndarray, init_kernel_size: int = 3, max_kernel_size: int = 7
+    orig_img: np.ndarray,
+    init_kernel_size: int = 3,
+    max_kernel_size: int = 7,
+    centered: bool = False,
+    backend: Optional[str] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
 ) -> np.ndarray:
     """Performs adaptive median filtering on original image.
 
@@ -132,6 +378,16 @@ def amf(
         initial size of median filter kernel, by default 3
     max_kernel_size : int
         maximum size of median filter kernel, by default 7
+    centered : bool
+        whether to center a full kernel_size window on each pixel, by default False
+        (kernels span kernel_size - 1 pixels up to and including each pixel)
+    backend : Optional[str]
+        window statistics backend, "sort" or "histogram" (uint8 only), by default
+        chosen from image dtype and each kernel size
+    out : Optional[np.ndarray], optional
+        array to write filtered image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
 
     Returns
     -------
@@ -142,14 +398,20 @@ def amf(
     assert init_kernel_size % 2 == 1, "Initial kernel size must be odd"
     assert max_kernel_size % 2 == 1, "Max kernel size must be odd"
 
+    assert backend is None or backend in AMF_BACKENDS, f"Unknown AMF backend: {backend}"
+
     # construct output image
-    amf_img = np.empty_like(orig_img)
+    amf_img = np.empty_like(orig_img) if out is None else out
 
-    # iterate over pixels in image
-    for ii, jj, kk in np.ndindex(*orig_img.shape):
-        # set filtered value of pixel
-        amf_img[ii, jj, kk] = level_a(
-            orig_img[:, :, kk], ii, jj, init_kernel_size, max_kernel_size
+    # filter each channel
+    for kk in range(orig_img.shape[-1]):
+        amf_img[:, :, kk] = amf_channel(
+            orig_img[:, :, kk],
+            init_kernel_size,
+            max_kernel_size,
+            centered,
+            backend,
+            workspace,
         )
 
     # return filtered image
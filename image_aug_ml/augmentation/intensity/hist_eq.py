@@ -1,25 +1,41 @@
+from typing import Optional
+
 import numpy as np
 
+from image_aug_ml.utils import BufferPool
+
+from .pointwise import apply_lut, channel_hists, hist_eq_lut
+
 
-def hist_eq(orig_img: np.ndarray) -> np.ndarray:
+def hist_eq(
+    orig_img: np.ndarray,
+    per_channel: bool = False,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
     """Performs histogram equalization on the provided image
 
+    The histograms of all channels are counted with a single bincount.
+
     Parameters
     ----------
     orig_img : np.ndarray
-        image to histogram equalize
+        uint8 image to histogram equalize
+    per_channel : bool, optional
+        whether to equalize each channel by its own histogram, by default False (all
+        channels by their combined histogram)
+    out : Optional[np.ndarray], optional
+        array to write histogram equalized image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
 
     Returns
     -------
     np.ndarray
         histogram equalized image
     """
-    # create normalized cumulative histogram
-    hist_arr = np.bincount(orig_img.ravel())
-    cum_hist_arr = np.cumsum(hist_arr / np.sum(hist_arr))
-
-    # generate transformation lookup table
-    transform_lut = np.floor(255 * cum_hist_arr).astype(np.uint8)
+    # generate transformation lookup table(s) from channel histograms
+    transform_lut = hist_eq_lut(channel_hists(orig_img, per_channel), per_channel)
 
     # perform lookups and return resulting histogram equalized image
-    return transform_lut[orig_img]
+    return apply_lut(orig_img, transform_lut, out)
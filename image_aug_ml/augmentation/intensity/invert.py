@@ -1,13 +1,25 @@
+from typing import Optional
+
 import numpy as np
 
+from image_aug_ml.utils import BufferPool
+
 
-def invert(orig_img: np.ndarray) -> np.ndarray:
+def invert(
+    orig_img: np.ndarray,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
     """Inverts image intensities.
 
     Parameters
     ----------
     orig_img : np.ndarray
         original image to invert
+    out : Optional[np.ndarray], optional
+        array to write inverted image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
 
     Returns
     -------
@@ -23,4 +35,4 @@ def invert(orig_img: np.ndarray) -> np.ndarray:
         orig_img = (255 * orig_img).astype(np.uint8)
 
     # invert image intensities and return
-    return 255 - orig_img
+    return np.subtract(255, orig_img, out=out)
@@ -0,0 +1,216 @@
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from image_aug_ml.utils import BufferPool
+
+
+def channel_hists(img: np.ndarray, per_channel: bool = True) -> np.ndarray:
+    """Counts the intensity histogram of each channel of a uint8 image with a single
+    bincount, offsetting the intensities of each channel into its own 256 bins.
+
+    Parameters
+    ----------
+    img : np.ndarray
+        uint8 image, (H, W, C) or (H, W) array
+    per_channel : bool, optional
+        whether to count each channel separately, by default True (otherwise all
+        channels are counted together, skipping the offsets)
+
+    Returns
+    -------
+    np.ndarray
+        histogram of each channel, (C, 256) array, or (1, 256) if not per channel
+    """
+    if not per_channel:
+        return np.bincount(img.ravel(), minlength=256)[None]
+
+    num_channels = img.shape[-1] if img.ndim == 3 else 1
+
+    # offset each channel's intensities, then count all channels at once
+    offsets = 256 * np.arange(num_channels, dtype=np.uint16)
+    offset_intensities = img.reshape(-1, num_channels) + offsets
+    return np.bincount(
+        offset_intensities.ravel(), minlength=256 * num_channels
+    ).reshape(num_channels, 256)
+
+
+def invert_lut(hists: Optional[np.ndarray]) -> np.ndarray:
+    """Builds lookup table inverting intensities.
+
+    Parameters
+    ----------
+    hists : Optional[np.ndarray]
+        histogram of each channel, unused
+
+    Returns
+    -------
+    np.ndarray
+        lookup table, (256,) uint8 array
+    """
+    return np.arange(255, -1, -1, dtype=np.uint8)
+
+
+def hist_eq_lut(hists: np.ndarray, per_channel: bool = False) -> np.ndarray:
+    """Builds histogram equalization lookup table(s) from channel histograms.
+
+    Parameters
+    ----------
+    hists : np.ndarray
+        histogram of each channel, (C, 256) array
+    per_channel : bool, optional
+        whether to equalize each channel by its own histogram, by default False (all
+        channels by their combined histogram)
+
+    Returns
+    -------
+    np.ndarray
+        lookup table, (256,) uint8 array, or (C, 256) array if per channel
+    """
+    if not per_channel:
+        hists = hists.sum(axis=0)
+
+    # create normalized cumulative histograms
+    cum_hists = np.cumsum(hists / hists.sum(axis=-1, keepdims=True), axis=-1)
+
+    # generate transformation lookup tables
+    return np.floor(255 * cum_hists).astype(np.uint8)
+
+
+# lookup table builders of pointwise ops, taking channel histograms of their input
+POINTWISE_LUTS: Dict[str, Callable[..., np.ndarray]] = {
+    "invert": invert_lut,
+    "hist_eq": hist_eq_lut,
+}
+
+# pointwise ops whose lookup tables depend on the histograms of their input
+HISTOGRAM_OPS = {"hist_eq"}
+
+
+def compose_lut(
+    orig_img: np.ndarray,
+    ops: Sequence[str],
+    op_kwargs: Optional[Dict[str, Dict]] = None,
+) -> np.ndarray:
+    """Builds the lookup table of each pointwise op and composes them into a single
+    table per channel.
+
+    The histograms an op sees are those of the original image moved through the
+    tables of the ops before it, so the image is only read once to count them.
+    Channels share a single table unless an op is given per_channel=True.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        uint8 image to transform
+    ops : Sequence[str]
+        names of pointwise ops to chain, in the order they are applied
+    op_kwargs : Optional[Dict[str, Dict]], optional
+        keyword arguments for each op's table builder, keyed by op name, by default
+        none
+
+    Returns
+    -------
+    np.ndarray
+        composed lookup table of each channel, (C, 256) uint8 array, or (1, 256)
+        if shared by all channels
+    """
+    op_kwargs = op_kwargs or {}
+
+    # keep a table per channel only if an op needs one
+    per_channel = any(op_kwargs.get(op, {}).get("per_channel", False) for op in ops)
+    num_channels = orig_img.shape[-1] if per_channel and orig_img.ndim == 3 else 1
+
+    # count histograms only if an op depends on them
+    hists = None
+    if any(op in HISTOGRAM_OPS for op in ops):
+        hists = channel_hists(orig_img, per_channel)
+
+    lut = np.tile(np.arange(256, dtype=np.uint8), (num_channels, 1))
+    offsets = 256 * np.arange(num_channels)[:, None]
+    for op in ops:
+        # move original histograms through the tables of the ops so far
+        op_hists = None
+        if hists is not None:
+            op_hists = np.bincount(
+                (lut + offsets).ravel(), hists.ravel(), minlength=256 * num_channels
+            ).reshape(num_channels, 256)
+
+        # look up composed table's outputs in op's table
+        op_lut = np.broadcast_to(
+            POINTWISE_LUTS[op](op_hists, **op_kwargs.get(op, {})), lut.shape
+        )
+        lut = np.take_along_axis(op_lut, lut.astype(np.intp), axis=-1)
+
+    return lut
+
+
+def apply_lut(
+    orig_img: np.ndarray, lut: np.ndarray, out: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Maps intensities of a uint8 image through lookup table(s) in a single pass.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        uint8 image to map
+    lut : np.ndarray
+        lookup table shared by all channels, (256,) or (1, 256) array, or table of
+        each channel, (C, 256) array
+    out : Optional[np.ndarray], optional
+        array to write mapped image to, by default a new array
+
+    Returns
+    -------
+    np.ndarray
+        mapped image
+    """
+    # tables shared by all channels are applied with a single take
+    if lut.ndim == 2 and (lut == lut[:1]).all():
+        lut = lut[0]
+    if lut.ndim == 1:
+        return np.take(lut, orig_img, out=out)
+
+    # otherwise map each channel through its own table
+    mapped_img = np.empty_like(orig_img) if out is None else out
+    for channel, channel_lut in enumerate(lut):
+        np.take(channel_lut, orig_img[..., channel], out=mapped_img[..., channel])
+
+    return mapped_img
+
+
+def pointwise(
+    orig_img: np.ndarray,
+    ops: Sequence[str] = ("invert", "hist_eq"),
+    op_kwargs: Optional[Dict[str, Dict]] = None,
+    out: Optional[np.ndarray] = None,
+    workspace: Optional[BufferPool] = None,
+) -> np.ndarray:
+    """Applies a chain of pointwise intensity ops to a uint8 image in a single pass,
+    through their composed lookup tables.
+
+    Parameters
+    ----------
+    orig_img : np.ndarray
+        uint8 image to transform
+    ops : Sequence[str], optional
+        names of pointwise ops to chain, in the order they are applied, by default
+        ("invert", "hist_eq")
+    op_kwargs : Optional[Dict[str, Dict]], optional
+        keyword arguments for each op's table builder, keyed by op name, by default
+        none
+    out : Optional[np.ndarray], optional
+        array to write transformed image to, by default a new array
+    workspace : Optional[BufferPool], optional
+        pool to take scratch buffers from, by default new buffers
+
+    Returns
+    -------
+    np.ndarray
+        transformed image
+    """
+    assert all(op in POINTWISE_LUTS for op in ops), f"Unknown pointwise op in {ops}"
+    assert orig_img.dtype == np.uint8, "Pointwise ops require a uint8 image"
+
+    # compose tables, then map and return image
+    return apply_lut(orig_img, compose_lut(orig_img, ops, op_kwargs), out)
@@ -0,0 +1,203 @@
+from typing import Tuple
+
+import numpy as np
+import tensorflow as tf
+
+
+# sorts after every intensity, so that out-of-image pixels sort last in a window
+PAD_VALUE = np.finfo(np.float32).max
+
+
+def invert(orig_imgs: tf.Tensor) -> tf.Tensor:
+    """Inverts intensities of each image in a stack.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of original images to invert, (B, H, W, C) tensor
+
+    Returns
+    -------
+    tf.Tensor
+        stack of inverted uint8 images
+    """
+    # if images aren't uint8, normalize each and convert to it
+    if orig_imgs.dtype != tf.uint8:
+        float_imgs = tf.cast(orig_imgs, tf.float32)
+        float_imgs /= tf.reduce_max(float_imgs, axis=[1, 2, 3], keepdims=True)
+        orig_imgs = tf.cast(255 * float_imgs, tf.uint8)
+
+    # invert image intensities and return
+    return 255 - orig_imgs
+
+
+def hist_eq(orig_imgs: tf.Tensor, per_channel: bool = False) -> tf.Tensor:
+    """Performs histogram equalization on each uint8 image in a stack.
+
+    Histograms of all images are counted with a single bincount, offsetting the
+    intensities of each image (and channel, if per channel) into its own 256 bins.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of uint8 images to histogram equalize, (B, H, W, C) tensor
+    per_channel : bool, optional
+        whether to equalize each channel by its own histogram, by default False (all
+        channels by their combined histogram)
+
+    Returns
+    -------
+    tf.Tensor
+        stack of histogram equalized images
+    """
+    num_imgs = tf.shape(orig_imgs)[0]
+    num_channels = tf.shape(orig_imgs)[3]
+    num_hists = num_imgs * num_channels if per_channel else num_imgs
+
+    # count histogram of each image, or of each channel of each image
+    intensities = tf.reshape(tf.cast(orig_imgs, tf.int32), [num_imgs, -1, num_channels])
+    hist_idxs = tf.range(num_imgs)[:, None, None]
+    if per_channel:
+        hist_idxs = hist_idxs * num_channels + tf.range(num_channels)
+    hists = tf.reshape(
+        tf.math.bincount(intensities + 256 * hist_idxs, minlength=256 * num_hists),
+        [num_imgs, -1, 256],
+    )
+
+    # create normalized cumulative histograms, in double precision like hist_eq
+    hists = tf.cast(hists, tf.float64)
+    cum_hists = tf.cumsum(hists / tf.reduce_sum(hists, axis=-1, keepdims=True), axis=-1)
+
+    # generate transformation lookup tables, (B, 1 or C, 256)
+    transform_luts = tf.cast(tf.floor(255 * cum_hists), tf.uint8)
+
+    # perform lookups of each channel and return histogram equalized images
+    channel_luts = tf.broadcast_to(transform_luts, [num_imgs, num_channels, 256])
+    channels = tf.transpose(tf.cast(orig_imgs, tf.int32), [0, 3, 1, 2])
+    equalized = tf.gather(
+        channel_luts, tf.reshape(channels, [num_imgs, num_channels, -1]), batch_dims=2
+    )
+    return tf.transpose(tf.reshape(equalized, tf.shape(channels)), [0, 2, 3, 1])
+
+
+def window_stats(
+    channels: tf.Tensor, kernel_size: int, centered: bool = False
+) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor]:
+    """Computes minimum, median, and maximum of the kernel around every pixel of
+    every channel, like amf.window_stats.
+
+    Every window is extracted and sorted, so memory use grows with the square of
+    the kernel size.
+
+    Parameters
+    ----------
+    channels : tf.Tensor
+        stack of float32 images, (B, H, W, C) tensor with static height and width
+    kernel_size : int
+        size of kernel
+    centered : bool, optional
+        whether to center kernels on each pixel, by default False
+
+    Returns
+    -------
+    Tuple[tf.Tensor, tf.Tensor, tf.Tensor]
+        minimum, median, and maximum maps, each the shape of the channels
+    """
+    height, width = channels.shape[1:3]
+
+    # find kernel extent before and after each pixel
+    kernel_width = int(kernel_size / 2)
+    before, after = kernel_width, kernel_width if centered else kernel_width - 1
+    window = before + after + 1
+
+    # pad so that out-of-image pixels sort after all in-image pixels
+    padded = tf.pad(
+        channels,
+        [[0, 0], [before, after], [before, after], [0, 0]],
+        constant_values=PAD_VALUE,
+    )
+    windows = tf.image.extract_patches(
+        padded,
+        sizes=[1, window, window, 1],
+        strides=[1, 1, 1, 1],
+        rates=[1, 1, 1, 1],
+        padding="VALID",
+    )
+
+    # sort each channel's window, (B, H, W, C, window * window)
+    windows = tf.reshape(
+        windows, [-1, height, width, window * window, channels.shape[3]]
+    )
+    sorted_windows = tf.sort(tf.transpose(windows, [0, 1, 2, 4, 3]), axis=-1)
+
+    # count in-image pixels of each kernel
+    rows, cols = np.ogrid[:height, :width]
+    num_rows = np.minimum(rows + after, height - 1) - np.maximum(rows - before, 0) + 1
+    num_cols = np.minimum(cols + after, width - 1) - np.maximum(cols - before, 0) + 1
+    num_pixels = (num_rows * num_cols)[None, :, :, None, None]
+
+    def order_stat(rank: np.ndarray) -> tf.Tensor:
+        rank_idxs = tf.broadcast_to(
+            tf.constant(rank, tf.int32), tf.shape(sorted_windows[..., :1])
+        )
+        return tf.gather(sorted_windows, rank_idxs, axis=-1, batch_dims=4)[..., 0]
+
+    # find statistics, median is the mean of the middle pair for even counts
+    z_min = sorted_windows[..., 0]
+    z_max = order_stat(num_pixels - 1)
+    z_med = (order_stat((num_pixels - 1) // 2) + order_stat(num_pixels // 2)) / 2
+
+    return z_min, z_med, z_max
+
+
+def amf(
+    orig_imgs: tf.Tensor,
+    init_kernel_size: int = 3,
+    max_kernel_size: int = 7,
+    centered: bool = False,
+) -> tf.Tensor:
+    """Performs windowed adaptive median filtering on each image in a stack,
+    resolving level A and level B for every pixel with masks, like amf.amf_channel.
+
+    Parameters
+    ----------
+    orig_imgs : tf.Tensor
+        stack of images to perform AMF on, (B, H, W, C) tensor with static height and
+        width
+    init_kernel_size : int
+        initial size of median filter kernel, by default 3
+    max_kernel_size : int
+        maximum size of median filter kernel, by default 7
+    centered : bool
+        whether to center a full kernel_size window on each pixel, by default False
+        (kernels span kernel_size - 1 pixels up to and including each pixel)
+
+    Returns
+    -------
+    tf.Tensor
+        stack of adaptive median filtered images
+    """
+    # assert that kernel sizes are odd
+    assert init_kernel_size % 2 == 1, "Initial kernel size must be odd"
+    assert max_kernel_size % 2 == 1, "Max kernel size must be odd"
+
+    channels = tf.cast(orig_imgs, tf.float32)
+    filtered = tf.zeros_like(channels)
+    unresolved = tf.ones_like(channels, dtype=tf.bool)
+
+    # grow kernel until median is strictly between min and max (level A)
+    for kernel_size in range(
+        init_kernel_size, max(init_kernel_size, max_kernel_size) + 1, 2
+    ):
+        z_min, z_med, z_max = window_stats(channels, kernel_size, centered)
+
+        # keep intensity if in range of kernel, otherwise take median (level B)
+        resolved = unresolved & (z_min < z_med) & (z_med < z_max)
+        keep = (z_min < channels) & (channels < z_max)
+        filtered = tf.where(resolved, tf.where(keep, channels, z_med), filtered)
+        unresolved &= ~resolved
+
+    # pixels that never resolved take the median of the largest kernel
+    filtered = tf.where(unresolved, z_med, filtered)
+
+    return tf.cast(filtered, orig_imgs.dtype)
@@ -0,0 +1,172 @@
+from typing import Callable, Dict, Optional, Tuple, Union
+import functools
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+
+from image_aug_ml.augmentation.registry import resolve_op_path, resolve_tf_op_path
+
+
+def get_augment_name(augment_entry: Union[str, Dict]) -> str:
+    """Gets name of augmentation from an augmentation config entry.
+
+    Parameters
+    ----------
+    augment_entry : Union[str, Dict]
+        either a short name of or dotted path to an augmentation op, or a single-key
+        mapping from augmentation name to its op ("op") and keyword arguments
+
+    Returns
+    -------
+    str
+        name of augmentation, used as its output directory name
+    """
+    if isinstance(augment_entry, str):
+        return augment_entry.rsplit(".", maxsplit=1)[-1]
+
+    # parametrized entries are keyed by their name
+    (augment_name,) = augment_entry.keys()
+    return augment_name
+
+
+def load_augment_op(augment_entry: Union[str, Dict]) -> Tuple[str, Callable]:
+    """Imports augmentation op described by an augmentation config entry.
+
+    Parameters
+    ----------
+    augment_entry : Union[str, Dict]
+        either a short name of or dotted path to an augmentation op, or a single-key
+        mapping from augmentation name to its op ("op") and keyword arguments
+
+    Returns
+    -------
+    Tuple[str, Callable]
+        name of augmentation and augmentation op
+    """
+    augment_name = get_augment_name(augment_entry)
+
+    # import op from its dotted path on first use
+    if isinstance(augment_entry, str):
+        augment_module, augment_attr = resolve_op_path(augment_entry).rsplit(
+            ".", maxsplit=1
+        )
+        augment_op = getattr(importlib.import_module(augment_module), augment_attr)
+        return augment_name, augment_op
+
+    # bind keyword arguments of parametrized op
+    augment_kwargs = dict(augment_entry[augment_name])
+    _, augment_op = load_augment_op(augment_kwargs.pop("op"))
+    return augment_name, functools.partial(augment_op, **augment_kwargs)
+
+
+def load_batch_augment_op(augment_entry: Union[str, Dict]) -> Optional[Callable]:
+    """Imports batched variant of augmentation op, if one exists.
+
+    The batched variant of an op is found next to it, named <op name>_batch, and takes
+    a (N, H, W, C) stack of same-shape images.
+
+    Parameters
+    ----------
+    augment_entry : Union[str, Dict]
+        either a short name of or dotted path to an augmentation op, or a single-key
+        mapping from augmentation name to its op ("op") and keyword arguments
+
+    Returns
+    -------
+    Optional[Callable]
+        batched augmentation op, or None if op has no batched variant
+    """
+    # import batched op from dotted path
+    if isinstance(augment_entry, str):
+        augment_module, augment_attr = resolve_op_path(augment_entry).rsplit(
+            ".", maxsplit=1
+        )
+        return getattr(
+            importlib.import_module(augment_module), f"{augment_attr}_batch", None
+        )
+
+    # bind keyword arguments of parametrized op
+    augment_kwargs = dict(augment_entry[get_augment_name(augment_entry)])
+    batch_augment_op = load_batch_augment_op(augment_kwargs.pop("op"))
+    if batch_augment_op is None:
+        return None
+    return functools.partial(batch_augment_op, **augment_kwargs)
+
+
+def load_tf_augment_op(augment_entry: Union[str, Dict]) -> Optional[Callable]:
+    """Imports TensorFlow variant of augmentation op, if one exists.
+
+    The TensorFlow variant of an op takes a (B, H, W, C) tensor. It is the variant
+    registered with the op's short name, if any, and otherwise found in the tf_ops
+    module of the package the op is defined in, under the same name. Ops without
+    either have no TensorFlow variant, and are left to run as NumPy ops. Keyword
+    arguments that only tune the NumPy op, such as FFT workers, are not bound.
+
+    Parameters
+    ----------
+    augment_entry : Union[str, Dict]
+        either a short name of or dotted path to an augmentation op, or a single-key
+        mapping from augmentation name to its op ("op") and keyword arguments
+
+    Returns
+    -------
+    Optional[Callable]
+        TensorFlow augmentation op, or None if op has no TensorFlow variant
+    """
+    if isinstance(augment_entry, str):
+        # import variant registered with op
+        tf_op_path = resolve_tf_op_path(augment_entry)
+        if tf_op_path is not None:
+            tf_module, tf_attr = tf_op_path.rsplit(".", maxsplit=1)
+            return getattr(importlib.import_module(tf_module), tf_attr)
+
+        # find tf_ops module next to the module defining the op
+        _, augment_op = load_augment_op(augment_entry)
+        op_package = augment_op.__module__.rsplit(".", maxsplit=1)[0]
+        if importlib.util.find_spec(f"{op_package}.tf_ops") is None:
+            return None
+        return getattr(
+            importlib.import_module(f"{op_package}.tf_ops"), augment_op.__name__, None
+        )
+
+    # bind keyword arguments the TensorFlow op takes
+    augment_kwargs = dict(augment_entry[get_augment_name(augment_entry)])
+    tf_augment_op = load_tf_augment_op(augment_kwargs.pop("op"))
+    if tf_augment_op is None:
+        return None
+    tf_params = inspect.signature(tf_augment_op).parameters
+    return functools.partial(
+        tf_augment_op,
+        **{key: value for key, value in augment_kwargs.items() if key in tf_params},
+    )
+
+
+def augment_op_key(augment_entry: Union[str, Dict]) -> int:
+    """Derives a key identifying an augmentation op and its parameters.
+
+    Keys do not depend on the augmentation's name, its position in its config or
+    whether its op is referenced by short name, so the same op draws the same
+    parameters in every config it is listed in.
+
+    Parameters
+    ----------
+    augment_entry : Union[str, Dict]
+        either a short name of or dotted path to an augmentation op, or a single-key
+        mapping from augmentation name to its op ("op") and keyword arguments
+
+    Returns
+    -------
+    int
+        64-bit op key
+    """
+    # describe plain and parametrized entries alike, by dotted op path
+    if isinstance(augment_entry, str):
+        op_spec = {"op": resolve_op_path(augment_entry)}
+    else:
+        op_spec = dict(augment_entry[get_augment_name(augment_entry)])
+        op_spec["op"] = resolve_op_path(op_spec["op"])
+
+    op_digest = hashlib.sha256(json.dumps(op_spec, sort_keys=True).encode()).digest()
+    return int.from_bytes(op_digest[:8], "little")
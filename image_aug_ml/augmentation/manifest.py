@@ -0,0 +1,240 @@
+from typing import Dict, List, Optional, Set, Union
+import json
+import os
+import pathlib
+
+from image_aug_ml.utils import EncodeConf, get_augment_path, intact_records
+
+
+# name of manifest file, written to the image directory
+MANIFEST_NAME = "augment_manifest.jsonl"
+
+
+def get_manifest_path(image_dir: pathlib.Path) -> pathlib.Path:
+    """Gets path of augmentation manifest of an image directory.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+
+    Returns
+    -------
+    pathlib.Path
+        path of manifest file
+    """
+    return image_dir / MANIFEST_NAME
+
+
+def load_manifest(image_dir: pathlib.Path) -> Dict[str, Dict]:
+    """Loads records of completed augmentation outputs.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+
+    Returns
+    -------
+    Dict[str, Dict]
+        latest record of each output, keyed by output path relative to image
+        directory, in order of completion
+    """
+    manifest_path = get_manifest_path(image_dir)
+    if not manifest_path.exists():
+        return {}
+
+    manifest: Dict[str, Dict] = {}
+    with open(manifest_path, "r") as manifest_file:
+        for line in manifest_file:
+            # skip line left partially written by an interrupted run
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            # later records of an output replace earlier ones
+            manifest.pop(record["output"], None)
+            manifest[record["output"]] = record
+
+    return manifest
+
+
+def write_manifest(image_dir: pathlib.Path, manifest: Dict[str, Dict]):
+    """Replaces manifest file with one record per output.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    manifest : Dict[str, Dict]
+        records of outputs, keyed by output path relative to image directory
+    """
+    manifest_path = get_manifest_path(image_dir)
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as manifest_file:
+        for record in manifest.values():
+            manifest_file.write(json.dumps(record) + "\n")
+
+    # swap in compacted manifest atomically
+    os.replace(tmp_path, manifest_path)
+
+
+def append_manifest(image_dir: pathlib.Path, records: List[Dict]):
+    """Appends records of completed outputs to manifest file.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    records : List[Dict]
+        records of outputs written to file
+    """
+    with open(get_manifest_path(image_dir), "a") as manifest_file:
+        manifest_file.writelines(json.dumps(record) + "\n" for record in records)
+
+
+def manifest_seed(manifest: Dict[str, Dict]) -> Optional[int]:
+    """Gets base seed of most recently completed output.
+
+    Parameters
+    ----------
+    manifest : Dict[str, Dict]
+        records of outputs, in order of completion
+
+    Returns
+    -------
+    Optional[int]
+        base seed, or None if manifest is empty
+    """
+    if not manifest:
+        return None
+    return list(manifest.values())[-1]["seed"]
+
+
+def output_record(
+    image_dir: pathlib.Path,
+    train_img_path: pathlib.Path,
+    train_img_stat: os.stat_result,
+    augment_name: str,
+    augment_entry: Union[str, Dict],
+    seed: int,
+    packed: bool = False,
+    decode_shape: Optional[List[int]] = None,
+    reduced_decode_shape: Optional[List[int]] = None,
+    encode_conf: Optional[EncodeConf] = None,
+) -> Dict:
+    """Builds record of everything an augmentation output depends on.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    train_img_path : pathlib.Path
+        path of training image
+    train_img_stat : os.stat_result
+        stat of training image file
+    augment_name : str
+        name of augmentation
+    augment_entry : Union[str, Dict]
+        augmentation config entry, including op parameters
+    seed : int
+        base seed of augmentation run
+    packed : bool, optional
+        whether output is appended to shards instead of saved to its own file, by
+        default False
+    decode_shape : Optional[List[int]], optional
+        shape training image is resized to before augmenting, by default None
+    reduced_decode_shape : Optional[List[int]], optional
+        smallest shape training image is decoded at, by default None (full scale)
+    encode_conf : Optional[EncodeConf], optional
+        output format and quality, by default None
+
+    Returns
+    -------
+    Dict
+        output record, keyed by output path relative to image directory
+    """
+    return {
+        "output": str(
+            get_augment_path(train_img_path, augment_name, encode_conf).relative_to(
+                image_dir
+            )
+        ),
+        "source": str(train_img_path.relative_to(image_dir)),
+        "size": train_img_stat.st_size,
+        "mtime_ns": train_img_stat.st_mtime_ns,
+        # round trip through json so entries compare equal to loaded ones
+        "op": json.loads(json.dumps(augment_entry)),
+        "seed": seed,
+        "packed": packed,
+        "decode_shape": decode_shape,
+        "reduced_decode_shape": (
+            None if reduced_decode_shape is None else list(reduced_decode_shape)
+        ),
+        "encoding": None if encode_conf is None else encode_conf._asdict(),
+    }
+
+
+def packed_outputs(image_dir: pathlib.Path, augment_names: List[str]) -> Set[str]:
+    """Finds outputs whose records are indexed in intact shards.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    augment_names : List[str]
+        names of augmentations, whose train directories hold their shards
+
+    Returns
+    -------
+    Set[str]
+        output paths of packed records, relative to image directory
+    """
+    outputs = set()
+    for augment_name in augment_names:
+        shard_dir = image_dir / augment_name / "train"
+        if shard_dir.is_dir():
+            outputs.update(
+                str(pathlib.Path(augment_name, "train", index_entry["key"]))
+                for index_entry in intact_records(shard_dir)
+            )
+
+    return outputs
+
+
+def is_up_to_date(
+    image_dir: pathlib.Path,
+    record: Dict,
+    manifest: Dict[str, Dict],
+    packed: Optional[Set[str]] = None,
+) -> bool:
+    """Checks if an output was completed with the same inputs and still exists.
+
+    Records are compared whole. They hold no position in the config or listing, so
+    ops and sources can be inserted or reordered without redoing the others.
+
+    Packed outputs are checked for in the index of intact shard records.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    record : Dict
+        expected record of output
+    manifest : Dict[str, Dict]
+        records of completed outputs
+    packed : Optional[Set[str]], optional
+        outputs held in intact shards, as found by packed_outputs, by default none
+
+    Returns
+    -------
+    bool
+        whether output can be skipped
+    """
+    completed = manifest.get(record["output"])
+    if completed != record:
+        return False
+    if record["packed"]:
+        return packed is not None and record["output"] in packed
+    return (image_dir / record["output"]).exists()
@@ -0,0 +1,135 @@
+from typing import Any, Callable, Iterable, List, NamedTuple, Sequence
+import queue
+import threading
+
+
+class PipelineConf(NamedTuple):
+    """Thread counts and queue depths of a staged read, compute, write pipeline."""
+
+    # number of threads reading inputs
+    reader_threads: int = 2
+
+    # number of threads writing outputs
+    writer_threads: int = 2
+
+    # maximum number of read inputs waiting for compute
+    read_queue_depth: int = 4
+
+    # maximum number of computed outputs waiting to be written
+    write_queue_depth: int = 64
+
+
+# marks the end of a queue's items
+_DONE = object()
+
+# seconds between checks for a failed stage while blocked on a queue
+_POLL_INTERVAL = 0.1
+
+
+def run_pipeline(
+    items: Sequence[Any],
+    read: Callable[[Any], Any],
+    compute: Callable[[Any, Any], Iterable[Any]],
+    write: Callable[[Any], None],
+    pipeline_conf: PipelineConf = PipelineConf(),
+):
+    """Runs items through reader threads, compute in the calling thread, and writer
+    threads, joined by bounded queues so that stages overlap while memory stays capped.
+
+    Parameters
+    ----------
+    items : Sequence[Any]
+        items to process, each is read once
+    read : Callable[[Any], Any]
+        reads an item, called from reader threads
+    compute : Callable[[Any, Any], Iterable[Any]]
+        computes outputs from an item and its read result, called from this thread
+    write : Callable[[Any], None]
+        writes an output, called from writer threads
+    pipeline_conf : PipelineConf, optional
+        thread counts and queue depths, by default PipelineConf()
+    """
+    assert pipeline_conf.reader_threads > 0, "pipeline needs at least one reader thread"
+    assert pipeline_conf.writer_threads > 0, "pipeline needs at least one writer thread"
+
+    read_queue: "queue.Queue" = queue.Queue(pipeline_conf.read_queue_depth)
+    write_queue: "queue.Queue" = queue.Queue(pipeline_conf.write_queue_depth)
+    item_iter = iter(items)
+    item_lock = threading.Lock()
+    failed = threading.Event()
+    errors: List[BaseException] = []
+
+    def put(target_queue: "queue.Queue", value: Any):
+        # block for space, giving up if another stage has failed
+        while not failed.is_set():
+            try:
+                return target_queue.put(value, timeout=_POLL_INTERVAL)
+            except queue.Full:
+                continue
+
+    def get(source_queue: "queue.Queue") -> Any:
+        # block for a value, giving up if another stage has failed
+        while not failed.is_set():
+            try:
+                return source_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def run_stage(stage: Callable[[], None]):
+        try:
+            stage()
+        except BaseException as error:
+            errors.append(error)
+            failed.set()
+
+    def read_items():
+        while True:
+            with item_lock:
+                item = next(item_iter, _DONE)
+            if item is _DONE or failed.is_set():
+                break
+            put(read_queue, (item, read(item)))
+        put(read_queue, _DONE)
+
+    def write_outputs():
+        while True:
+            output = get(write_queue)
+            if output is _DONE:
+                break
+            write(output)
+
+    # start reader and writer stages
+    readers = [
+        threading.Thread(target=run_stage, args=(read_items,), daemon=True)
+        for _ in range(pipeline_conf.reader_threads)
+    ]
+    writers = [
+        threading.Thread(target=run_stage, args=(write_outputs,), daemon=True)
+        for _ in range(pipeline_conf.writer_threads)
+    ]
+    for thread in readers + writers:
+        thread.start()
+
+    def compute_items():
+        # compute until every reader has finished
+        num_done = 0
+        while num_done < len(readers):
+            read_item = get(read_queue)
+            if read_item is _DONE:
+                num_done += 1
+                continue
+            for output in compute(*read_item):
+                put(write_queue, output)
+
+        # signal writers to finish
+        for _ in writers:
+            put(write_queue, _DONE)
+
+    run_stage(compute_items)
+
+    # wait for stages to finish, then surface the first failure
+    for thread in readers + writers:
+        thread.join()
+    if errors:
+        raise errors[0]
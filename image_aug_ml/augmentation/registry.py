@@ -0,0 +1,144 @@
+from typing import Dict, Optional
+import functools
+import importlib.metadata
+
+
+# entry point group that installed packages list their augmentation ops under
+ENTRY_POINT_GROUP = "image_aug_ml.augmentations"
+
+# entry point group listing TensorFlow variants of ops, under the names of the ops
+TF_ENTRY_POINT_GROUP = "image_aug_ml.tf_augmentations"
+
+# dotted paths of built-in augmentation ops, keyed by short name
+BUILTIN_OPS: Dict[str, str] = {
+    "resize": "image_aug_ml.augmentation.affine.resize",
+    "rotate": "image_aug_ml.augmentation.affine.rotate",
+    "translate": "image_aug_ml.augmentation.affine.translate",
+    "flip_vertical": "image_aug_ml.augmentation.affine.flip_vertical",
+    "flip_horizontal": "image_aug_ml.augmentation.affine.flip_horizontal",
+    "compose": "image_aug_ml.augmentation.affine.compose",
+    "invert": "image_aug_ml.augmentation.intensity.invert",
+    "hist_eq": "image_aug_ml.augmentation.intensity.hist_eq",
+    "amf": "image_aug_ml.augmentation.intensity.amf",
+    "pointwise": "image_aug_ml.augmentation.intensity.pointwise",
+    "lowpass": "image_aug_ml.augmentation.frequency.lowpass",
+    "highpass": "image_aug_ml.augmentation.frequency.highpass",
+    "bandpass": "image_aug_ml.augmentation.frequency.bandpass",
+}
+
+# dotted paths of ops registered at runtime, keyed by short name
+registered_ops: Dict[str, str] = {}
+
+# dotted paths of TensorFlow variants of ops registered at runtime, keyed by short name
+registered_tf_ops: Dict[str, str] = {}
+
+
+def register_op(name: str, op_path: str, tf_op_path: Optional[str] = None):
+    """Registers an augmentation op under a short name, without importing it.
+
+    Parameters
+    ----------
+    name : str
+        short name of op, usable in place of its dotted path in configs
+    op_path : str
+        dotted path to op
+    tf_op_path : Optional[str], optional
+        dotted path to TensorFlow variant of op, taking a (B, H, W, C) tensor, by
+        default None (found in the tf_ops module next to the op, if any)
+    """
+    assert "." not in name, f"Op names cannot contain dots: {name}"
+    assert "." in op_path, f"Op path must be a dotted path: {op_path}"
+    assert (
+        tf_op_path is None or "." in tf_op_path
+    ), f"TensorFlow op path must be a dotted path: {tf_op_path}"
+    registered_ops[name] = op_path
+    if tf_op_path is None:
+        registered_tf_ops.pop(name, None)
+    else:
+        registered_tf_ops[name] = tf_op_path
+
+
+@functools.lru_cache(maxsize=None)
+def entry_point_ops(group: str = ENTRY_POINT_GROUP) -> Dict[str, str]:
+    """Finds augmentation ops that installed packages list as entry points.
+
+    Only package metadata is read, entry point modules are not imported.
+
+    Parameters
+    ----------
+    group : str, optional
+        entry point group to list, by default ENTRY_POINT_GROUP
+
+    Returns
+    -------
+    Dict[str, str]
+        dotted path of each op, keyed by entry point name
+    """
+    all_entry_points = importlib.metadata.entry_points()
+
+    # entry points are grouped in a dict before python 3.10
+    if hasattr(all_entry_points, "select"):
+        op_entry_points = all_entry_points.select(group=group)
+    else:
+        op_entry_points = all_entry_points.get(group, [])
+
+    # convert module:attr values to dotted paths
+    return {
+        entry_point.name: entry_point.value.replace(":", ".")
+        for entry_point in op_entry_points
+    }
+
+
+def resolve_op_path(op_ref: str) -> str:
+    """Resolves reference to an augmentation op to its dotted path.
+
+    Short names are looked up in ops registered at runtime, then built-in ops, then
+    entry points. Dotted paths are returned unchanged.
+
+    Parameters
+    ----------
+    op_ref : str
+        short name of, or dotted path to, augmentation op
+
+    Returns
+    -------
+    str
+        dotted path to op
+    """
+    if "." in op_ref:
+        return op_ref
+
+    for ops in (registered_ops, BUILTIN_OPS):
+        if op_ref in ops:
+            return ops[op_ref]
+
+    op_path = entry_point_ops().get(op_ref)
+    assert op_path is not None, f"Unknown augmentation op: {op_ref}"
+    return op_path
+
+
+def resolve_tf_op_path(op_ref: str) -> Optional[str]:
+    """Resolves reference to an augmentation op to the dotted path of its registered
+    TensorFlow variant.
+
+    Short names registered at runtime are looked up with their op, and short names
+    of entry point ops in the TF_ENTRY_POINT_GROUP entry points. Built-in ops and
+    dotted paths have no registered variant.
+
+    Parameters
+    ----------
+    op_ref : str
+        short name of, or dotted path to, augmentation op
+
+    Returns
+    -------
+    Optional[str]
+        dotted path to TensorFlow variant of op, or None if none is registered
+    """
+    if "." in op_ref:
+        return None
+    if op_ref in registered_ops:
+        return registered_tf_ops.get(op_ref)
+    if op_ref in BUILTIN_OPS:
+        return None
+    return entry_point_ops(TF_ENTRY_POINT_GROUP).get(op_ref)
@@ -1 +1,10 @@
-from .classifier import ImageClassifier
+from typing import Any
+
+
+def __getattr__(name: str) -> Any:
+    # import classifier, and with it TensorFlow, on first use
+    if name == "ImageClassifier":
+        from .classifier import ImageClassifier
+
+        return ImageClassifier
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
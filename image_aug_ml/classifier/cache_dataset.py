@@ -0,0 +1,49 @@
+import numpy as np
+import tensorflow as tf
+
+from image_aug_ml.utils import DecodeCache
+
+
+def make_cache_dataset(
+    decode_cache: DecodeCache, batch_size: int = 32
+) -> tf.data.Dataset:
+    """Makes dataset of images held in a decode cache, matching the batches of
+    keras.preprocessing.image_dataset_from_directory with categorical labels.
+
+    Batches are gathered from the memory-mapped cache array, so images are never
+    decoded again, and only the images of a batch are paged in.
+
+    Parameters
+    ----------
+    decode_cache : DecodeCache
+        cache of decoded images
+    batch_size : int, optional
+        number of images per batch, by default 32
+
+    Returns
+    -------
+    tf.data.Dataset
+        dataset of (images, one-hot labels) batches
+    """
+    height, width = decode_cache.index["image_shape"]
+    num_classes = len(decode_cache.class_names)
+
+    def gather_batch(img_idxs: np.ndarray):
+        # read rows in order, and convert from BGR to RGB like tf decoding
+        img_idxs = np.sort(img_idxs)
+        imgs = decode_cache.images[img_idxs][..., ::-1].astype(np.float32)
+        return imgs, decode_cache.labels[img_idxs]
+
+    def load_batch(img_idxs):
+        imgs, labels = tf.numpy_function(
+            gather_batch, [img_idxs], [tf.float32, tf.int64]
+        )
+        imgs.set_shape([None, height, width, 3])
+        return imgs, tf.one_hot(labels, num_classes)
+
+    return (
+        tf.data.Dataset.range(len(decode_cache))
+        .shuffle(len(decode_cache), reshuffle_each_iteration=True)
+        .batch(batch_size)
+        .map(load_batch, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    )
@@ -1,9 +1,19 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 import pathlib
 
 from tensorflow import keras
 import tensorflow as tf
 
+from image_aug_ml.augmentation import get_augment_name
+from image_aug_ml.classifier.cache_dataset import make_cache_dataset
+from image_aug_ml.classifier.online_augment import make_online_dataset
+from image_aug_ml.classifier.shard_dataset import make_shard_dataset
+from image_aug_ml.utils import (
+    build_decode_cache,
+    get_all_original_train_images,
+    has_shards,
+)
+
 
 class ImageClassifier:
     """Image classifier, samples images from the dataset,
@@ -43,6 +53,10 @@ class ImageClassifier:
             img_dir,
             **augmentation_conf,
             image_shape=self.classifier_init_conf["image_shape"],
+            decode_cache=self.classifier_train_conf.get("decode_cache", False),
+            online_augmentation=self.classifier_train_conf.get(
+                "online_augmentation", False
+            ),
         )
 
         # create image classifier model
@@ -95,59 +109,93 @@ class ImageClassifier:
 
     @staticmethod
     def make_dataset(
-        img_dir: pathlib.Path, augmentations: List[str], image_shape: List[int]
+        img_dir: pathlib.Path,
+        augmentations: List[Union[str, Dict]],
+        image_shape: List[int],
+        decode_cache: bool = False,
+        online_augmentation: bool = False,
     ) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
         """Makes training, validation datasets.
 
+        Augmented images packed into shards are streamed from the shards, others are
+        loaded from their class directories. Original images are either loaded from
+        their class directories, or from decode caches built once per image shape.
+
+        In online mode, augmentations are applied to original images on the fly
+        instead of loaded from disk, with new parameters drawn every epoch.
+
         Parameters
         ----------
         img_dir : pathlib.Path
             directory to find images
-        augmentations : List[str]
-            list of image augmentations to include in dataset
+        augmentations : List[Union[str, Dict]]
+            list of image augmentation config entries to include in dataset
         image_shape: List[int]
             shape of images as list of ints
+        decode_cache: bool
+            whether to read original images from decode caches, by default False
+        online_augmentation: bool
+            whether to augment images inside the input pipeline, by default False
 
         Returns
         -------
         Tuple[tf.data.Dataset, tf.data.Dataset]
             tuple of training, validation datasets
         """
-        # load original training, validation datasets
-        train_ds = keras.preprocessing.image_dataset_from_directory(
-            str(img_dir.joinpath("original/train")),
-            labels="inferred",
-            image_size=image_shape,
-            label_mode="categorical",
-        )
-        val_ds = keras.preprocessing.image_dataset_from_directory(
-            str(img_dir.joinpath("original/val")),
-            labels="inferred",
-            image_size=image_shape,
-            label_mode="categorical",
-        )
+        # load original training, validation datasets from decode caches
+        if decode_cache:
+            train_cache = build_decode_cache(img_dir, "train", image_shape)
+            val_cache = build_decode_cache(img_dir, "val", image_shape)
+            class_names = train_cache.class_names
+            num_train_imgs = len(train_cache)
+            train_ds = make_cache_dataset(train_cache)
+            val_ds = make_cache_dataset(val_cache)
+
+        # load original training, validation datasets from files
+        else:
+            train_ds = keras.preprocessing.image_dataset_from_directory(
+                str(img_dir.joinpath("original/train")),
+                labels="inferred",
+                image_size=image_shape,
+                label_mode="categorical",
+            )
+            val_ds = keras.preprocessing.image_dataset_from_directory(
+                str(img_dir.joinpath("original/val")),
+                labels="inferred",
+                image_size=image_shape,
+                label_mode="categorical",
+            )
+            class_names = train_ds.class_names
+            num_train_imgs = len(get_all_original_train_images(img_dir))
 
-        # create list of augmentations dirs
-        augmentation_dirs = [
-            aug_name.rsplit(".", maxsplit=1)[-1] for aug_name in augmentations
-        ]
+        # augment training images on the fly, which shuffles them as they are drawn
+        if online_augmentation:
+            train_ds = make_online_dataset(train_ds, augmentations, num_train_imgs)
 
-        # add augmented images to training dataset
-        for aug_dir in augmentation_dirs:
-            train_ds = train_ds.concatenate(
-                keras.preprocessing.image_dataset_from_directory(
-                    str(img_dir.joinpath(f"{aug_dir}/train")),
-                    labels="inferred",
-                    image_size=image_shape,
-                    label_mode="categorical",
-                )
-            )
+        # add augmented images to training dataset, labelled like original images
+        else:
+            augmentation_dirs = [
+                get_augment_name(aug_entry) for aug_entry in augmentations
+            ]
+            for aug_dir in augmentation_dirs:
+                aug_train_dir = img_dir.joinpath(f"{aug_dir}/train")
+                if has_shards(aug_train_dir):
+                    aug_ds = make_shard_dataset(aug_train_dir, class_names, image_shape)
+                else:
+                    aug_ds = keras.preprocessing.image_dataset_from_directory(
+                        str(aug_train_dir),
+                        labels="inferred",
+                        image_size=image_shape,
+                        label_mode="categorical",
+                    )
+                train_ds = train_ds.concatenate(aug_ds)
 
         # set up shuffling
-        train_ds = train_ds.shuffle(
-            tf.data.experimental.cardinality(train_ds).numpy(),
-            reshuffle_each_iteration=True,
-        )
+        if not online_augmentation:
+            train_ds = train_ds.shuffle(
+                tf.data.experimental.cardinality(train_ds).numpy(),
+                reshuffle_each_iteration=True,
+            )
         val_ds = val_ds.shuffle(
             tf.data.experimental.cardinality(val_ds).numpy(),
             reshuffle_each_iteration=True,
@@ -0,0 +1,99 @@
+from typing import Dict, List, Union
+
+import numpy as np
+import tensorflow as tf
+
+from image_aug_ml.augmentation import load_augment_op, load_tf_augment_op
+
+
+def make_online_dataset(
+    orig_ds: tf.data.Dataset,
+    augmentations: List[Union[str, Dict]],
+    num_imgs: int,
+    batch_size: int = 32,
+    shuffle_buffer: int = 1024,
+) -> tf.data.Dataset:
+    """Makes training dataset that augments original images on the fly.
+
+    Each original image is followed by one augmented copy per op, like the images
+    augment_images saves to disk, but parameters are drawn anew every epoch.
+    If every op has a TensorFlow variant, as found by load_tf_augment_op, whole
+    batches are augmented inside the graph, otherwise images are augmented by the
+    NumPy ops through Python calls.
+    Either way, augmentation runs in parallel, autotuned calls overlapping with
+    training.
+
+    Parameters
+    ----------
+    orig_ds : tf.data.Dataset
+        dataset of (images, one-hot labels) batches of original images
+    augmentations : List[Union[str, Dict]]
+        list of image augmentation config entries to apply
+    num_imgs : int
+        number of original images in dataset
+    batch_size : int, optional
+        number of images per batch, by default 32
+    shuffle_buffer : int, optional
+        number of images shuffled together, by default 1024
+
+    Returns
+    -------
+    tf.data.Dataset
+        dataset of (images, one-hot labels) batches of original and augmented images
+    """
+    tf_augment_ops = [load_tf_augment_op(aug_entry) for aug_entry in augmentations]
+    num_copies = 1 + len(augmentations)
+
+    def augment_batch(imgs, labels):
+        # ops take uint8 images, interleave copies so each original leads its own
+        uint8_imgs = tf.cast(tf.clip_by_value(tf.round(imgs), 0, 255), tf.uint8)
+        aug_imgs = tf.stack(
+            [imgs, *[tf.cast(op(uint8_imgs), tf.float32) for op in tf_augment_ops]],
+            axis=1,
+        )
+        return (
+            tf.reshape(aug_imgs, tf.concat([[-1], tf.shape(imgs)[1:]], axis=0)),
+            tf.repeat(labels, num_copies, axis=0),
+        )
+
+    if all(op is not None for op in tf_augment_ops):
+        aug_ds = orig_ds.map(
+            augment_batch,
+            num_parallel_calls=tf.data.experimental.AUTOTUNE,
+            deterministic=False,
+        )
+        return (
+            aug_ds.unbatch()
+            .apply(tf.data.experimental.assert_cardinality(num_imgs * num_copies))
+            .shuffle(shuffle_buffer, reshuffle_each_iteration=True)
+            .batch(batch_size)
+        )
+
+    augment_ops = [load_augment_op(aug_entry)[1] for aug_entry in augmentations]
+
+    def augment_img(img: np.ndarray) -> np.ndarray:
+        # ops take uint8 BGR images, like cv2.imread returns
+        bgr_img = np.ascontiguousarray(
+            np.clip(np.rint(img), 0, 255).astype(np.uint8)[..., ::-1]
+        )
+        return np.stack(
+            [img, *[op(bgr_img)[..., ::-1].astype(np.float32) for op in augment_ops]]
+        )
+
+    def augment_example(img, label):
+        imgs = tf.numpy_function(augment_img, [img], tf.float32)
+        imgs.set_shape([num_copies, *img.shape])
+        return imgs, tf.repeat(label[None], num_copies, axis=0)
+
+    return (
+        orig_ds.unbatch()
+        .map(
+            augment_example,
+            num_parallel_calls=tf.data.experimental.AUTOTUNE,
+            deterministic=False,
+        )
+        .unbatch()
+        .apply(tf.data.experimental.assert_cardinality(num_imgs * num_copies))
+        .shuffle(shuffle_buffer, reshuffle_each_iteration=True)
+        .batch(batch_size)
+    )
@@ -0,0 +1,94 @@
+from typing import List
+import pathlib
+
+import tensorflow as tf
+
+from image_aug_ml.utils import load_shard_index
+
+
+def make_shard_dataset(
+    shard_dir: pathlib.Path,
+    class_names: List[str],
+    image_shape: List[int],
+    batch_size: int = 32,
+    cycle_length: int = 4,
+) -> tf.data.Dataset:
+    """Makes dataset of images packed into shards, matching the batches of
+    keras.preprocessing.image_dataset_from_directory with categorical labels.
+
+    Shards are read whole, so each is one large sequential read, and records are
+    interleaved from several shards at once.
+
+    Parameters
+    ----------
+    shard_dir : pathlib.Path
+        directory holding shards and their indexes
+    class_names : List[str]
+        names of classes, in order of their label indices
+    image_shape : List[int]
+        shape of images as list of ints
+    batch_size : int, optional
+        number of images per batch, by default 32
+    cycle_length : int, optional
+        number of shards read at once, by default 4
+
+    Returns
+    -------
+    tf.data.Dataset
+        dataset of (images, one-hot labels) batches
+    """
+    # group records by shard
+    shard_records = {}
+    for index_entry in load_shard_index(shard_dir):
+        shard_records.setdefault(index_entry["shard"], []).append(
+            (
+                index_entry["offset"],
+                index_entry["length"],
+                class_names.index(index_entry["label"]),
+            )
+        )
+    num_records = sum(map(len, shard_records.values()))
+
+    # describe records of each shard as ragged rows
+    shard_paths = list(shard_records)
+    offsets, lengths, labels = [
+        tf.ragged.constant(
+            [[record[field] for record in shard_records[path]] for path in shard_paths],
+            dtype=tf.int64,
+        )
+        for field in range(3)
+    ]
+
+    def read_shard(shard_path, shard_offsets, shard_lengths, shard_labels):
+        # read whole shard, then slice out its records
+        shard_bytes = tf.io.read_file(shard_path)
+        return tf.data.Dataset.from_tensor_slices(
+            (shard_offsets, shard_lengths, shard_labels)
+        ).map(
+            lambda offset, length, label: (
+                tf.strings.substr(shard_bytes, offset, length),
+                label,
+            )
+        )
+
+    def decode_record(encoded_img, label):
+        img = tf.io.decode_image(encoded_img, channels=3, expand_animations=False)
+        return (
+            tf.image.resize(img, image_shape),
+            tf.one_hot(label, len(class_names)),
+        )
+
+    # stream records from several shards at once
+    shard_ds = tf.data.Dataset.from_tensor_slices(
+        (shard_paths, offsets, lengths, labels)
+    ).shuffle(max(len(shard_paths), 1), reshuffle_each_iteration=True)
+    record_ds = shard_ds.interleave(
+        read_shard,
+        cycle_length=cycle_length,
+        num_parallel_calls=tf.data.experimental.AUTOTUNE,
+        deterministic=False,
+    ).apply(tf.data.experimental.assert_cardinality(num_records))
+
+    return record_ds.map(
+        decode_record, num_parallel_calls=tf.data.experimental.AUTOTUNE
+    ).batch(batch_size)
@@ -3,4 +3,22 @@ from .load_utils import (
     get_all_test_images,
     get_all_original_train_images,
 )
-from .save_utils import save_to_file
+from .codec import EncodeConf, decode_image, encode_image, jpeg_shape
+from .content_store import ContentStore
+from .decode_cache import DecodeCache, build_decode_cache
+from .file_index import FileIndex, load_file_index
+from .lru_cache import LRUCache
+from .buffer_pool import BufferPool, get_buffer
+from .profiler import Profiler, profile
+from .random_utils import StackRng, get_rng, use_rng
+from .save_utils import get_augment_path, save_to_file, save_to_shard
+from .shard_utils import (
+    ShardWriter,
+    close_shard_writers,
+    compact_shards,
+    flush_shard_writers,
+    has_shards,
+    intact_records,
+    load_shard_index,
+    read_shard_record,
+)
@@ -0,0 +1,116 @@
+from typing import Hashable, Optional, Tuple
+import collections
+
+import numpy as np
+
+
+class BufferPool:
+    """Bounded, memory-capped pool of writable arrays, keyed by name, shape and
+    dtype, that ops reuse as output and scratch buffers across images.
+
+    A buffer is handed out again on every request for the same key, so its
+    contents only last until the next request; each use names its buffers to keep
+    them apart.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2 ** 20):
+        """Creates empty pool.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            maximum total size of held buffers in bytes, by default 256 MiB
+        """
+        self.max_bytes = max_bytes
+
+        self._buffers: "collections.OrderedDict[Hashable, np.ndarray]" = (
+            collections.OrderedDict()
+        )
+        self.clear()
+
+    def __getstate__(self) -> int:
+        # pickle without buffers, so worker processes start with an empty pool
+        return self.max_bytes
+
+    def __setstate__(self, max_bytes: int):
+        self.__init__(max_bytes)
+
+    def clear(self):
+        """Drops all held buffers and resets counters."""
+        self._buffers.clear()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, name: str, shape: Tuple[int, ...], dtype: np.dtype = np.uint8
+    ) -> np.ndarray:
+        """Returns held buffer, allocating a zero-filled one on a miss.
+
+        Parameters
+        ----------
+        name : str
+            name of buffer's use
+        shape : Tuple[int, ...]
+            shape of buffer
+        dtype : np.dtype, optional
+            dtype of buffer, by default uint8
+
+        Returns
+        -------
+        np.ndarray
+            buffer, holding whatever its last user wrote to it
+        """
+        key = (name, tuple(shape), np.dtype(dtype).str)
+
+        # serve and refresh held buffer
+        buffer = self._buffers.get(key)
+        if buffer is not None:
+            self.hits += 1
+            self._buffers.move_to_end(key)
+            return buffer
+
+        # buffers larger than the whole budget are never held
+        self.misses += 1
+        buffer = np.zeros(shape, dtype=dtype)
+        if buffer.nbytes > self.max_bytes:
+            return buffer
+
+        # evict least recently used buffers until the new buffer fits
+        while self._buffers and self.num_bytes + buffer.nbytes > self.max_bytes:
+            _, evicted = self._buffers.popitem(last=False)
+            self.num_bytes -= evicted.nbytes
+
+        self._buffers[key] = buffer
+        self.num_bytes += buffer.nbytes
+
+        return buffer
+
+
+def get_buffer(
+    workspace: Optional[BufferPool],
+    name: str,
+    shape: Tuple[int, ...],
+    dtype: np.dtype = np.uint8,
+) -> np.ndarray:
+    """Gets a scratch buffer from a workspace, or allocates one without a workspace.
+
+    Parameters
+    ----------
+    workspace : Optional[BufferPool]
+        pool of buffers to reuse, or None to allocate
+    name : str
+        name of buffer's use
+    shape : Tuple[int, ...]
+        shape of buffer
+    dtype : np.dtype, optional
+        dtype of buffer, by default uint8
+
+    Returns
+    -------
+    np.ndarray
+        buffer, zero-filled if newly allocated
+    """
+    if workspace is None:
+        return np.zeros(shape, dtype=dtype)
+    return workspace.get(name, shape, dtype)
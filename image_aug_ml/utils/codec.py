@@ -0,0 +1,215 @@
+from typing import List, NamedTuple, Optional, Tuple
+import pathlib
+
+import cv2
+import numpy as np
+
+
+# decode flags of each reduced scale, largest reduction first
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# suffixes of each output format, None to keep the suffix of the training image
+FORMAT_SUFFIXES = {"jpeg": None, "png": ".png", "webp": ".webp"}
+
+# suffixes of images listed in image directories
+IMAGE_SUFFIXES = (".JPEG", ".png", ".webp")
+
+# JPEG start of frame markers, which hold the image's shape (not DHT, JPG or DAC)
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class EncodeConf(NamedTuple):
+    """Format and quality of encoded augmented images."""
+
+    # output format, one of "jpeg", "png" or "webp" (lossless)
+    format: str = "jpeg"
+
+    # JPEG quality, from 0 to 100
+    jpeg_quality: int = 95
+
+    # PNG zlib compression level, from 0 (fastest) to 9 (smallest)
+    png_compression: int = 1
+
+
+def jpeg_shape(buf: np.ndarray) -> Optional[Tuple[int, int]]:
+    """Reads the shape of a JPEG image from its frame header, without decoding it.
+
+    Parameters
+    ----------
+    buf : np.ndarray
+        encoded image, uint8 array
+
+    Returns
+    -------
+    Optional[Tuple[int, int]]
+        (height, width) of image, or None if image is not a readable JPEG
+    """
+    data = memoryview(buf)
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    # walk marker segments until a start of frame
+    pos = 2
+    while pos + 9 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+
+        # skip fill bytes and markers without a length
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+
+        if marker in SOF_MARKERS:
+            height = int.from_bytes(data[pos + 5 : pos + 7], "big")
+            width = int.from_bytes(data[pos + 7 : pos + 9], "big")
+            return height, width
+
+        pos += 2 + int.from_bytes(data[pos + 2 : pos + 4], "big")
+
+    return None
+
+
+def reduced_decode_flag(
+    img_shape: Optional[Tuple[int, int]], target_shape: Tuple[int, int]
+) -> Tuple[int, int]:
+    """Picks the largest reduced decode scale that keeps an image at least as large
+    as a target shape.
+
+    Parameters
+    ----------
+    img_shape : Optional[Tuple[int, int]]
+        (height, width) of encoded image, or None if unknown
+    target_shape : Tuple[int, int]
+        smallest (height, width) to decode image at
+
+    Returns
+    -------
+    Tuple[int, int]
+        cv2.imdecode flag and scale the image is reduced by (1 for full scale)
+    """
+    if img_shape is not None:
+        for scale, flag in REDUCED_DECODE_FLAGS:
+            # reduced decodes round each side up
+            reduced_shape = [-(-side // scale) for side in img_shape]
+            if all(
+                side >= min_side for side, min_side in zip(reduced_shape, target_shape)
+            ):
+                return flag, scale
+
+    return cv2.IMREAD_COLOR, 1
+
+
+def decode_image(
+    buf: np.ndarray, reduced_decode_shape: Optional[Tuple[int, int]] = None
+) -> Tuple[np.ndarray, int]:
+    """Decodes a color image, at a reduced scale if it is much larger than needed.
+
+    Only JPEGs are decoded at a reduced scale, since their decoder skips the work of
+    the dropped resolution, while other formats are decoded in full then resized.
+
+    Parameters
+    ----------
+    buf : np.ndarray
+        encoded image, uint8 array
+    reduced_decode_shape : Optional[Tuple[int, int]], optional
+        smallest (height, width) to decode image at, by default None (full scale)
+
+    Returns
+    -------
+    Tuple[np.ndarray, int]
+        decoded BGR image, and number of bytes it would have at full scale
+    """
+    if reduced_decode_shape is None:
+        img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        return img, img.nbytes
+
+    img_shape = jpeg_shape(buf)
+    flag, _ = reduced_decode_flag(img_shape, reduced_decode_shape)
+    img = cv2.imdecode(buf, flag)
+    if img_shape is None:
+        return img, img.nbytes
+    return img, img_shape[0] * img_shape[1] * img.shape[-1]
+
+
+def encode_params(encode_conf: EncodeConf) -> Tuple[str, List[int]]:
+    """Gets cv2.imencode extension and parameters of an output format.
+
+    Parameters
+    ----------
+    encode_conf : EncodeConf
+        output format and quality
+
+    Returns
+    -------
+    Tuple[str, List[int]]
+        extension selecting the encoder, and its parameters
+    """
+    assert encode_conf.format in FORMAT_SUFFIXES, f"Unknown format: {encode_conf}"
+
+    if encode_conf.format == "png":
+        return ".png", [cv2.IMWRITE_PNG_COMPRESSION, encode_conf.png_compression]
+
+    # WebP qualities above 100 are lossless
+    if encode_conf.format == "webp":
+        return ".webp", [cv2.IMWRITE_WEBP_QUALITY, 101]
+
+    return ".jpg", [cv2.IMWRITE_JPEG_QUALITY, encode_conf.jpeg_quality]
+
+
+def output_suffix(
+    train_img_path: pathlib.Path, encode_conf: Optional[EncodeConf] = None
+) -> str:
+    """Gets suffix of augmented image, which is that of its training image unless
+    encoded in another format.
+
+    Parameters
+    ----------
+    train_img_path : pathlib.Path
+        path where the original image was loaded from
+    encode_conf : Optional[EncodeConf], optional
+        output format and quality, by default None (format of suffix)
+
+    Returns
+    -------
+    str
+        suffix of augmented image
+    """
+    if encode_conf is None:
+        return train_img_path.suffix
+    return FORMAT_SUFFIXES[encode_conf.format] or train_img_path.suffix
+
+
+def encode_image(
+    img: np.ndarray, suffix: str, encode_conf: Optional[EncodeConf] = None
+) -> np.ndarray:
+    """Encodes an image in the format of its suffix, or in a configured format.
+
+    Parameters
+    ----------
+    img : np.ndarray
+        BGR image
+    suffix : str
+        suffix of output path, selecting the format without an encode config
+    encode_conf : Optional[EncodeConf], optional
+        output format and quality, by default None (OpenCV's defaults)
+
+    Returns
+    -------
+    np.ndarray
+        encoded image, uint8 array
+    """
+    if encode_conf is None:
+        _, encoded_img = cv2.imencode(suffix, img)
+        return encoded_img
+
+    extension, params = encode_params(encode_conf)
+    _, encoded_img = cv2.imencode(extension, img, params)
+    return encoded_img
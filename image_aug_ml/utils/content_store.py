@@ -0,0 +1,299 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+import os
+import pathlib
+import shutil
+import uuid
+
+
+class ContentStore:
+    """Content-addressed store of files on disk, materialized by hardlink, with
+    least-recently-used eviction down to a size cap.
+
+    Each file is held under its key. A file's modification time marks its last use,
+    so recency survives between runs and processes. Files added from bytes or
+    copied instead of linked are marked as untracked, since their link count does
+    not show whether they are referenced.
+    """
+
+    def __init__(self, store_dir: pathlib.Path, max_bytes: Optional[int] = None):
+        """Opens store, creating its directory if needed.
+
+        Parameters
+        ----------
+        store_dir : pathlib.Path
+            directory files are held in
+        max_bytes : Optional[int], optional
+            maximum total size of held files in bytes, enforced by evict, by default
+            unbounded
+        """
+        self.store_dir = pathlib.Path(store_dir)
+        self.max_bytes = max_bytes
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def untracked_dir(self) -> pathlib.Path:
+        """Directory of markers of untracked files, named by their keys."""
+        return self.store_dir / "untracked"
+
+    def mark_untracked(self, key: str):
+        """Marks a file as referenced without a hardlink, exempting it from
+        collection of unreferenced files.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+        """
+        self.untracked_dir.mkdir(exist_ok=True)
+        (self.untracked_dir / key).touch()
+
+    def is_untracked(self, key: str) -> bool:
+        """Checks if a file is marked as referenced without a hardlink.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+
+        Returns
+        -------
+        bool
+            whether file is untracked
+        """
+        return (self.untracked_dir / key).exists()
+
+    def remove(self, key: str):
+        """Removes a held file and its untracked marker, if any.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+        """
+        self.object_path(key).unlink(missing_ok=True)
+        (self.untracked_dir / key).unlink(missing_ok=True)
+
+    def object_path(self, key: str) -> pathlib.Path:
+        """Gets path a file is held at.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+
+        Returns
+        -------
+        pathlib.Path
+            path of held file, fanned out by the first two key characters
+        """
+        return self.store_dir / key[:2] / key
+
+    def contains(self, key: str) -> bool:
+        """Checks if a file is held.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+
+        Returns
+        -------
+        bool
+            whether file is held
+        """
+        return self.object_path(key).exists()
+
+    def materialize(self, key: str, out_path: pathlib.Path) -> bool:
+        """Links a held file to an output path, replacing any file there.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+        out_path : pathlib.Path
+            path to materialize file at
+
+        Returns
+        -------
+        bool
+            whether file was held
+        """
+        object_path = self.object_path(key)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # link to temporary path first, so out path is replaced atomically
+        tmp_path = out_path.with_name(f".{out_path.name}.{uuid.uuid4().hex}")
+        try:
+            linked = link_or_copy(object_path, tmp_path)
+        except FileNotFoundError:
+            return False
+        os.replace(tmp_path, out_path)
+
+        # copies do not raise the link count of the held file
+        if not linked:
+            self.mark_untracked(key)
+
+        # mark file as recently used
+        try:
+            os.utime(object_path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def put(self, key: str, src_path: pathlib.Path):
+        """Adds a file to the store, by hardlink where possible.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+        src_path : pathlib.Path
+            path of file to add
+        """
+        object_path = self.object_path(key)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+
+        tmp_path = object_path.with_name(f".{key}.{uuid.uuid4().hex}")
+        if not link_or_copy(src_path, tmp_path):
+            self.mark_untracked(key)
+        os.replace(tmp_path, object_path)
+        os.utime(object_path)
+
+    def put_bytes(self, key: str, contents: bytes):
+        """Adds a file to the store from its contents.
+
+        Parameters
+        ----------
+        key : str
+            hex key of file
+        contents : bytes
+            contents of file
+        """
+        object_path = self.object_path(key)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # files added from bytes, such as shard records, are never linked
+        self.mark_untracked(key)
+        tmp_path = object_path.with_name(f".{key}.{uuid.uuid4().hex}")
+        tmp_path.write_bytes(contents)
+        os.replace(tmp_path, object_path)
+
+    def objects(self) -> Iterator[Tuple[pathlib.Path, os.stat_result]]:
+        """Iterates over held files.
+
+        Yields
+        -------
+        Iterator[Tuple[pathlib.Path, os.stat_result]]
+            path and stat of each held file
+        """
+        # held files are fanned out into directories named by two key characters
+        for object_path in self.store_dir.glob("??/*"):
+            if object_path.name.startswith("."):
+                continue
+            try:
+                yield object_path, object_path.stat()
+            except FileNotFoundError:
+                continue
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Removes least recently used files until the store fits its size cap.
+
+        Parameters
+        ----------
+        max_bytes : Optional[int], optional
+            size cap in bytes, by default the store's cap
+
+        Returns
+        -------
+        int
+            number of files removed
+        """
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if max_bytes is None:
+            return 0
+
+        # remove oldest files first
+        held = sorted(self.objects(), key=lambda held_obj: held_obj[1].st_mtime_ns)
+        num_bytes = sum(object_stat.st_size for _, object_stat in held)
+        num_removed = 0
+        for object_path, object_stat in held:
+            if num_bytes <= max_bytes:
+                break
+            self.remove(object_path.name)
+            num_bytes -= object_stat.st_size
+            num_removed += 1
+
+        return num_removed
+
+    def gc(self, unreferenced: bool = True, max_bytes: Optional[int] = None) -> Dict:
+        """Garbage collects the store.
+
+        Parameters
+        ----------
+        unreferenced : bool, optional
+            whether to remove files no longer linked from any output, by default True,
+            untracked files are kept since their references cannot be counted
+        max_bytes : Optional[int], optional
+            size cap in bytes, by default the store's cap
+
+        Returns
+        -------
+        Dict
+            number of unreferenced and evicted files removed, and remaining number
+            and size of held files
+        """
+        # remove leftovers of interrupted writes
+        for tmp_path in self.store_dir.glob("*/.*"):
+            tmp_path.unlink(missing_ok=True)
+
+        # remove files only linked from the store itself
+        num_unreferenced = 0
+        if unreferenced:
+            for object_path, object_stat in list(self.objects()):
+                if object_stat.st_nlink == 1 and not self.is_untracked(
+                    object_path.name
+                ):
+                    self.remove(object_path.name)
+                    num_unreferenced += 1
+
+        # remove markers of files that are no longer held
+        if self.untracked_dir.exists():
+            for marker_path in self.untracked_dir.iterdir():
+                if not self.contains(marker_path.name):
+                    marker_path.unlink(missing_ok=True)
+
+        num_evicted = self.evict(max_bytes)
+
+        held: List[os.stat_result] = [object_stat for _, object_stat in self.objects()]
+        return {
+            "unreferenced": num_unreferenced,
+            "evicted": num_evicted,
+            "entries": len(held),
+            "bytes": sum(object_stat.st_size for object_stat in held),
+        }
+
+
+def link_or_copy(src_path: pathlib.Path, dst_path: pathlib.Path) -> bool:
+    """Hardlinks a file, falling back to a copy across filesystems.
+
+    Parameters
+    ----------
+    src_path : pathlib.Path
+        path of existing file
+    dst_path : pathlib.Path
+        path of new file
+
+    Returns
+    -------
+    bool
+        whether file was linked, rather than copied
+    """
+    try:
+        os.link(src_path, dst_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src_path, dst_path)
+        return False
+    return True
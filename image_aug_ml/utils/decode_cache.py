@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import pathlib
+
+import cv2
+import numpy as np
+import tqdm
+
+from .file_index import load_file_index
+
+
+class DecodeCache:
+    """Images of a dataset split decoded once, resized to one shape and held in a
+    memory-mapped (N, H, W, 3) uint8 array (BGR, like cv2.imread), with their paths
+    and class labels."""
+
+    def __init__(self, image_dir: pathlib.Path, array_path: pathlib.Path, index: Dict):
+        """Opens cache array read-only.
+
+        Parameters
+        ----------
+        image_dir : pathlib.Path
+            image directory cache was built from
+        array_path : pathlib.Path
+            path of .npy array of decoded images
+        index : Dict
+            index of cache, holds image shape, source paths, sizes and modification
+            times, class names and labels
+        """
+        self.image_dir = image_dir
+        self.array_path = array_path
+        self.index = index
+
+        self.images: np.ndarray = np.load(array_path, mmap_mode="r")
+        self.paths: List[str] = [source[0] for source in index["sources"]]
+        self.class_names: List[str] = index["class_names"]
+        self.labels = np.asarray(index["labels"], dtype=np.int64)
+        self._path_idxs = {path: img_idx for img_idx, path in enumerate(self.paths)}
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getstate__(self) -> Tuple[pathlib.Path, pathlib.Path, Dict]:
+        # pickle by path, so workers map the array rather than copy it
+        return self.image_dir, self.array_path, self.index
+
+    def __setstate__(self, state: Tuple[pathlib.Path, pathlib.Path, Dict]):
+        self.__init__(*state)
+
+    def path_idx(self, img_path: pathlib.Path) -> int:
+        """Finds index of an image in cache.
+
+        Parameters
+        ----------
+        img_path : pathlib.Path
+            path of image, in image directory cache was built from
+
+        Returns
+        -------
+        int
+            index of image in cache array
+        """
+        return self._path_idxs[str(img_path.relative_to(self.image_dir))]
+
+    def get_image(self, img_path: pathlib.Path) -> np.ndarray:
+        """Gets decoded image as a read-only view of cache array.
+
+        Parameters
+        ----------
+        img_path : pathlib.Path
+            path of image, in image directory cache was built from
+
+        Returns
+        -------
+        np.ndarray
+            (H, W, 3) decoded image
+        """
+        return self.images[self.path_idx(img_path)]
+
+
+def get_split_images(image_dir: pathlib.Path, split: str) -> List[pathlib.Path]:
+    """Gets original images of a dataset split, in a reproducible order.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    split : str
+        name of split, "train" or "val"
+
+    Returns
+    -------
+    List[pathlib.Path]
+        sorted image paths
+    """
+    return load_file_index(image_dir).query(split=split, op="original")
+
+
+def build_decode_cache(
+    image_dir: pathlib.Path,
+    split: str,
+    image_shape: Tuple[int, int],
+    cache_dir: Optional[pathlib.Path] = None,
+) -> DecodeCache:
+    """Opens decode cache of a dataset split, (re)building it if missing or if any
+    source image was added, removed or modified since it was built.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    split : str
+        name of split, "train" or "val"
+    image_shape : Tuple[int, int]
+        (height, width) images are resized to
+    cache_dir : Optional[pathlib.Path], optional
+        directory to write cache to, by default image_dir / ".decode_cache"
+
+    Returns
+    -------
+    DecodeCache
+        up to date cache
+    """
+    if cache_dir is None:
+        cache_dir = image_dir / ".decode_cache"
+    height, width = image_shape
+    cache_name = f"{split}_{height}x{width}"
+    array_path = cache_dir / f"{cache_name}.npy"
+    index_path = cache_dir / f"{cache_name}.json"
+
+    # fingerprint source tree by image paths, sizes and modification times
+    img_paths = get_split_images(image_dir, split)
+    sources = []
+    for img_path in img_paths:
+        img_stat = img_path.stat()
+        rel_path = str(img_path.relative_to(image_dir))
+        sources.append([rel_path, img_stat.st_size, img_stat.st_mtime_ns])
+
+    # reuse cache if source tree is unchanged
+    if index_path.exists() and array_path.exists():
+        with open(index_path, "r") as index_file:
+            index = json.load(index_file)
+        if index["image_shape"] == [height, width] and index["sources"] == sources:
+            return DecodeCache(image_dir, array_path, index)
+
+    # label images by their class directory
+    class_names = sorted({img_path.parent.name for img_path in img_paths})
+    class_idxs = {class_name: label for label, class_name in enumerate(class_names)}
+    index = {
+        "image_shape": [height, width],
+        "sources": sources,
+        "class_names": class_names,
+        "labels": [class_idxs[img_path.parent.name] for img_path in img_paths],
+    }
+
+    # decode and resize images into a temporary array
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_dir / f".{cache_name}.npy"
+    images = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.uint8, shape=(len(img_paths), height, width, 3)
+    )
+    for img_idx, img_path in enumerate(tqdm.tqdm(img_paths, desc=f"decoding {split}")):
+        img = cv2.imread(str(img_path))
+        if img.shape[:2] != (height, width):
+            img = cv2.resize(img, (width, height), interpolation=cv2.INTER_LINEAR)
+        images[img_idx] = img
+    images.flush()
+    del images
+
+    # swap in array, then index, so a stale index never describes a new array
+    index_path.unlink(missing_ok=True)
+    os.replace(tmp_path, array_path)
+    with open(index_path, "w") as index_file:
+        json.dump(index, index_file)
+
+    return DecodeCache(image_dir, array_path, index)
@@ -0,0 +1,233 @@
+from typing import Dict, List, Optional, Tuple, Union
+import json
+import os
+import pathlib
+import time
+
+from .codec import IMAGE_SUFFIXES
+
+
+# path of index file relative to the image directory, in a hidden directory of its
+# own so that saving it does not modify the image directory
+INDEX_PATH = pathlib.Path(".file_index", "index.json")
+
+# directories modified this soon before the last scan are listed again, since later
+# changes within the same mtime tick would not change their mtime
+MTIME_SLACK_NS = 2 * 10 ** 9
+
+
+class FileIndex:
+    """Index of the files in an image directory, laid out as
+    <op>/<split>/<class>/<file>, with their sizes and modification times.
+
+    Directory listings are kept with the directory's mtime, so refreshing only lists
+    directories that had entries added, removed or renamed since the last scan.
+    """
+
+    def __init__(
+        self, image_dir: pathlib.Path, dirs: Optional[Dict] = None, scanned_ns: int = 0
+    ):
+        """Creates index from saved directory listings.
+
+        Parameters
+        ----------
+        image_dir : pathlib.Path
+            indexed image directory
+        dirs : Optional[Dict], optional
+            listing of each directory, keyed by path relative to image directory, by
+            default None (nothing indexed)
+        scanned_ns : int, optional
+            time of last scan in ns, by default 0
+        """
+        self.image_dir = image_dir
+        self.dirs: Dict[str, Dict] = {} if dirs is None else dirs
+        self.scanned_ns = scanned_ns
+
+    def refresh(self) -> int:
+        """Brings index up to date with image directory.
+
+        Returns
+        -------
+        int
+            number of directories listed
+        """
+        scan_ns = time.time_ns()
+        dirs: Dict[str, Dict] = {}
+        num_listed = 0
+
+        # walk directory tree, reusing listings of unmodified directories
+        rel_dirs = [""]
+        while rel_dirs:
+            rel_dir = rel_dirs.pop()
+            try:
+                dir_mtime_ns = os.stat(self.image_dir / rel_dir).st_mtime_ns
+            except FileNotFoundError:
+                continue
+
+            listing = self.dirs.get(rel_dir)
+            if (
+                listing is None
+                or listing["mtime_ns"] != dir_mtime_ns
+                or dir_mtime_ns >= self.scanned_ns - MTIME_SLACK_NS
+            ):
+                listing = list_dir(self.image_dir / rel_dir, dir_mtime_ns)
+                num_listed += 1
+
+            dirs[rel_dir] = listing
+            rel_dirs.extend(
+                f"{rel_dir}/{subdir}" if rel_dir else subdir
+                for subdir in listing["subdirs"]
+            )
+
+        self.dirs = dirs
+        self.scanned_ns = scan_ns
+        return num_listed
+
+    def entries(self) -> List[Dict]:
+        """Gets indexed files below the top level of image directory.
+
+        Returns
+        -------
+        List[Dict]
+            path relative to image directory, op, split, class label, size and
+            modification time of each file
+        """
+        entries = []
+        for rel_dir, listing in self.dirs.items():
+            dir_parts = rel_dir.split("/") if rel_dir else []
+            if len(dir_parts) < 2:
+                continue
+
+            for name, size, mtime_ns in listing["files"]:
+                entries.append(
+                    {
+                        "path": f"{rel_dir}/{name}",
+                        "op": dir_parts[0],
+                        "split": dir_parts[1],
+                        "label": dir_parts[-1] if len(dir_parts) > 2 else None,
+                        "size": size,
+                        "mtime_ns": mtime_ns,
+                    }
+                )
+
+        return entries
+
+    def query(
+        self,
+        split: Optional[str] = None,
+        op: Optional[str] = None,
+        label: Optional[str] = None,
+        suffix: Optional[Union[str, Tuple[str, ...]]] = IMAGE_SUFFIXES,
+    ) -> List[pathlib.Path]:
+        """Finds indexed files, without touching the filesystem.
+
+        Parameters
+        ----------
+        split : Optional[str], optional
+            split of files, such as "train" or "val", by default any
+        op : Optional[str], optional
+            op directory of files, such as "original", by default any
+        label : Optional[str], optional
+            class label of files, by default any
+        suffix : Optional[Union[str, Tuple[str, ...]]], optional
+            suffix, or any of several suffixes, of files, by default those of images
+
+        Returns
+        -------
+        List[pathlib.Path]
+            sorted paths of matching files
+        """
+        return sorted(
+            self.image_dir / entry["path"]
+            for entry in self.entries()
+            if (split is None or entry["split"] == split)
+            and (op is None or entry["op"] == op)
+            and (label is None or entry["label"] == label)
+            and (suffix is None or entry["path"].endswith(suffix))
+        )
+
+    def save(self):
+        """Saves index to image directory, if it is writable."""
+        index_path = self.image_dir / INDEX_PATH
+        tmp_path = index_path.with_name(f".{index_path.name}.{os.getpid()}")
+        try:
+            with open(tmp_path, "w") as index_file:
+                json.dump(
+                    {"scanned_ns": self.scanned_ns, "dirs": self.dirs}, index_file
+                )
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass
+
+
+def list_dir(dir_path: pathlib.Path, dir_mtime_ns: int) -> Dict:
+    """Lists a directory's subdirectories and files, skipping hidden entries.
+
+    Parameters
+    ----------
+    dir_path : pathlib.Path
+        directory to list
+    dir_mtime_ns : int
+        modification time of directory in ns, taken before listing it
+
+    Returns
+    -------
+    Dict
+        directory's mtime, subdirectory names, and name, size and mtime of each file
+    """
+    subdirs, files = [], []
+    with os.scandir(dir_path) as dir_entries:
+        for dir_entry in dir_entries:
+            if dir_entry.name.startswith("."):
+                continue
+            if dir_entry.is_dir():
+                subdirs.append(dir_entry.name)
+            else:
+                entry_stat = dir_entry.stat()
+                files.append(
+                    [dir_entry.name, entry_stat.st_size, entry_stat.st_mtime_ns]
+                )
+
+    return {
+        "mtime_ns": dir_mtime_ns,
+        "subdirs": sorted(subdirs),
+        "files": sorted(files),
+    }
+
+
+def load_file_index(image_dir: pathlib.Path, refresh: bool = True) -> FileIndex:
+    """Loads file index of an image directory, building it on first use.
+
+    Parameters
+    ----------
+    image_dir : pathlib.Path
+        image directory
+    refresh : bool, optional
+        whether to bring index up to date, and save it if anything changed, by
+        default True
+
+    Returns
+    -------
+    FileIndex
+        file index
+    """
+    # create index directory before scanning, since creating it modifies image dir
+    try:
+        (image_dir / INDEX_PATH).parent.mkdir(exist_ok=True)
+    except OSError:
+        pass
+
+    file_index = FileIndex(image_dir)
+    try:
+        with open(image_dir / INDEX_PATH, "r") as index_file:
+            saved_index = json.load(index_file)
+        file_index = FileIndex(
+            image_dir, saved_index["dirs"], saved_index["scanned_ns"]
+        )
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if refresh and file_index.refresh():
+        file_index.save()
+
+    return file_index
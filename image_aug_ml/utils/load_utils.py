@@ -1,11 +1,13 @@
 from typing import List
 import pathlib
 
+from .file_index import load_file_index
+
 
 def get_all_train_images(
     image_dir: pathlib.Path = pathlib.Path("./images/"),
 ) -> List[pathlib.Path]:
-    """Gets all training images from image directory.
+    """Gets all training images from image directory, using its file index.
 
     Parameters
     ----------
@@ -17,13 +19,13 @@ def get_all_train_images(
     List[pathlib.Path]
         list of all training image paths
     """
-    return [*image_dir.glob("*/train/**/*.JPEG")]
+    return load_file_index(image_dir).query(split="train")
 
 
 def get_all_original_train_images(
     image_dir: pathlib.Path = pathlib.Path("./images/"),
 ) -> List[pathlib.Path]:
-    """Gets all original training images from image directory.
+    """Gets all original training images from image directory, using its file index.
 
     Parameters
     ----------
@@ -35,13 +37,13 @@ def get_all_original_train_images(
     List[pathlib.Path]
         list of all training image paths
     """
-    return [*image_dir.glob("original/train/**/*.JPEG")]
+    return load_file_index(image_dir).query(split="train", op="original")
 
 
 def get_all_test_images(
     image_dir: pathlib.Path = pathlib.Path("./images/"),
 ) -> List[pathlib.Path]:
-    """Gets all validation/testing images from image directory.
+    """Gets all validation/testing images from image directory, using its file index.
 
     Parameters
     ----------
@@ -53,4 +55,4 @@ def get_all_test_images(
     List[pathlib.Path]
         list of all validation/testing image paths
     """
-    return [*image_dir.glob("*/val/**/*.JPEG")]
+    return load_file_index(image_dir).query(split="val")
@@ -0,0 +1,135 @@
+from typing import Any, Callable, Dict, Hashable, Tuple
+import collections
+
+import numpy as np
+
+
+def array_nbytes(value: Any) -> int:
+    """Finds total size of the arrays held in a (possibly nested) tuple.
+
+    Parameters
+    ----------
+    value : Any
+        array, or tuple of arrays and tuples
+
+    Returns
+    -------
+    int
+        total size of held arrays in bytes
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, tuple):
+        return sum(map(array_nbytes, value))
+    return 0
+
+
+def freeze_arrays(value: Any):
+    """Marks the arrays held in a (possibly nested) tuple read-only.
+
+    Parameters
+    ----------
+    value : Any
+        array, or tuple of arrays and tuples
+    """
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, tuple):
+        for item in value:
+            freeze_arrays(item)
+
+
+class LRUCache:
+    """Bounded, memory-capped LRU cache of arrays (or tuples of arrays), with
+    hit/miss/eviction counters."""
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 2 ** 20):
+        """Creates empty cache.
+
+        Parameters
+        ----------
+        max_entries : int, optional
+            maximum number of values to hold, by default 64
+        max_bytes : int, optional
+            maximum total size of held arrays in bytes, by default 256 MiB
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._values: "collections.OrderedDict[Hashable, Tuple[Any, int]]" = (
+            collections.OrderedDict()
+        )
+        self.clear()
+
+    def clear(self):
+        """Drops all held values and resets counters."""
+        self._values.clear()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Returns cached value, building and caching it on a miss.
+
+        Held arrays are shared between callers, so they are made read-only.
+
+        Parameters
+        ----------
+        key : Hashable
+            cache key
+        build : Callable[[], Any]
+            function building the value on a miss
+
+        Returns
+        -------
+        Any
+            value for key
+        """
+        # serve and refresh held value
+        if key in self._values:
+            self.hits += 1
+            self._values.move_to_end(key)
+            return self._values[key][0]
+
+        # build value, and freeze it since it is shared between callers
+        self.misses += 1
+        value = build()
+        freeze_arrays(value)
+        value_bytes = array_nbytes(value)
+
+        # values larger than the whole budget are never held
+        if value_bytes > self.max_bytes:
+            return value
+
+        # evict least recently used values until the new value fits
+        while self._values and (
+            len(self._values) >= self.max_entries
+            or self.num_bytes + value_bytes > self.max_bytes
+        ):
+            _, (_, evicted_bytes) = self._values.popitem(last=False)
+            self.num_bytes -= evicted_bytes
+            self.evictions += 1
+
+        self._values[key] = (value, value_bytes)
+        self.num_bytes += value_bytes
+
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        """Returns cache counters.
+
+        Returns
+        -------
+        Dict[str, float]
+            hits, misses, evictions, held entries, held bytes and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._values),
+            "bytes": self.num_bytes,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,195 @@
+from typing import Dict, List, Optional, Union
+import csv
+import json
+import pathlib
+import threading
+import time
+
+
+# columns of each stage's counters
+STAT_FIELDS = ("calls", "items", "seconds", "bytes")
+
+# prefix of augmentation op stages
+OP_STAGE_PREFIX = "op/"
+
+
+class Profiler:
+    """Accumulates wall time, call count, item count and bytes of named stages, such
+    as decoding, each augmentation op, encoding and writing.
+
+    Counters are plain lists per stage, so they are cheap to update, pickle and merge
+    across threads and worker processes.
+    """
+
+    def __init__(self, stats: Optional[Dict[str, List[float]]] = None):
+        """Creates profiler, optionally holding counters of an earlier profile.
+
+        Parameters
+        ----------
+        stats : Optional[Dict[str, List[float]]], optional
+            calls, items, seconds and bytes of each stage, by default none
+        """
+        self.stats: Dict[str, List[float]] = {} if stats is None else stats
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, items: int = 1, num_bytes: int = 0):
+        """Adds a call of a stage to its counters.
+
+        Parameters
+        ----------
+        stage : str
+            name of stage
+        seconds : float
+            wall time of call
+        items : int, optional
+            number of images handled by call, by default 1
+        num_bytes : int, optional
+            number of bytes handled by call, by default 0
+        """
+        with self._lock:
+            stage_stats = self.stats.get(stage)
+            if stage_stats is None:
+                stage_stats = self.stats[stage] = [0, 0, 0.0, 0]
+            stage_stats[0] += 1
+            stage_stats[1] += items
+            stage_stats[2] += seconds
+            stage_stats[3] += num_bytes
+
+    def merge(self, stats: Dict[str, List[float]]):
+        """Adds counters of another profile, such as one from a worker process.
+
+        Parameters
+        ----------
+        stats : Dict[str, List[float]]
+            calls, items, seconds and bytes of each stage
+        """
+        with self._lock:
+            for stage, other_stats in stats.items():
+                stage_stats = self.stats.setdefault(stage, [0, 0, 0.0, 0])
+                for field_idx, value in enumerate(other_stats):
+                    stage_stats[field_idx] += value
+
+    def summary(self) -> List[Dict]:
+        """Summarizes counters and throughput of each stage.
+
+        Returns
+        -------
+        List[Dict]
+            stage, calls, items, seconds, bytes, items per second and MiB per second
+            of each stage, slowest first
+        """
+        with self._lock:
+            stats = {
+                stage: list(stage_stats) for stage, stage_stats in self.stats.items()
+            }
+
+        rows = []
+        for stage, stage_stats in stats.items():
+            row = {"stage": stage, **dict(zip(STAT_FIELDS, stage_stats))}
+            seconds = row["seconds"]
+            row["items_per_s"] = row["items"] / seconds if seconds else 0.0
+            row["mb_per_s"] = row["bytes"] / 2 ** 20 / seconds if seconds else 0.0
+            rows.append(row)
+
+        return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+    def op_throughput(self) -> str:
+        """Describes images per second of each augmentation op, for a progress bar.
+
+        Returns
+        -------
+        str
+            throughput of each op stage
+        """
+        return ", ".join(
+            f"{row['stage'][len(OP_STAGE_PREFIX):]} {row['items_per_s']:.1f}/s"
+            for row in self.summary()
+            if row["stage"].startswith(OP_STAGE_PREFIX)
+        )
+
+    def save(self, summary_path: pathlib.Path):
+        """Saves summary of each stage, as CSV if path ends in .csv, otherwise JSON.
+
+        Parameters
+        ----------
+        summary_path : pathlib.Path
+            path of summary file
+        """
+        rows = self.summary()
+        with open(summary_path, "w", newline="") as summary_file:
+            if summary_path.suffix == ".csv":
+                writer = csv.DictWriter(
+                    summary_file,
+                    ["stage", *STAT_FIELDS, "items_per_s", "mb_per_s"],
+                )
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump(rows, summary_file, indent=2)
+
+
+class StageTimer:
+    """Context manager timing one call of a stage. Items and bytes may be set on it
+    before the call ends."""
+
+    __slots__ = ("profiler", "stage", "items", "num_bytes", "start")
+
+    def __init__(self, profiler: Profiler, stage: str, items: int, num_bytes: int):
+        self.profiler = profiler
+        self.stage = stage
+        self.items = items
+        self.num_bytes = num_bytes
+
+    def __enter__(self) -> "StageTimer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(
+            self.stage, time.perf_counter() - self.start, self.items, self.num_bytes
+        )
+
+
+class NullTimer:
+    """Context manager standing in for StageTimer when profiling is off, ignoring
+    items and bytes set on it."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "NullTimer":
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __setattr__(self, name: str, value: int):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+def profile(
+    profiler: Optional[Profiler], stage: str, items: int = 1, num_bytes: int = 0
+) -> Union[StageTimer, NullTimer]:
+    """Times a call of a stage, if profiling.
+
+    Parameters
+    ----------
+    profiler : Optional[Profiler]
+        profiler to record call in, or None if profiling is off
+    stage : str
+        name of stage
+    items : int, optional
+        number of images handled by call, by default 1
+    num_bytes : int, optional
+        number of bytes handled by call, by default 0
+
+    Returns
+    -------
+    Union[StageTimer, NullTimer]
+        context manager timing the call, doing nothing if profiling is off
+    """
+    if profiler is None:
+        return NULL_TIMER
+    return StageTimer(profiler, stage, items, num_bytes)
@@ -0,0 +1,95 @@
+from typing import Any, Iterator, List, Optional, Tuple, Union
+import contextlib
+import threading
+
+import numpy as np
+
+
+# generator in use by the current thread, if any
+_rng_state = threading.local()
+
+
+def get_rng() -> Any:
+    """Gets the random number source that augmentation ops draw from.
+
+    Returns
+    -------
+    Any
+        generator set by use_rng in the current thread, otherwise the np.random
+        module (numpy's global random state)
+    """
+    rng = getattr(_rng_state, "rng", None)
+    return np.random if rng is None else rng
+
+
+class StackRng:
+    """Generators of each image of a stack, drawn from together by batched ops.
+
+    Each image's value is drawn from its own generator, in the order the op draws
+    them, so a batched op gives every image the values it would draw alone.
+    """
+
+    def __init__(self, rngs: List[np.random.Generator]):
+        """Wraps generators of a stack of images.
+
+        Parameters
+        ----------
+        rngs : List[np.random.Generator]
+            generator of each image, in stack order
+        """
+        self.rngs = rngs
+
+    def uniform(
+        self,
+        low: Union[float, np.ndarray] = 0.0,
+        high: Union[float, np.ndarray] = 1.0,
+        size: Optional[Union[int, Tuple[int]]] = None,
+    ) -> np.ndarray:
+        """Draws one uniform value for each image of the stack.
+
+        Parameters
+        ----------
+        low : Union[float, np.ndarray], optional
+            lower bound, shared or one per image, by default 0.0
+        high : Union[float, np.ndarray], optional
+            upper bound, shared or one per image, by default 1.0
+        size : Optional[Union[int, Tuple[int]]], optional
+            number of values, which must be the number of images, by default the
+            number of images
+
+        Returns
+        -------
+        np.ndarray
+            value of each image
+        """
+        num_imgs = len(self.rngs)
+        assert size is None or np.prod(size) == num_imgs, "Must draw one per image"
+        lows, highs = np.broadcast_to(low, num_imgs), np.broadcast_to(high, num_imgs)
+        return np.array(
+            [rng.uniform(*bounds) for rng, *bounds in zip(self.rngs, lows, highs)]
+        )
+
+
+@contextlib.contextmanager
+def use_rng(
+    rng: Union[np.random.Generator, StackRng]
+) -> Iterator[Union[np.random.Generator, StackRng]]:
+    """Makes augmentation ops in the current thread draw from a generator.
+
+    Parameters
+    ----------
+    rng : Union[np.random.Generator, StackRng]
+        generator to draw from inside the context, or generators of each image of
+        a stack for a batched op
+
+    Yields
+    ------
+    Union[np.random.Generator, StackRng]
+        the generator
+    """
+    prev_rng = getattr(_rng_state, "rng", None)
+    _rng_state.rng = rng
+    try:
+        yield rng
+    finally:
+        _rng_state.rng = prev_rng
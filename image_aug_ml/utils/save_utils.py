@@ -1,30 +1,179 @@
+from typing import Optional, Tuple
 import pathlib
+import time
 
-import cv2
 import numpy as np
 
+from .codec import EncodeConf, encode_image, output_suffix
+from .content_store import ContentStore
+from .profiler import Profiler, profile
+from .shard_utils import get_shard_writer
+
+
+def get_augment_path(
+    train_img_path: pathlib.Path,
+    augment_name: str,
+    encode_conf: Optional[EncodeConf] = None,
+) -> pathlib.Path:
+    """Gets path of augmented image, built from train image path and augmentation name.
+
+    Parameters
+    ----------
+    train_img_path : pathlib.Path
+        path where the original image was loaded from
+    augment_name : str
+        name of the augmentation operation performed
+    encode_conf : Optional[EncodeConf], optional
+        output format, whose suffix replaces that of the train image, by default None
+
+    Returns
+    -------
+    pathlib.Path
+        path of augmented image
+    """
+    return pathlib.Path(
+        *[part if part != "original" else augment_name for part in train_img_path.parts]
+    ).with_suffix(output_suffix(train_img_path, encode_conf))
+
 
 def save_to_file(
-    augment_img: np.ndarray, train_img_path: pathlib.Path, augment_name: str
-):
+    augment_img: Optional[np.ndarray],
+    train_img_path: pathlib.Path,
+    augment_name: str,
+    content_store: Optional[ContentStore] = None,
+    content_key: Optional[str] = None,
+    profiler: Optional[Profiler] = None,
+    encode_conf: Optional[EncodeConf] = None,
+) -> Tuple[int, float]:
     """Saves image to file, with path built using the train image path and the augmentation name.
 
     Parameters
     ----------
-    augment_img : np.ndarray
-        augmented image as numpy array
+    augment_img : Optional[np.ndarray]
+        augmented image as numpy array, or None to link stored image
     train_img_path : pathlib.Path
         path where the original image was loaded from
     augment_name : str
         name of the augmentation operation performed
+    content_store : Optional[ContentStore], optional
+        store to link image from, or to add saved image to, by default None
+    content_key : Optional[str], optional
+        content store key of image, by default None
+    profiler : Optional[Profiler], optional
+        profiler to time linking, directory creation, encoding and writing in, by
+        default None
+    encode_conf : Optional[EncodeConf], optional
+        output format and quality, by default None (format of train image's suffix,
+        with OpenCV's default quality)
+
+    Returns
+    -------
+    Tuple[int, float]
+        number of encoded bytes written and seconds spent encoding, both 0 if linked
     """
     # create augmented image path
-    aug_img_path = pathlib.Path(
-        *[part if part != "original" else augment_name for part in train_img_path.parts]
-    )
+    aug_img_path = get_augment_path(train_img_path, augment_name, encode_conf)
+
+    # link stored image
+    if augment_img is None:
+        assert content_store is not None, "image must be provided without a store"
+        with profile(profiler, "link"):
+            if not content_store.materialize(content_key, aug_img_path):
+                raise FileNotFoundError(f"{content_key} was evicted from content store")
+        return 0, 0.0
 
     # make directory if doesn't already exist
-    aug_img_path.parent.mkdir(parents=True, exist_ok=True)
+    with profile(profiler, "mkdir"):
+        aug_img_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # encode image in configured format, or that of its suffix
+    with profile(profiler, "encode") as timer:
+        encode_start = time.perf_counter()
+        encoded_img = encode_image(augment_img, aug_img_path.suffix, encode_conf)
+        encode_seconds = time.perf_counter() - encode_start
+        timer.num_bytes = encoded_img.nbytes
+
+    # save image to path, unlinking first so stored images it links are kept
+    with profile(profiler, "write", num_bytes=encoded_img.nbytes):
+        aug_img_path.unlink(missing_ok=True)
+        encoded_img.tofile(aug_img_path)
+
+    # add saved image to store
+    if content_store is not None:
+        with profile(profiler, "store"):
+            content_store.put(content_key, aug_img_path)
+
+    return encoded_img.nbytes, encode_seconds
+
+
+def save_to_shard(
+    augment_img: Optional[np.ndarray],
+    train_img_path: pathlib.Path,
+    augment_name: str,
+    content_store: Optional[ContentStore] = None,
+    content_key: Optional[str] = None,
+    max_shard_bytes: int = 64 * 2 ** 20,
+    profiler: Optional[Profiler] = None,
+    encode_conf: Optional[EncodeConf] = None,
+) -> Tuple[int, float]:
+    """Appends encoded image to the shards of its augmentation, in the directory the
+    augmentation's class directories would be saved in, indexed with its label and op.
+
+    Parameters
+    ----------
+    augment_img : Optional[np.ndarray]
+        augmented image as numpy array, or None to read stored image
+    train_img_path : pathlib.Path
+        path where the original image was loaded from
+    augment_name : str
+        name of the augmentation operation performed
+    content_store : Optional[ContentStore], optional
+        store to read image from, or to add encoded image to, by default None
+    content_key : Optional[str], optional
+        content store key of image, by default None
+    max_shard_bytes : int, optional
+        size after which a new shard is started, by default 64 MiB
+    profiler : Optional[Profiler], optional
+        profiler to time encoding and writing in, by default None
+    encode_conf : Optional[EncodeConf], optional
+        output format and quality, by default None (format of train image's suffix,
+        with OpenCV's default quality)
+
+    Returns
+    -------
+    Tuple[int, float]
+        number of bytes encoded and seconds spent encoding, both 0 if read from store
+    """
+    # find shard directory, which replaces class directories of augmented image path
+    aug_img_path = get_augment_path(train_img_path, augment_name, encode_conf)
+    shard_dir = aug_img_path.parent.parent
+
+    # read stored image, or encode image and add it to store
+    encoded_bytes, encode_seconds = 0, 0.0
+    if augment_img is None:
+        assert content_store is not None, "image must be provided without a store"
+        with profile(profiler, "link") as timer:
+            payload = content_store.object_path(content_key).read_bytes()
+            timer.num_bytes = len(payload)
+    else:
+        with profile(profiler, "encode") as timer:
+            encode_start = time.perf_counter()
+            encoded_img = encode_image(augment_img, aug_img_path.suffix, encode_conf)
+            encode_seconds = time.perf_counter() - encode_start
+            payload = encoded_img.tobytes()
+            timer.num_bytes = encoded_bytes = len(payload)
+        if content_store is not None:
+            with profile(profiler, "store"):
+                content_store.put_bytes(content_key, payload)
+
+    with profile(profiler, "write", num_bytes=len(payload)):
+        get_shard_writer(shard_dir, max_shard_bytes).append(
+            payload,
+            {
+                "key": str(aug_img_path.relative_to(shard_dir)),
+                "label": aug_img_path.parent.name,
+                "op": augment_name,
+            },
+        )
 
-    # save image to path
-    cv2.imwrite(str(aug_img_path), augment_img)
+    return encoded_bytes, encode_seconds
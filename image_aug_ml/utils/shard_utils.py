@@ -0,0 +1,323 @@
+from typing import BinaryIO, Dict, List, Optional
+import json
+import os
+import pathlib
+import struct
+import threading
+import time
+
+
+# suffixes of shard files and their index files
+SHARD_SUFFIX = ".shard"
+INDEX_SUFFIX = ".index.jsonl"
+
+# records are prefixed by their length as a little-endian uint32
+LENGTH_PREFIX = struct.Struct("<I")
+
+# open writers of this process, keyed by shard directory
+_shard_writers: Dict[pathlib.Path, "ShardWriter"] = {}
+_shard_writers_lock = threading.Lock()
+
+
+class ShardWriter:
+    """Appends length-prefixed records to size-capped shard files in a directory,
+    indexing each record's offset, length and metadata in a JSON lines file next to
+    its shard."""
+
+    def __init__(self, shard_dir: pathlib.Path, max_shard_bytes: int = 64 * 2 ** 20):
+        """Creates writer, shards are opened on first append.
+
+        Parameters
+        ----------
+        shard_dir : pathlib.Path
+            directory to write shards to
+        max_shard_bytes : int, optional
+            size after which a new shard is started, by default 64 MiB
+        """
+        self.shard_dir = shard_dir
+        self.max_shard_bytes = max_shard_bytes
+
+        self._lock = threading.Lock()
+        self._shard_file: Optional[BinaryIO] = None
+        self._shard_path: Optional[pathlib.Path] = None
+        self._index_entries: List[Dict] = []
+
+    def append(self, payload: bytes, metadata: Dict):
+        """Appends a record to the current shard.
+
+        Parameters
+        ----------
+        payload : bytes
+            record contents
+        metadata : Dict
+            JSON serializable metadata indexed with record
+        """
+        with self._lock:
+            # start a new shard once current one is full
+            if (
+                self._shard_file is None
+                or self._shard_file.tell() >= self.max_shard_bytes
+            ):
+                self._open_shard()
+
+            self._shard_file.write(LENGTH_PREFIX.pack(len(payload)))
+            offset = self._shard_file.tell()
+            self._shard_file.write(payload)
+
+            self._index_entries.append(
+                {
+                    **metadata,
+                    "shard": self._shard_path.name,
+                    "offset": offset,
+                    "length": len(payload),
+                }
+            )
+
+    def flush(self):
+        """Writes buffered records to disk, then indexes them."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Flushes and closes current shard."""
+        with self._lock:
+            self._flush()
+            if self._shard_file is not None:
+                self._shard_file.close()
+                self._shard_file = None
+
+    def _open_shard(self):
+        # finish current shard
+        self._flush()
+        if self._shard_file is not None:
+            self._shard_file.close()
+
+        # name shards so that they sort in order of creation
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self._shard_path = self.shard_dir / (
+            f"{time.time_ns():020d}-{os.getpid()}-{id(self):x}{SHARD_SUFFIX}"
+        )
+        self._shard_file = open(self._shard_path, "wb")
+
+    def _flush(self):
+        if self._shard_file is None or not self._index_entries:
+            return
+
+        # records must reach disk before they are indexed
+        self._shard_file.flush()
+        os.fsync(self._shard_file.fileno())
+        with open(get_index_path(self._shard_path), "a") as index_file:
+            index_file.writelines(
+                json.dumps(index_entry) + "\n" for index_entry in self._index_entries
+            )
+        self._index_entries = []
+
+
+def get_index_path(shard_path: pathlib.Path) -> pathlib.Path:
+    """Gets path of index file of a shard.
+
+    Parameters
+    ----------
+    shard_path : pathlib.Path
+        path of shard
+
+    Returns
+    -------
+    pathlib.Path
+        path of index file
+    """
+    return shard_path.with_name(shard_path.name[: -len(SHARD_SUFFIX)] + INDEX_SUFFIX)
+
+
+def get_shard_writer(
+    shard_dir: pathlib.Path, max_shard_bytes: int = 64 * 2 ** 20
+) -> ShardWriter:
+    """Gets this process' writer of a shard directory, creating it if needed.
+
+    Parameters
+    ----------
+    shard_dir : pathlib.Path
+        directory to write shards to
+    max_shard_bytes : int, optional
+        size after which a new shard is started, by default 64 MiB
+
+    Returns
+    -------
+    ShardWriter
+        shared writer of shard directory
+    """
+    with _shard_writers_lock:
+        if shard_dir not in _shard_writers:
+            _shard_writers[shard_dir] = ShardWriter(shard_dir, max_shard_bytes)
+        return _shard_writers[shard_dir]
+
+
+def flush_shard_writers():
+    """Flushes every writer of this process, so that written records are indexed."""
+    with _shard_writers_lock:
+        shard_writers = list(_shard_writers.values())
+    for shard_writer in shard_writers:
+        shard_writer.flush()
+
+
+def close_shard_writers():
+    """Closes and forgets every writer of this process, so that their shards can be
+    rewritten."""
+    with _shard_writers_lock:
+        shard_writers = list(_shard_writers.values())
+        _shard_writers.clear()
+    for shard_writer in shard_writers:
+        shard_writer.close()
+
+
+def has_shards(shard_dir: pathlib.Path) -> bool:
+    """Checks if a directory holds indexed shards.
+
+    Parameters
+    ----------
+    shard_dir : pathlib.Path
+        directory to check
+
+    Returns
+    -------
+    bool
+        whether directory holds at least one shard index
+    """
+    return any(shard_dir.glob(f"*{INDEX_SUFFIX}"))
+
+
+def load_shard_index(shard_dir: pathlib.Path) -> List[Dict]:
+    """Loads index entries of all shards in a directory.
+
+    Records rewritten by later runs supersede earlier ones with the same key.
+
+    Parameters
+    ----------
+    shard_dir : pathlib.Path
+        directory holding shards
+
+    Returns
+    -------
+    List[Dict]
+        latest index entry of each record key, with its shard path, offset, length
+        and metadata
+    """
+    index_entries: Dict[str, Dict] = {}
+    for index_path in sorted(shard_dir.glob(f"*{INDEX_SUFFIX}")):
+        with open(index_path, "r") as index_file:
+            for line in index_file:
+                # skip line left partially written by an interrupted run
+                try:
+                    index_entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                index_entry["shard"] = str(shard_dir / index_entry["shard"])
+                index_entries[index_entry["key"]] = index_entry
+
+    return list(index_entries.values())
+
+
+def intact_records(shard_dir: pathlib.Path) -> List[Dict]:
+    """Loads index entries of the records in a directory whose shards still hold
+    them, skipping records of deleted or truncated shards.
+
+    Parameters
+    ----------
+    shard_dir : pathlib.Path
+        directory holding shards
+
+    Returns
+    -------
+    List[Dict]
+        latest index entry of each intact record
+    """
+    shard_sizes: Dict[str, int] = {}
+    for shard_path in shard_dir.glob(f"*{SHARD_SUFFIX}"):
+        shard_sizes[str(shard_path)] = shard_path.stat().st_size
+
+    return [
+        index_entry
+        for index_entry in load_shard_index(shard_dir)
+        if index_entry["offset"] + index_entry["length"]
+        <= shard_sizes.get(index_entry["shard"], -1)
+    ]
+
+
+def compact_shards(
+    shard_dir: pathlib.Path,
+    max_shard_bytes: int = 64 * 2 ** 20,
+    max_stale_fraction: float = 0.5,
+) -> bool:
+    """Rewrites the latest record of each key into new shards, dropping records
+    superseded by later runs, once they take up too much of the directory.
+
+    Writers of this process must be closed first. New shards sort after the old
+    ones, which are only removed once the new ones are indexed, so an interrupted
+    compaction loses nothing.
+
+    Parameters
+    ----------
+    shard_dir : pathlib.Path
+        directory holding shards
+    max_shard_bytes : int, optional
+        size after which a new shard is started, by default 64 MiB
+    max_stale_fraction : float, optional
+        largest fraction of shard bytes left to superseded records before the
+        directory is compacted, by default 0.5
+
+    Returns
+    -------
+    bool
+        whether directory was compacted
+    """
+    old_shard_paths = sorted(shard_dir.glob(f"*{SHARD_SUFFIX}"))
+    old_index_paths = sorted(shard_dir.glob(f"*{INDEX_SUFFIX}"))
+    total_bytes = sum(shard_path.stat().st_size for shard_path in old_shard_paths)
+    index_entries = intact_records(shard_dir)
+    live_bytes = sum(
+        LENGTH_PREFIX.size + index_entry["length"] for index_entry in index_entries
+    )
+    if total_bytes - live_bytes <= max_stale_fraction * total_bytes:
+        return False
+
+    # copy live records in shard order, so shards are read sequentially
+    shard_writer = ShardWriter(shard_dir, max_shard_bytes)
+    for index_entry in sorted(
+        index_entries, key=lambda entry: (entry["shard"], entry["offset"])
+    ):
+        metadata = {
+            field: value
+            for field, value in index_entry.items()
+            if field not in ("shard", "offset", "length")
+        }
+        shard_writer.append(read_shard_record(index_entry), metadata)
+    shard_writer.close()
+
+    # remove old shards, and indexes of deleted ones, once live records are
+    # indexed elsewhere
+    for index_path in old_index_paths:
+        index_path.unlink(missing_ok=True)
+    for shard_path in old_shard_paths:
+        shard_path.unlink(missing_ok=True)
+
+    return True
+
+
+def read_shard_record(index_entry: Dict) -> bytes:
+    """Reads a record's contents from its shard.
+
+    Parameters
+    ----------
+    index_entry : Dict
+        index entry of record, as loaded by load_shard_index
+
+    Returns
+    -------
+    bytes
+        record contents
+    """
+    with open(index_entry["shard"], "rb") as shard_file:
+        shard_file.seek(index_entry["offset"] - LENGTH_PREFIX.size)
+        (length,) = LENGTH_PREFIX.unpack(shard_file.read(LENGTH_PREFIX.size))
+        assert length == index_entry["length"], "shard record does not match index"
+        return shard_file.read(length)
@@ -3,7 +3,9 @@ import pathlib
 
 import yaml
 
-from image_aug_ml.augmentation import augment_images
+from image_aug_ml.augmentation import IOConf, augment_images
+from image_aug_ml.augmentation.pipeline import PipelineConf
+from image_aug_ml.utils import ContentStore, EncodeConf, Profiler, build_decode_cache
 
 
 if __name__ == "__main__":
@@ -18,6 +20,126 @@ if __name__ == "__main__":
     parser.add_argument(
         "--subsample_pct", help="percentage of training images to subsample", type=float
     )
+    parser.add_argument(
+        "--batch_size",
+        help="number of images to augment per chunk",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--workers", help="number of worker processes", type=int, default=1
+    )
+    parser.add_argument(
+        "--chunk_size",
+        help="number of images handed to a worker at once",
+        type=int,
+        default=64,
+    )
+    parser.add_argument("--seed", help="base random seed", type=int)
+    parser.add_argument(
+        "--force",
+        help="redo augmentations that are already up to date",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--dry_run",
+        help="summarize pending augmentations without performing them",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--store_dir", help="path to content store of augmented images to reuse"
+    )
+    parser.add_argument(
+        "--store_max_mb",
+        help="size cap of content store in MiB, least recently used images are evicted",
+        type=float,
+    )
+    parser.add_argument(
+        "--shard_mb",
+        help="pack augmented images into indexed shards of this size in MiB, "
+        "instead of saving a file per image",
+        type=float,
+    )
+    parser.add_argument(
+        "--decode_shape",
+        help="augment training images read from a cache, decoded once and resized "
+        "to this height and width",
+        type=int,
+        nargs=2,
+    )
+    parser.add_argument(
+        "--reduced_decode_shape",
+        help="decode JPEGs at 1/2, 1/4 or 1/8 scale while they stay at least this "
+        "height and width, such as the classifier's image shape",
+        type=int,
+        nargs=2,
+    )
+    default_encode_conf = EncodeConf()
+    parser.add_argument(
+        "--format",
+        help="format of augmented images, jpeg keeps the training images' suffix",
+        choices=("jpeg", "png", "webp"),
+        default=default_encode_conf.format,
+    )
+    parser.add_argument(
+        "--jpeg_quality",
+        help="JPEG quality of augmented images, from 0 to 100",
+        type=int,
+        default=default_encode_conf.jpeg_quality,
+    )
+    parser.add_argument(
+        "--png_compression",
+        help="PNG compression level of augmented images, from 0 to 9",
+        type=int,
+        default=default_encode_conf.png_compression,
+    )
+    parser.add_argument(
+        "--profile",
+        help="time each stage and op, saving a summary as JSON and CSV",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile_path",
+        help="path of profile summary, without suffix",
+        default="augment_profile",
+    )
+    parser.add_argument(
+        "--buffer_pool_mb",
+        help="maximum size in MiB of output and scratch buffers reused across images "
+        "in each worker, 0 to allocate buffers for every image",
+        type=float,
+        default=256,
+    )
+    default_pipeline_conf = PipelineConf()
+    parser.add_argument(
+        "--pipeline",
+        help="overlap image decoding and encoding with augmentation",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--reader_threads",
+        help="number of image decoding threads per worker",
+        type=int,
+        default=default_pipeline_conf.reader_threads,
+    )
+    parser.add_argument(
+        "--writer_threads",
+        help="number of image encoding threads per worker",
+        type=int,
+        default=default_pipeline_conf.writer_threads,
+    )
+    parser.add_argument(
+        "--read_queue_depth",
+        help="maximum number of decoded batches waiting for augmentation",
+        type=int,
+        default=default_pipeline_conf.read_queue_depth,
+    )
+    parser.add_argument(
+        "--write_queue_depth",
+        help="maximum number of augmented images waiting for encoding",
+        type=int,
+        default=default_pipeline_conf.write_queue_depth,
+    )
 
     args = parser.parse_args()
 
@@ -25,5 +147,106 @@ if __name__ == "__main__":
     with open(args.augmentation_conf, "r") as augmentation_conf_file:
         augmentation_dict = yaml.load(augmentation_conf_file, Loader=yaml.SafeLoader)
 
+    # configure decode, augment and encode pipeline
+    pipeline_conf = None
+    if args.pipeline:
+        pipeline_conf = PipelineConf(
+            args.reader_threads,
+            args.writer_threads,
+            args.read_queue_depth,
+            args.write_queue_depth,
+        )
+
+    # open content store of augmented images
+    content_store = None
+    if args.store_dir is not None:
+        content_store = ContentStore(
+            pathlib.Path(args.store_dir),
+            None if args.store_max_mb is None else int(args.store_max_mb * 2 ** 20),
+        )
+
+    # decode training images into cache, unless cache is up to date
+    decode_cache = None
+    if args.decode_shape is not None:
+        decode_cache = build_decode_cache(
+            pathlib.Path(args.image_dir), "train", tuple(args.decode_shape)
+        )
+
+    # configure output encoding, leaving default encoding unconfigured
+    encode_conf = EncodeConf(args.format, args.jpeg_quality, args.png_compression)
+    if encode_conf == default_encode_conf:
+        encode_conf = None
+
+    # time stages and ops if profiling
+    profiler = Profiler() if args.profile else None
+    run_stats = {}
+
+    # group decode, encode, store and shard options
+    io_conf = IOConf(
+        decode_cache,
+        None if args.reduced_decode_shape is None else tuple(args.reduced_decode_shape),
+        encode_conf,
+        content_store,
+        None if args.shard_mb is None else int(args.shard_mb * 2 ** 20),
+    )
+
     # augment images and save copies to filesystem
-    augment_images(augmentation_dict, pathlib.Path(args.image_dir), args.subsample_pct)
+    pending = augment_images(
+        augmentation_dict,
+        pathlib.Path(args.image_dir),
+        subsample_pct=args.subsample_pct,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        pipeline_conf=pipeline_conf,
+        io_conf=io_conf,
+        force=args.force,
+        dry_run=args.dry_run,
+        profiler=profiler,
+        buffer_pool_bytes=int(args.buffer_pool_mb * 2 ** 20),
+        run_stats=run_stats,
+    )
+
+    # summarize pending augmentations
+    print("dry run, pending outputs:" if args.dry_run else "completed outputs:")
+    for augment_name, num_pending in pending.items():
+        print(f"  {augment_name}: {num_pending}")
+
+    # summarize CPU time, decode and encode times, and bytes of decoding and encoding
+    if run_stats:
+        num_imgs = max(run_stats["images"], 1)
+        num_outputs = max(sum(pending.values()), 1)
+        mib = {key: value / 2 ** 20 for key, value in run_stats.items()}
+        print(
+            f"cpu time: {run_stats['cpu_seconds']:.2f} s, "
+            f"{1e3 * run_stats['cpu_seconds'] / num_imgs:.1f} ms/image"
+        )
+        print(
+            f"decoded: {mib['decoded_bytes']:.1f} MiB, "
+            f"{mib['full_decoded_bytes'] - mib['decoded_bytes']:.1f} MiB saved by "
+            "reduced decoding"
+        )
+        print(
+            f"decode time: {run_stats['decode_seconds']:.2f} s, "
+            f"{1e3 * run_stats['decode_seconds'] / num_imgs:.1f} ms/image, "
+            f"encode time: {run_stats['encode_seconds']:.2f} s, "
+            f"{1e3 * run_stats['encode_seconds'] / num_outputs:.1f} ms/output"
+        )
+        print(
+            f"encoded: {mib['encoded_bytes']:.1f} MiB, "
+            f"{2 ** 10 * mib['encoded_bytes'] / num_outputs:.1f} KiB/output against "
+            f"{2 ** 10 * mib['source_bytes'] / num_imgs:.1f} KiB/source image"
+        )
+
+    # summarize and save profile
+    if profiler is not None:
+        print("profile:")
+        for row in profiler.summary():
+            print(
+                f"  {row['stage']:>24}: {row['seconds']:9.2f} s, "
+                f"{row['calls']:7d} calls, {row['items_per_s']:9.1f} images/s, "
+                f"{row['mb_per_s']:8.1f} MiB/s"
+            )
+        for suffix in (".json", ".csv"):
+            profiler.save(pathlib.Path(args.profile_path).with_suffix(suffix))
@@ -0,0 +1,114 @@
+"""Benchmarks augmentation ops on synthetic images, and checks them for regressions
+against a baseline."""
+import pathlib
+import sys
+
+import yaml
+
+from image_aug_ml.augmentation.benchmark import (
+    IMAGE_SIZES,
+    compare_benchmarks,
+    load_benchmarks,
+    run_benchmarks,
+    save_benchmarks,
+)
+
+
+# repository root, which default config and baseline paths are relative to
+REPO_DIR = pathlib.Path(__file__).parents[1]
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="Augmentation Benchmarks")
+    parser.add_argument(
+        "augmentation_conf",
+        help="path to augmentation config listing ops to benchmark",
+        nargs="?",
+        default=str(REPO_DIR / "configs" / "augmentation" / "all.yaml"),
+    )
+    parser.add_argument(
+        "--sizes",
+        help="image sizes to benchmark",
+        nargs="+",
+        choices=list(IMAGE_SIZES),
+        default=list(IMAGE_SIZES),
+    )
+    parser.add_argument(
+        "--calls", help="number of timed calls per op and size", type=int, default=10
+    )
+    parser.add_argument(
+        "--warmup_calls", help="number of untimed calls made first", type=int, default=1
+    )
+    parser.add_argument(
+        "--batch_size",
+        help="number of images per call, using batched ops where available",
+        type=int,
+        default=1,
+    )
+    parser.add_argument("--seed", help="random seed", type=int, default=0)
+    parser.add_argument(
+        "--output",
+        help="path to write benchmark results to",
+        default="benchmarks/results.json",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="path to baseline benchmark results to compare against, the committed "
+        "baseline if given without a path, by default no comparison",
+        nargs="?",
+        const=str(REPO_DIR / "benchmarks" / "baseline.json"),
+    )
+    parser.add_argument(
+        "--max_slowdown",
+        help="largest allowed ratio of median latency to baseline median latency",
+        type=float,
+        default=1.5,
+    )
+
+    args = parser.parse_args()
+
+    # load augmentation dict from file
+    with open(args.augmentation_conf, "r") as augmentation_conf_file:
+        augmentation_dict = yaml.load(augmentation_conf_file, Loader=yaml.SafeLoader)
+
+    # benchmark ops, printing each result as it finishes
+    def log_result(result):
+        latency_ms = result["latency_ms"]
+        print(
+            f"{result['op']:>24} {result['size']:>4}: "
+            f"{result['mp_per_s']:9.2f} MP/s, "
+            f"p50 {latency_ms['p50']:9.2f} ms, p99 {latency_ms['p99']:9.2f} ms, "
+            f"peak {result['peak_mb']:7.1f} MiB"
+        )
+
+    benchmarks = run_benchmarks(
+        augmentation_dict,
+        args.sizes,
+        args.calls,
+        args.warmup_calls,
+        args.batch_size,
+        args.seed,
+        log_result,
+    )
+    save_benchmarks(benchmarks, pathlib.Path(args.output))
+
+    # compare against baseline, failing on regressions
+    if args.baseline is not None:
+        comparisons = compare_benchmarks(
+            benchmarks, load_benchmarks(pathlib.Path(args.baseline)), args.max_slowdown
+        )
+        regressions = [
+            comparison for comparison in comparisons if comparison["regressed"]
+        ]
+        for comparison in regressions:
+            print(
+                f"regression: {comparison['op']} at {comparison['size']} is "
+                f"{comparison['slowdown']:.2f}x slower than baseline "
+                f"({comparison['latency_ms']:.2f} ms vs "
+                f"{comparison['baseline_latency_ms']:.2f} ms)"
+            )
+        print(f"{len(regressions)} of {len(comparisons)} benchmarks regressed")
+        sys.exit(1 if regressions else 0)
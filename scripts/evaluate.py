@@ -3,8 +3,6 @@ import pathlib
 
 import yaml
 
-from image_aug_ml.classifier import ImageClassifier
-
 
 if __name__ == "__main__":
 
@@ -28,6 +26,9 @@ if __name__ == "__main__":
     with open(args.classifier_conf, "r") as classifier_conf_file:
         classifier_dict = yaml.load(classifier_conf_file, Loader=yaml.SafeLoader)
 
+    # import classifier, and with it TensorFlow, only once arguments are parsed
+    from image_aug_ml.classifier import ImageClassifier
+
     # initialize image classifier model and datasets
     model_name = pathlib.Path(args.augmentation_conf).name.split(".")[0]
     classifier = ImageClassifier(
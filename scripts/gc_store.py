@@ -0,0 +1,37 @@
+"""Garbage collects a content store of augmented images."""
+import pathlib
+
+from image_aug_ml.utils import ContentStore
+
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="Content Store Garbage Collection")
+    parser.add_argument("store_dir", help="path to content store")
+    parser.add_argument(
+        "--max_mb",
+        help="size cap of content store in MiB, least recently used images are evicted",
+        type=float,
+    )
+    parser.add_argument(
+        "--keep_unreferenced",
+        help="keep images no longer linked from any image directory",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    # remove unreferenced images, then evict down to size cap
+    content_store = ContentStore(pathlib.Path(args.store_dir))
+    gc_stats = content_store.gc(
+        unreferenced=not args.keep_unreferenced,
+        max_bytes=None if args.max_mb is None else int(args.max_mb * 2 ** 20),
+    )
+
+    print(
+        f"removed {gc_stats['unreferenced']} unreferenced and {gc_stats['evicted']} "
+        f"evicted images, {gc_stats['entries']} images "
+        f"({gc_stats['bytes'] / 2 ** 20:.1f} MiB) remain"
+    )
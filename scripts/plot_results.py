@@ -2,8 +2,6 @@
 from typing import Any, List, Dict
 import pathlib
 
-import pandas as pd
-import plotly.express as px
 import yaml
 
 
@@ -18,6 +16,10 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    # import plotting libraries only once arguments are parsed
+    import pandas as pd
+    import plotly.express as px
+
     # get all results files
     results_files = pathlib.Path(args.results_dir).glob("*.yaml")
 
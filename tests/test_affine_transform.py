@@ -0,0 +1,286 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from image_aug_ml.augmentation.affine import (
+    compose,
+    flip_horizontal,
+    flip_vertical,
+    resize,
+    rotate,
+    rotate_batch,
+    translate,
+)
+from image_aug_ml.augmentation.affine.affine_transform import (
+    affine_transform,
+    affine_transform_batch,
+    lattice_slices,
+    nearest_map,
+    sample_nearest,
+    sampling_map_cache,
+)
+from image_aug_ml.augmentation.affine.compose import compose_mat
+from image_aug_ml.augmentation.affine.map_cache import SamplingMapCache
+from image_aug_ml.augmentation.affine.resize import resize_mat
+from image_aug_ml.augmentation.affine.rotate import rotate_mat, rotate_mats
+from image_aug_ml.augmentation.affine.translate import translate_mat
+from image_aug_ml.utils import BufferPool, StackRng, use_rng
+
+
+def reference_affine_transform(
+    orig_img: np.ndarray, transform_mat: np.ndarray
+) -> np.ndarray:
+    """Per-pixel nearest-neighbour affine transform."""
+    transformed_img = np.zeros_like(orig_img)
+    for ii, jj in np.ndindex(orig_img.shape[:2]):
+        x, y, _ = transform_mat @ np.array([ii, jj, 1])
+        if 0 <= round(x) < orig_img.shape[0] and 0 <= round(y) < orig_img.shape[1]:
+            transformed_img[ii][jj] = orig_img[round(x)][round(y)]
+    return transformed_img
+
+
+@pytest.fixture
+def image() -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 256, (37, 29, 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize(
+    "op", [resize, rotate, translate, flip_vertical, flip_horizontal]
+)
+@pytest.mark.parametrize("seed", range(5))
+def test_ops_match_reference(image, op, seed, monkeypatch):
+    # record the matrix each op hands to the engine
+    transform_mats = []
+
+    def recording_affine_transform(orig_img, transform_mat, **kwargs):
+        transform_mats.append(transform_mat)
+        return affine_transform(orig_img, transform_mat, **kwargs)
+
+    monkeypatch.setattr(
+        importlib.import_module(op.__module__),
+        "affine_transform",
+        recording_affine_transform,
+    )
+
+    np.random.seed(seed)
+    result = op(image)
+
+    np.testing.assert_array_equal(
+        result, reference_affine_transform(image, transform_mats[0])
+    )
+
+
+def test_bilinear_identity(image):
+    result = affine_transform(image, np.eye(3), interpolation="bilinear")
+
+    np.testing.assert_array_equal(result, image)
+
+
+def test_bilinear_half_pixel_shift():
+    image = np.array([[0, 100], [200, 50]], dtype=np.uint8)
+    shift_mat = np.array([[1, 0, 0], [0, 1, 0.5], [0, 0, 1]])
+
+    result = affine_transform(image, shift_mat, interpolation="bilinear")
+
+    np.testing.assert_array_equal(result, [[50, 50], [125, 25]])
+
+
+def test_compose_mat_chains_in_application_order():
+    img_shape = (37, 29, 3)
+
+    np.random.seed(0)
+    composed_mat = compose_mat(img_shape, ["resize", "translate"])
+
+    np.random.seed(0)
+    chained_mat = resize_mat(img_shape) @ translate_mat(img_shape)
+
+    np.testing.assert_allclose(composed_mat, chained_mat)
+
+
+def test_compose_double_flip_is_identity(image):
+    result = compose(image, ["flip_vertical", "flip_horizontal", "flip_vertical"])
+
+    np.testing.assert_array_equal(result, flip_horizontal(image))
+
+
+@pytest.mark.parametrize("interpolation", ["nearest", "bilinear"])
+def test_batch_matches_per_image(image, interpolation):
+    images = np.stack([image, image[::-1], 255 - image])
+
+    np.random.seed(0)
+    transform_mats = rotate_mats(image.shape, len(images))
+
+    result = affine_transform_batch(images, transform_mats, interpolation)
+
+    for batch_img, orig_img, transform_mat in zip(result, images, transform_mats):
+        np.testing.assert_array_equal(
+            batch_img, affine_transform(orig_img, transform_mat, interpolation)
+        )
+
+
+@pytest.mark.parametrize("interpolation", ["nearest", "bilinear"])
+@pytest.mark.parametrize(
+    "transform_mat",
+    [[[-1, 0, 36], [0, 1, 0], [0, 0, 1]], [[0.9, 0.3, -2], [-0.3, 0.9, 5], [0, 0, 1]]],
+)
+def test_out_matches_allocating(image, transform_mat, interpolation):
+    transform_mat = np.array(transform_mat)
+    images = np.stack([image, image[::-1], 255 - image])
+    workspace = BufferPool()
+
+    # buffers hold stale pixels from earlier calls
+    out = np.full_like(image, 7)
+    out_stack = np.full_like(images, 7)
+    for orig_img in images:
+        result = affine_transform(
+            orig_img, transform_mat, interpolation, out=out, workspace=workspace
+        )
+        assert result is out
+        np.testing.assert_array_equal(
+            result, affine_transform(orig_img, transform_mat, interpolation)
+        )
+    transform_mats = np.stack([transform_mat] * len(images))
+    result = affine_transform_batch(
+        images, transform_mats, interpolation, out=out_stack, workspace=workspace
+    )
+    assert result is out_stack
+    np.testing.assert_array_equal(
+        result, affine_transform_batch(images, transform_mats, interpolation)
+    )
+
+
+@pytest.mark.parametrize(
+    "transform_mat",
+    [
+        [[-1, 0, 36], [0, 1, 0], [0, 0, 1]],
+        [[1, 0, 0], [0, -1, 28], [0, 0, 1]],
+        [[-1, 0, 36], [0, -1, 28], [0, 0, 1]],
+        [[0, 1, 4], [-1, 0, 32], [0, 0, 1]],
+        [[0, -1, 33], [1, 0, -4], [0, 0, 1]],
+        [[1, 0, -7], [0, 1, 12], [0, 0, 1]],
+        [[-1, 0, 50], [0, 1, -40], [0, 0, 1]],
+    ],
+)
+def test_lattice_matches_resample(image, transform_mat):
+    transform_mat = np.array(transform_mat)
+
+    assert lattice_slices(image.shape, transform_mat) is not None
+    np.testing.assert_array_equal(
+        affine_transform(image, transform_mat),
+        sample_nearest(image, nearest_map(image.shape, transform_mat)),
+    )
+
+
+def test_lattice_rejects_fractional_matrix(image):
+    assert lattice_slices(image.shape, [[1, 0, 0.5], [0, 1, 0], [0, 0, 1]]) is None
+
+
+def test_flips_keep_first_row_and_column(image):
+    np.testing.assert_array_equal(flip_vertical(image), image[::-1])
+    np.testing.assert_array_equal(flip_horizontal(image), image[:, ::-1])
+
+
+@pytest.mark.parametrize("theta", [np.pi / 2, np.pi, 3 * np.pi / 2])
+def test_right_angle_rotation_uses_lattice(theta):
+    square = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    cos_theta, sin_theta = np.cos(theta), np.sin(theta)
+    rotate_mat = np.array(
+        [
+            [cos_theta, sin_theta, (1 - cos_theta) * 4 - sin_theta * 4],
+            [-sin_theta, cos_theta, sin_theta * 4 + (1 - cos_theta) * 4],
+            [0, 0, 1],
+        ]
+    )
+
+    assert lattice_slices(square.shape, rotate_mat) is not None
+    np.testing.assert_array_equal(
+        affine_transform(square, rotate_mat, interpolation="bilinear"),
+        sample_nearest(square, nearest_map(square.shape, rotate_mat)),
+    )
+
+
+def test_map_cache_counts_hits_and_evictions(image):
+    map_cache = SamplingMapCache(max_entries=2)
+    scale_mats = [np.diag([scale, scale, 1]) for scale in (0.5, 0.75, 0.5, 1.5)]
+
+    for scale_mat in scale_mats:
+        map_cache.get_map(image.shape, scale_mat, nearest_map)
+
+    assert map_cache.stats()["hits"] == 1
+    assert map_cache.stats()["misses"] == 3
+    assert map_cache.stats()["evictions"] == 1
+    assert map_cache.stats()["entries"] == 2
+
+
+def test_map_cache_respects_byte_budget(image):
+    map_cache = SamplingMapCache(max_bytes=1)
+
+    map_cache.get_map(image.shape, np.diag([0.5, 0.5, 1]), nearest_map)
+
+    assert map_cache.stats()["entries"] == 0
+    assert map_cache.stats()["bytes"] == 0
+
+
+def test_cached_map_matches_uncached(image):
+    map_cache = SamplingMapCache()
+    scale_mat = np.diag([0.7, 1.3, 1])
+
+    first, second = (
+        affine_transform(image, scale_mat, map_cache=map_cache) for _ in range(2)
+    )
+
+    assert map_cache.stats()["hits"] == 1
+    np.testing.assert_array_equal(first, second)
+    np.testing.assert_array_equal(first, reference_affine_transform(image, scale_mat))
+    np.testing.assert_array_equal(first, affine_transform(image, scale_mat))
+
+
+def test_map_cache_is_opt_in(image):
+    sampling_map_cache.clear()
+
+    affine_transform(image, np.diag([0.7, 1.3, 1]))
+
+    assert sampling_map_cache.stats()["entries"] == 0
+
+
+def test_snapped_rotations_reuse_cached_maps(image):
+    sampling_map_cache.clear()
+
+    # rotations of 0, 30 or 60 degrees, of which 0 is a lattice copy without a map
+    with use_rng(np.random.default_rng(0)):
+        rotated = [rotate(image, max_theta=60, theta_quantum=30) for _ in range(8)]
+    with use_rng(np.random.default_rng(0)):
+        mats = [rotate_mat(image.shape, 60, 30) for _ in range(8)]
+
+    for rotated_img, mat in zip(rotated, mats):
+        np.testing.assert_array_equal(rotated_img, affine_transform(image, mat))
+    stats = sampling_map_cache.stats()
+    num_mapped = sum(lattice_slices(image.shape, mat) is None for mat in mats)
+    assert stats["misses"] <= 2 and stats["hits"] == num_mapped - stats["misses"]
+    assert stats["hits"] > 0
+
+
+def test_snapped_batch_matches_single(image):
+    images = np.stack([image, image[::-1], image[:, ::-1]])
+
+    # each image of the stack draws from its own generator, as it would alone
+    with use_rng(StackRng([np.random.default_rng(seed) for seed in range(3)])):
+        rotated = rotate_batch(images, max_theta=60, theta_quantum=15)
+    for seed, (orig_img, rotated_img) in enumerate(zip(images, rotated)):
+        with use_rng(np.random.default_rng(seed)):
+            expected = rotate(orig_img, max_theta=60, theta_quantum=15)
+        np.testing.assert_array_equal(rotated_img, expected)
+
+
+def test_map_cache_keys_exact_matrix(image):
+    map_cache = SamplingMapCache()
+    scale_mat = np.diag([0.7, 1.3, 1])
+
+    # matrices differing below any rounding grid must not share a map
+    for mat in (scale_mat, scale_mat + np.diag([1e-12, 0, 0])):
+        np.testing.assert_array_equal(
+            sample_nearest(image, map_cache.get_map(image.shape, mat, nearest_map)),
+            sample_nearest(image, nearest_map(image.shape, mat)),
+        )
+    assert map_cache.stats()["misses"] == 2
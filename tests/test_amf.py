@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from image_aug_ml.augmentation.intensity import amf
+from image_aug_ml.augmentation.intensity.amf import level_a, select_backend
+from image_aug_ml.utils import BufferPool
+
+
+def reference_amf(
+    orig_img: np.ndarray,
+    init_kernel_size: int = 3,
+    max_kernel_size: int = 7,
+    centered: bool = False,
+) -> np.ndarray:
+    """Per-pixel adaptive median filter."""
+    amf_img = np.empty_like(orig_img)
+    for ii, jj, kk in np.ndindex(*orig_img.shape):
+        amf_img[ii, jj, kk] = level_a(
+            orig_img[:, :, kk], ii, jj, init_kernel_size, max_kernel_size, centered
+        )
+    return amf_img
+
+
+@pytest.fixture
+def noisy_image() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    image = rng.integers(90, 160, (23, 17, 3), dtype=np.uint8)
+
+    # add salt and pepper noise, plus flat patches so that kernels grow
+    noise = rng.random(image.shape)
+    image[noise < 0.1] = 0
+    image[noise > 0.9] = 255
+    image[5:12, 4:10] = 128
+    return image
+
+
+@pytest.mark.parametrize("centered", [False, True])
+@pytest.mark.parametrize("kernel_sizes", [(3, 7), (3, 3), (5, 9), (7, 5)])
+def test_matches_reference(noisy_image, kernel_sizes, centered):
+    np.testing.assert_array_equal(
+        amf(noisy_image, *kernel_sizes, centered=centered),
+        reference_amf(noisy_image, *kernel_sizes, centered=centered),
+    )
+
+
+@pytest.mark.parametrize("centered", [False, True])
+@pytest.mark.parametrize("kernel_sizes", [(3, 7), (5, 9)])
+def test_histogram_backend_matches_sort(noisy_image, kernel_sizes, centered):
+    np.testing.assert_array_equal(
+        amf(noisy_image, *kernel_sizes, centered=centered, backend="histogram"),
+        amf(noisy_image, *kernel_sizes, centered=centered, backend="sort"),
+    )
+
+
+def test_out_matches_allocating(noisy_image):
+    workspace = BufferPool()
+
+    out = np.full_like(noisy_image, 7)
+    for orig_img in (noisy_image, noisy_image[::-1], 255 - noisy_image):
+        result = amf(orig_img, 3, 7, out=out, workspace=workspace)
+        assert result is out
+        np.testing.assert_array_equal(result, amf(orig_img, 3, 7))
+
+
+def test_backend_selected_from_dtype_and_kernel_size():
+    assert select_backend(np.dtype(np.uint8), 3) == "sort"
+    assert select_backend(np.dtype(np.uint8), 31) == "histogram"
+    assert select_backend(np.dtype(np.float32), 31) == "sort"
@@ -0,0 +1,589 @@
+import json
+import os
+import pathlib
+
+import cv2
+import numpy as np
+import pytest
+
+from image_aug_ml.augmentation import IOConf, augment_images
+from image_aug_ml.augmentation.manifest import get_manifest_path
+from image_aug_ml.augmentation.pipeline import PipelineConf, run_pipeline
+from image_aug_ml.utils import profiler as profiler_module
+from image_aug_ml.utils import (
+    ContentStore,
+    EncodeConf,
+    load_shard_index,
+    read_shard_record,
+)
+
+
+AUGMENTATION_CONF = {
+    "augmentations": [
+        "image_aug_ml.augmentation.affine.rotate",
+        "image_aug_ml.augmentation.frequency.bandpass",
+        {
+            "resize_translate": {
+                "op": "image_aug_ml.augmentation.affine.compose",
+                "ops": ["resize", "translate"],
+            }
+        },
+    ]
+}
+
+
+def make_image_dir(image_dir: pathlib.Path) -> pathlib.Path:
+    """Writes a small synthetic original training set."""
+    rng = np.random.default_rng(0)
+    for img_idx in range(7):
+        class_dir = image_dir / "original" / "train" / f"n0{img_idx % 2}"
+        class_dir.mkdir(parents=True, exist_ok=True)
+        shape = (24, 32, 3) if img_idx % 3 else (20, 20, 3)
+        cv2.imwrite(
+            str(class_dir / f"img_{img_idx}.JPEG"),
+            rng.integers(0, 256, shape, dtype=np.uint8),
+        )
+    return image_dir
+
+
+def read_outputs(image_dir: pathlib.Path):
+    """Reads bytes of every augmented image, keyed by path relative to image dir."""
+    return {
+        img_path.relative_to(image_dir): img_path.read_bytes()
+        for img_path in image_dir.glob("*/train/**/*.JPEG")
+        if img_path.parts[len(image_dir.parts)] != "original"
+    }
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_output_independent_of_workers(tmp_path, batch_size):
+    outputs = []
+    for workers in (1, 2):
+        image_dir = make_image_dir(tmp_path / f"workers_{workers}")
+        augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            batch_size=batch_size,
+            workers=workers,
+            chunk_size=3,
+            seed=1234,
+        )
+        outputs.append(read_outputs(image_dir))
+
+    assert len(outputs[0]) == 7 * 3
+    assert outputs[0] == outputs[1]
+
+
+def test_output_independent_of_batch_size(tmp_path):
+    outputs = []
+    for batch_size in (1, 3, 7):
+        image_dir = make_image_dir(tmp_path / f"batch_{batch_size}")
+        augment_images(AUGMENTATION_CONF, image_dir, batch_size=batch_size, seed=1)
+        outputs.append(read_outputs(image_dir))
+
+    assert len(outputs[0]) == 7 * 3
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_pipeline_matches_serial(tmp_path, workers):
+    outputs = []
+    for pipeline_conf in (None, PipelineConf(3, 2, 1, 2)):
+        image_dir = make_image_dir(tmp_path / f"pipeline_{pipeline_conf is not None}")
+        augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            batch_size=2,
+            workers=workers,
+            chunk_size=5,
+            seed=1234,
+            pipeline_conf=pipeline_conf,
+        )
+        outputs.append(read_outputs(image_dir))
+
+    assert len(outputs[0]) == 7 * 3
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_buffer_pool_matches_allocating(tmp_path, batch_size):
+    outputs = []
+    for buffer_pool_bytes in (0, 2 ** 20):
+        image_dir = make_image_dir(tmp_path / f"pool_{buffer_pool_bytes}")
+        augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            batch_size=batch_size,
+            seed=1234,
+            buffer_pool_bytes=buffer_pool_bytes,
+        )
+        outputs.append(read_outputs(image_dir))
+
+    assert len(outputs[0]) == 7 * 3
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("failing_stage", ["read", "compute", "write"])
+def test_pipeline_raises_stage_error(failing_stage):
+    def stage(name, value):
+        if name == failing_stage and value == 5:
+            raise ValueError(name)
+        return value
+
+    written = []
+    with pytest.raises(ValueError, match=failing_stage):
+        run_pipeline(
+            range(100),
+            lambda item: stage("read", item),
+            lambda item, value: [stage("compute", value)],
+            lambda output: written.append(stage("write", output)),
+            PipelineConf(2, 2, 1, 1),
+        )
+    assert len(written) < 100
+
+
+def test_pipeline_writes_every_output():
+    written = []
+    run_pipeline(
+        range(50),
+        lambda item: item * 2,
+        lambda item, value: [value, value + 1],
+        written.append,
+        PipelineConf(4, 3, 2, 2),
+    )
+    assert sorted(written) == list(range(100))
+
+
+def test_rerun_skips_up_to_date_outputs(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    pending = augment_images(AUGMENTATION_CONF, image_dir, batch_size=2, seed=1234)
+    assert pending == {"rotate": 7, "bandpass": 7, "resize_translate": 7}
+    outputs = read_outputs(image_dir)
+
+    # nothing is pending on rerun, and seed is resumed from manifest
+    pending = augment_images(AUGMENTATION_CONF, image_dir, batch_size=2, dry_run=True)
+    assert pending == {"rotate": 0, "bandpass": 0, "resize_translate": 0}
+
+    # forced rerun redoes every output identically
+    pending = augment_images(
+        AUGMENTATION_CONF, image_dir, batch_size=2, force=True, dry_run=True
+    )
+    assert pending == {"rotate": 7, "bandpass": 7, "resize_translate": 7}
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=2, force=True)
+    assert read_outputs(image_dir) == outputs
+
+
+def test_resume_matches_uninterrupted_run(tmp_path):
+    image_dir = make_image_dir(tmp_path / "full")
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, chunk_size=3, seed=1)
+    expected = read_outputs(image_dir)
+
+    # interrupt after the first chunk by dropping later manifest records
+    image_dir = make_image_dir(tmp_path / "resumed")
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, chunk_size=3, seed=1)
+    manifest_path = get_manifest_path(image_dir)
+    manifest_lines = manifest_path.read_text().splitlines(keepends=True)
+    manifest_path.write_text("".join(manifest_lines[:9]) + '{"output": "trunc')
+    (image_dir / "rotate" / "train" / "n00" / "img_0.JPEG").unlink()
+
+    # only outputs of the later chunks and the deleted output are redone
+    pending = augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, chunk_size=3)
+    assert pending == {"rotate": 5, "bandpass": 4, "resize_translate": 4}
+    assert read_outputs(image_dir) == expected
+
+
+def test_stale_outputs_recomputed(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    augment_images(AUGMENTATION_CONF, image_dir, seed=1234)
+
+    # only a new op is pending
+    conf = {
+        "augmentations": [
+            *AUGMENTATION_CONF["augmentations"],
+            "image_aug_ml.augmentation.affine.flip_vertical",
+        ]
+    }
+    pending = augment_images(conf, image_dir, dry_run=True)
+    assert pending == {
+        "rotate": 0,
+        "bandpass": 0,
+        "resize_translate": 0,
+        "flip_vertical": 7,
+    }
+
+    # changed op parameters and changed sources are pending
+    conf["augmentations"][2]["resize_translate"]["ops"] = ["translate", "resize"]
+    train_img_path = image_dir / "original" / "train" / "n00" / "img_0.JPEG"
+    cv2.imwrite(str(train_img_path), np.zeros((10, 10, 3), dtype=np.uint8))
+    pending = augment_images(conf, image_dir, dry_run=True)
+    assert pending == {
+        "rotate": 1,
+        "bandpass": 1,
+        "resize_translate": 7,
+        "flip_vertical": 7,
+    }
+
+
+def test_records_compared_exactly(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    augment_images(AUGMENTATION_CONF, image_dir, seed=1234)
+
+    # a completed record with a field the expected record lacks is redone
+    manifest_path = get_manifest_path(image_dir)
+    records = [json.loads(line) for line in manifest_path.read_text().splitlines()]
+    records[0]["batch"] = [0, 1]
+    manifest_path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+    pending = augment_images(AUGMENTATION_CONF, image_dir, dry_run=True)
+    assert sum(pending.values()) == 1
+
+
+def test_added_source_leaves_others_up_to_date(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, seed=1234)
+    outputs = read_outputs(image_dir)
+
+    # a source sorted before all others is the only one pending
+    cv2.imwrite(
+        str(image_dir / "original" / "train" / "n00" / "img_00.JPEG"),
+        np.full((24, 32, 3), 128, dtype=np.uint8),
+    )
+    pending = augment_images(AUGMENTATION_CONF, image_dir, batch_size=3)
+    assert pending == {"rotate": 1, "bandpass": 1, "resize_translate": 1}
+
+    new_outputs = read_outputs(image_dir)
+    assert len(new_outputs) == 8 * 3
+    assert all(new_outputs[path] == output for path, output in outputs.items())
+
+
+def test_reordered_ops_stay_up_to_date(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    augment_images(AUGMENTATION_CONF, image_dir, seed=1234)
+
+    # inserting an op before the others, and reordering them, redoes only the new op
+    conf = {
+        "augmentations": [
+            "image_aug_ml.augmentation.affine.flip_vertical",
+            *AUGMENTATION_CONF["augmentations"][::-1],
+        ]
+    }
+    pending = augment_images(conf, image_dir, dry_run=True)
+    assert pending == {
+        "flip_vertical": 7,
+        "resize_translate": 0,
+        "bandpass": 0,
+        "rotate": 0,
+    }
+
+
+def test_outputs_match_without_store(tmp_path):
+    image_dir = make_image_dir(tmp_path / "plain")
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, seed=1)
+    expected = read_outputs(image_dir)
+
+    # outputs are stored, then linked from the store into a second image directory
+    content_store = ContentStore(tmp_path / "store")
+    for copy_idx in range(2):
+        image_dir = make_image_dir(tmp_path / f"copy_{copy_idx}")
+        augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            batch_size=3,
+            seed=1,
+            io_conf=IOConf(content_store=content_store),
+        )
+        assert read_outputs(image_dir) == expected
+
+    for rel_path in expected:
+        assert os.path.samefile(
+            tmp_path / "copy_0" / rel_path, tmp_path / "copy_1" / rel_path
+        )
+
+    # copies holding a subset of the images, at other positions, link them too
+    subsampled_dir = make_image_dir(tmp_path / "subsampled")
+    (subsampled_dir / "original" / "train" / "n00" / "img_0.JPEG").unlink()
+    augment_images(
+        AUGMENTATION_CONF,
+        subsampled_dir,
+        subsample_pct=0.5,
+        seed=1,
+        io_conf=IOConf(content_store=content_store),
+    )
+    outputs = read_outputs(subsampled_dir)
+    assert len(outputs) == 3 * 3
+    for rel_path, output in outputs.items():
+        assert output == expected[rel_path]
+        assert os.path.samefile(
+            subsampled_dir / rel_path, tmp_path / "copy_0" / rel_path
+        )
+
+
+def test_store_shared_between_configs(tmp_path):
+    content_store = ContentStore(tmp_path / "store")
+    image_dir = make_image_dir(tmp_path / "images")
+    augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        seed=1,
+        io_conf=IOConf(content_store=content_store),
+    )
+
+    # an op listed in another config, under another name, reuses stored outputs
+    rotate_path = image_dir / "rotate" / "train" / "n00" / "img_0.JPEG"
+    conf = {
+        "augmentations": [
+            "image_aug_ml.augmentation.affine.flip_vertical",
+            {"rotate_2": {"op": "image_aug_ml.augmentation.affine.rotate"}},
+        ]
+    }
+    augment_images(conf, image_dir, seed=1, io_conf=IOConf(content_store=content_store))
+    assert os.path.samefile(
+        rotate_path, image_dir / "rotate_2" / "train" / "n00" / "img_0.JPEG"
+    )
+
+
+@pytest.mark.parametrize("pipeline_conf", [None, PipelineConf()])
+def test_evicted_stored_output_is_recomputed(tmp_path, monkeypatch, pipeline_conf):
+    image_dir = make_image_dir(tmp_path / "expected")
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, seed=1)
+    expected = read_outputs(image_dir)
+
+    # every lookup hits, but objects are gone by the time they are linked
+    content_store = ContentStore(tmp_path / "store")
+    monkeypatch.setattr(ContentStore, "contains", lambda self, key: True)
+    image_dir = make_image_dir(tmp_path / "images")
+    augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        batch_size=3,
+        seed=1,
+        pipeline_conf=pipeline_conf,
+        io_conf=IOConf(content_store=content_store),
+    )
+    assert read_outputs(image_dir) == expected
+
+
+def test_rewritten_output_keeps_stored_image(tmp_path):
+    content_store = ContentStore(tmp_path / "store")
+    image_dir = make_image_dir(tmp_path / "images")
+    augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        seed=1,
+        io_conf=IOConf(content_store=content_store),
+    )
+    stored = {
+        object_path: object_path.read_bytes()
+        for object_path, _ in content_store.objects()
+    }
+
+    # forced rerun with another seed must not write through links into the store
+    augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        seed=2,
+        force=True,
+        io_conf=IOConf(content_store=content_store),
+    )
+    for object_path, object_bytes in stored.items():
+        assert object_path.read_bytes() == object_bytes
+
+
+def test_gc_removes_unreferenced(tmp_path):
+    content_store = ContentStore(tmp_path / "store")
+    image_dir = make_image_dir(tmp_path / "images")
+    augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        seed=1,
+        io_conf=IOConf(content_store=content_store),
+    )
+    (image_dir / "rotate" / "train" / "n00" / "img_0.JPEG").unlink()
+
+    gc_stats = content_store.gc()
+    assert gc_stats["unreferenced"] == 1
+    assert gc_stats["entries"] == 7 * 3 - 1
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_packed_outputs_match_files(tmp_path, workers):
+    image_dir = make_image_dir(tmp_path / "files")
+    augment_images(AUGMENTATION_CONF, image_dir, batch_size=3, seed=1)
+    expected = read_outputs(image_dir)
+
+    image_dir = make_image_dir(tmp_path / "shards")
+    augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        batch_size=3,
+        workers=workers,
+        chunk_size=3,
+        seed=1,
+        io_conf=IOConf(max_shard_bytes=4096),
+    )
+    assert read_outputs(image_dir) == {}
+
+    outputs = {}
+    for augment_name in ("rotate", "bandpass", "resize_translate"):
+        shard_dir = image_dir / augment_name / "train"
+        for index_entry in load_shard_index(shard_dir):
+            assert index_entry["op"] == augment_name
+            assert index_entry["label"] == pathlib.Path(index_entry["key"]).parent.name
+            output_path = pathlib.Path(augment_name, "train", index_entry["key"])
+            outputs[output_path] = read_shard_record(index_entry)
+    assert outputs == expected
+
+    # packed outputs are up to date on rerun, but not once saved to files instead
+    for max_shard_bytes, num_pending in ((4096, 0), (None, 7)):
+        pending = augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            batch_size=3,
+            chunk_size=3,
+            dry_run=True,
+            io_conf=IOConf(max_shard_bytes=max_shard_bytes),
+        )
+        assert set(pending.values()) == {num_pending}
+
+
+def test_lost_shards_are_redone(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    augment_images(
+        AUGMENTATION_CONF, image_dir, seed=1, io_conf=IOConf(max_shard_bytes=2 ** 20)
+    )
+
+    def pending_outputs():
+        return augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            dry_run=True,
+            io_conf=IOConf(max_shard_bytes=2 ** 20),
+        )
+
+    assert set(pending_outputs().values()) == {0}
+
+    # records of truncated and deleted shards are pending again
+    (rotate_shard,) = (image_dir / "rotate" / "train").glob("*.shard")
+    os.truncate(rotate_shard, rotate_shard.stat().st_size - 1)
+    for shard_path in (image_dir / "bandpass" / "train").glob("*.shard"):
+        shard_path.unlink()
+    assert pending_outputs() == {"rotate": 1, "bandpass": 7, "resize_translate": 0}
+
+    # redone records are indexed and intact again
+    augment_images(
+        AUGMENTATION_CONF, image_dir, io_conf=IOConf(max_shard_bytes=2 ** 20)
+    )
+    assert set(pending_outputs().values()) == {0}
+
+
+def test_forced_reruns_compact_shards(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    shard_dir = image_dir / "rotate" / "train"
+
+    def shard_bytes():
+        return sum(shard_path.stat().st_size for shard_path in shard_dir.glob("*"))
+
+    augment_images(
+        AUGMENTATION_CONF, image_dir, seed=1, io_conf=IOConf(max_shard_bytes=4096)
+    )
+    first_bytes = shard_bytes()
+    expected = {
+        index_entry["key"]: read_shard_record(index_entry)
+        for index_entry in load_shard_index(shard_dir)
+    }
+
+    # superseded records are dropped instead of piling up with every rerun
+    for _ in range(4):
+        augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            seed=1,
+            force=True,
+            io_conf=IOConf(max_shard_bytes=4096),
+        )
+        assert shard_bytes() <= 2.5 * first_bytes
+    assert {
+        index_entry["key"]: read_shard_record(index_entry)
+        for index_entry in load_shard_index(shard_dir)
+    } == expected
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_reduced_decode_and_encoding(tmp_path, workers):
+    image_dir = make_image_dir(tmp_path / "images")
+    conf = {"augmentations": ["image_aug_ml.augmentation.affine.flip_vertical"]}
+
+    # 24x32 images are decoded at half scale, 20x20 images at full scale
+    run_stats = {}
+    augment_images(
+        conf,
+        image_dir,
+        workers=workers,
+        chunk_size=3,
+        seed=1,
+        io_conf=IOConf(reduced_decode_shape=(11, 11), encode_conf=EncodeConf("png")),
+        run_stats=run_stats,
+    )
+    output_shapes = {
+        img_path.name: cv2.imread(str(img_path)).shape
+        for img_path in image_dir.glob("flip_vertical/train/**/*.png")
+    }
+    assert len(output_shapes) == 7
+    assert output_shapes["img_0.png"] == (20, 20, 3)
+    assert output_shapes["img_1.png"] == (12, 16, 3)
+
+    assert run_stats["images"] == 7
+    # CPU time is counted in clock ticks, so a short run may take none
+    assert run_stats["cpu_seconds"] >= 0
+    assert run_stats["decode_seconds"] > 0 and run_stats["encode_seconds"] > 0
+    assert run_stats["full_decoded_bytes"] - run_stats["decoded_bytes"] == 4 * (
+        24 * 32 * 3 - 12 * 16 * 3
+    )
+    assert run_stats["encoded_bytes"] > 0
+
+    # outputs are up to date with the same settings, but not with other encodings
+    for encode_conf, num_pending in ((EncodeConf("png"), 0), (None, 7)):
+        pending = augment_images(
+            conf,
+            image_dir,
+            dry_run=True,
+            io_conf=IOConf(reduced_decode_shape=(11, 11), encode_conf=encode_conf),
+        )
+        assert pending == {"flip_vertical": num_pending}
+
+
+def test_stage_times_without_profiler(tmp_path, monkeypatch):
+    image_dir = make_image_dir(tmp_path)
+
+    # decoding and encoding are timed without any stage timers when not profiling
+    def no_timer(*args, **kwargs):
+        raise AssertionError("stage timed while not profiling")
+
+    monkeypatch.setattr(profiler_module, "StageTimer", no_timer)
+    run_stats = {}
+    augment_images(AUGMENTATION_CONF, image_dir, seed=1, run_stats=run_stats)
+    assert run_stats["decode_seconds"] > 0 and run_stats["encode_seconds"] > 0
+
+
+def test_encoding_keys_stored_outputs(tmp_path):
+    content_store = ContentStore(tmp_path / "store")
+    conf = {"augmentations": ["image_aug_ml.augmentation.affine.flip_vertical"]}
+    for img_format in ("png", "webp"):
+        image_dir = make_image_dir(tmp_path / img_format)
+        augment_images(
+            conf,
+            image_dir,
+            seed=1,
+            io_conf=IOConf(
+                encode_conf=EncodeConf(img_format), content_store=content_store
+            ),
+        )
+
+    # outputs of each format are stored apart, and decode to the same pixels
+    assert len(list(content_store.objects())) == 2 * 7
+    for rel_path in ("flip_vertical/train/n00/img_0", "flip_vertical/train/n01/img_1"):
+        png_img, webp_img = (
+            cv2.imread(str(tmp_path / img_format / f"{rel_path}.{img_format}"))
+            for img_format in ("png", "webp")
+        )
+        np.testing.assert_array_equal(png_img, webp_img)
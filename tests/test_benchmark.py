@@ -0,0 +1,57 @@
+import copy
+
+import numpy as np
+
+from image_aug_ml.augmentation.benchmark import (
+    benchmark_op,
+    compare_benchmarks,
+    run_benchmarks,
+    synthetic_images,
+)
+
+
+def test_synthetic_images_are_reproducible():
+    imgs = synthetic_images((12, 16), 3, seed=4)
+    assert imgs.shape == (3, 12, 16, 3) and imgs.dtype == np.uint8
+    np.testing.assert_array_equal(imgs, synthetic_images((12, 16), 3, seed=4))
+
+
+def test_benchmark_op_reports_throughput_latency_and_memory():
+    result = benchmark_op(
+        "image_aug_ml.augmentation.frequency.lowpass", (24, 32), num_calls=4
+    )
+
+    assert result["op"] == "lowpass" and result["shape"] == [24, 32, 3]
+    assert result["mp_per_s"] > 0
+    latency_ms = result["latency_ms"]
+    assert 0 < latency_ms["p50"] <= latency_ms["p90"] <= latency_ms["p99"]
+    # padded spectra of the image are allocated on every call
+    assert result["peak_mb"] > 48 * 64 * 3 * 4 / 2 ** 20
+
+
+def test_benchmark_op_uses_batched_variant():
+    result = benchmark_op(
+        "image_aug_ml.augmentation.affine.rotate", (24, 32), num_calls=2, batch_size=3
+    )
+    assert result["batch_size"] == 3 and result["mp_per_s"] > 0
+
+
+def test_compare_flags_slowdowns_over_threshold():
+    benchmarks = run_benchmarks(
+        {"augmentations": ["image_aug_ml.augmentation.intensity.invert"]},
+        sizes=["160"],
+        num_calls=2,
+    )
+    assert [result["size"] for result in benchmarks["results"]] == ["160"]
+
+    # baseline twice as fast regresses, baseline as fast does not
+    baseline = copy.deepcopy(benchmarks)
+    baseline["results"][0]["latency_ms"]["p50"] /= 2
+    (comparison,) = compare_benchmarks(benchmarks, baseline, max_slowdown=1.5)
+    assert comparison["regressed"] and np.isclose(comparison["slowdown"], 2)
+
+    (comparison,) = compare_benchmarks(benchmarks, benchmarks, max_slowdown=1.5)
+    assert not comparison["regressed"]
+
+    # ops missing from baseline are not compared
+    assert compare_benchmarks(benchmarks, {"results": []}) == []
@@ -0,0 +1,47 @@
+import pickle
+
+import numpy as np
+
+from image_aug_ml.utils import BufferPool
+
+
+def test_reuses_buffer_per_key():
+    pool = BufferPool()
+
+    first = pool.get("out", (4, 5, 3))
+    assert pool.get("out", (4, 5, 3)) is first
+    assert pool.get("out", (4, 5, 3), np.float32) is not first
+    assert pool.get("scratch", (4, 5, 3)) is not first
+    assert (pool.hits, pool.misses) == (1, 3)
+
+
+def test_evicts_least_recently_used():
+    pool = BufferPool(max_bytes=300)
+
+    first = pool.get("a", (100,))
+    pool.get("b", (100,))
+    pool.get("a", (100,))
+    pool.get("c", (150,))
+
+    # "b" was evicted to fit "c", "a" was used more recently
+    assert pool.get("a", (100,)) is first
+    assert pool.num_bytes <= 300
+    assert pool.misses == 3
+    pool.get("b", (100,))
+    assert pool.misses == 4
+
+
+def test_oversized_buffers_not_held():
+    pool = BufferPool(max_bytes=100)
+
+    assert pool.get("big", (200,)) is not pool.get("big", (200,))
+    assert pool.num_bytes == 0
+
+
+def test_pickles_without_buffers():
+    pool = BufferPool(max_bytes=1000)
+    pool.get("out", (10,))
+
+    unpickled = pickle.loads(pickle.dumps(pool))
+    assert unpickled.max_bytes == 1000
+    assert unpickled.num_bytes == 0
@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from image_aug_ml.classifier.cache_dataset import make_cache_dataset  # noqa: E402
+from image_aug_ml.utils import build_decode_cache  # noqa: E402
+
+from tests.test_augment import make_image_dir  # noqa: E402
+
+
+def test_cache_dataset_matches_images(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+    expected = []
+    for img_path in sorted((image_dir / "original" / "train").glob("*/*.JPEG")):
+        img = cv2.resize(cv2.imread(str(img_path)), (24, 16))
+        expected.append(
+            (
+                decode_cache.class_names.index(img_path.parent.name),
+                cv2.cvtColor(img, cv2.COLOR_BGR2RGB).astype(np.float32),
+            )
+        )
+
+    cache_ds = make_cache_dataset(decode_cache, batch_size=4)
+    batches = list(cache_ds.as_numpy_iterator())
+    assert [imgs.shape for imgs, _ in batches] == [(4, 16, 24, 3), (3, 16, 24, 3)]
+
+    # batches are shuffled, so match images up by pixels
+    loaded = [
+        (int(np.argmax(label)), img)
+        for imgs, labels in batches
+        for img, label in zip(imgs, labels)
+    ]
+    assert len(loaded) == len(expected)
+    for label, img in expected:
+        matches = [
+            loaded_label
+            for loaded_label, loaded_img in loaded
+            if np.array_equal(loaded_img, img)
+        ]
+        assert matches == [label]
@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from image_aug_ml.utils import EncodeConf, decode_image, encode_image, jpeg_shape
+from image_aug_ml.utils.codec import reduced_decode_flag
+
+
+def encoded_jpeg(shape=(120, 200, 3)) -> np.ndarray:
+    """Encodes a random image as a JPEG."""
+    img = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    return cv2.imencode(".jpg", img)[1]
+
+
+def test_jpeg_shape():
+    assert jpeg_shape(encoded_jpeg((120, 200, 3))) == (120, 200)
+    assert jpeg_shape(cv2.imencode(".png", np.zeros((8, 8, 3), np.uint8))[1]) is None
+
+
+@pytest.mark.parametrize(
+    "target_shape, expected_scale",
+    [((15, 25), 8), ((16, 25), 4), ((60, 100), 2), ((61, 100), 1)],
+)
+def test_reduced_decode_keeps_target_shape(target_shape, expected_scale):
+    assert reduced_decode_flag((120, 200), target_shape)[1] == expected_scale
+
+    img, full_bytes = decode_image(encoded_jpeg(), target_shape)
+    assert img.shape == (120 // expected_scale, 200 // expected_scale, 3)
+    assert full_bytes == 120 * 200 * 3
+
+
+def test_full_decode_without_target():
+    img, full_bytes = decode_image(encoded_jpeg())
+    assert img.shape == (120, 200, 3)
+    assert full_bytes == img.nbytes
+
+
+@pytest.mark.parametrize("img_format", ["png", "webp"])
+def test_lossless_formats_round_trip(img_format):
+    img = np.random.default_rng(0).integers(0, 256, (16, 24, 3), dtype=np.uint8)
+    encoded_img = encode_image(img, ".JPEG", EncodeConf(img_format))
+    np.testing.assert_array_equal(cv2.imdecode(encoded_img, cv2.IMREAD_COLOR), img)
+
+
+def test_jpeg_quality_sets_size():
+    img = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    low, high = (
+        encode_image(img, ".JPEG", EncodeConf(jpeg_quality=quality)).nbytes
+        for quality in (30, 95)
+    )
+    assert low < high
+    assert high == encode_image(img, ".JPEG").nbytes
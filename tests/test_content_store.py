@@ -0,0 +1,55 @@
+import os
+
+from image_aug_ml.utils import ContentStore
+
+
+def test_evict_least_recently_used(tmp_path):
+    content_store = ContentStore(tmp_path / "store")
+    for obj_idx in range(4):
+        obj_path = tmp_path / f"obj_{obj_idx}"
+        obj_path.write_bytes(bytes([obj_idx]) * 100)
+        content_store.put(f"{obj_idx:02x}" * 4, obj_path)
+        os.utime(content_store.object_path(f"{obj_idx:02x}" * 4), ns=(obj_idx, obj_idx))
+
+    # use first object, so second is least recently used
+    assert content_store.materialize("00" * 4, tmp_path / "out")
+    assert (tmp_path / "out").read_bytes() == bytes([0]) * 100
+    assert content_store.evict(max_bytes=300) == 1
+    assert not content_store.contains("01" * 4)
+    assert content_store.contains("00" * 4)
+    assert content_store.evict(max_bytes=300) == 0
+
+
+def test_uncapped_store_never_evicts(tmp_path):
+    content_store = ContentStore(tmp_path / "store")
+    (tmp_path / "obj").write_bytes(b"0" * 100)
+    content_store.put("ab" * 4, tmp_path / "obj")
+    assert content_store.evict() == 0
+    assert content_store.contains("ab" * 4)
+
+
+def test_gc_keeps_untracked_objects(tmp_path, monkeypatch):
+    content_store = ContentStore(tmp_path / "store")
+    (tmp_path / "linked").write_bytes(b"0" * 100)
+    content_store.put("aa" * 4, tmp_path / "linked")
+    (tmp_path / "linked").unlink()
+
+    # objects added from bytes, or copied across filesystems, have no extra links
+    content_store.put_bytes("bb" * 4, b"1" * 100)
+
+    def fail_link(src_path, dst_path):
+        raise OSError("cross-device link")
+
+    (tmp_path / "copied").write_bytes(b"2" * 100)
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "link", fail_link)
+        content_store.put("cc" * 4, tmp_path / "copied")
+
+    gc_stats = content_store.gc()
+    assert gc_stats["unreferenced"] == 1
+    assert not content_store.contains("aa" * 4)
+    assert content_store.contains("bb" * 4) and content_store.contains("cc" * 4)
+
+    # evicted objects take their markers with them
+    content_store.evict(max_bytes=0)
+    assert list(content_store.untracked_dir.iterdir()) == []
@@ -0,0 +1,95 @@
+import os
+import pathlib
+import pickle
+
+import cv2
+import numpy as np
+import yaml
+
+from image_aug_ml.augmentation import IOConf, augment_images
+from image_aug_ml.utils import build_decode_cache
+
+from tests.test_augment import AUGMENTATION_CONF, make_image_dir, read_outputs
+
+
+def test_cache_holds_resized_images(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+
+    assert decode_cache.images.shape == (7, 16, 24, 3)
+    assert decode_cache.class_names == ["n00", "n01"]
+    for img_idx, rel_path in enumerate(decode_cache.paths):
+        img_path = image_dir / rel_path
+        expected = cv2.resize(cv2.imread(str(img_path)), (24, 16))
+        np.testing.assert_array_equal(decode_cache.get_image(img_path), expected)
+        assert decode_cache.class_names[decode_cache.labels[img_idx]] == (
+            img_path.parent.name
+        )
+
+
+def test_cache_invalidated_by_source_changes(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+    array_inode = os.stat(decode_cache.array_path).st_ino
+
+    # unchanged sources reuse cache
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+    assert os.stat(decode_cache.array_path).st_ino == array_inode
+
+    # modified and added sources rebuild it
+    img_path = image_dir / decode_cache.paths[0]
+    cv2.imwrite(str(img_path), np.zeros((16, 24, 3), dtype=np.uint8))
+    cv2.imwrite(
+        str(image_dir / "original" / "train" / "n00" / "new.JPEG"),
+        np.full((16, 24, 3), 255, dtype=np.uint8),
+    )
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+    assert len(decode_cache) == 8
+    assert not decode_cache.get_image(img_path).any()
+
+
+def test_cache_pickled_by_path(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    decode_cache = build_decode_cache(image_dir, "train", (64, 64))
+
+    unpickled = pickle.loads(pickle.dumps(decode_cache))
+    assert len(pickle.dumps(decode_cache)) < decode_cache.images.nbytes
+    assert isinstance(unpickled.images, np.memmap)
+    np.testing.assert_array_equal(unpickled.images, decode_cache.images)
+
+
+def test_augment_from_cache(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+    conf_path = pathlib.Path(__file__).parents[1] / "configs/augmentation/all.yaml"
+    with open(conf_path, "r") as augmentation_conf_file:
+        augmentation_conf = yaml.load(augmentation_conf_file, Loader=yaml.SafeLoader)
+
+    # every op works on read-only views of cache
+    augment_images(
+        augmentation_conf,
+        image_dir,
+        batch_size=3,
+        workers=2,
+        seed=1,
+        io_conf=IOConf(decode_cache=decode_cache),
+    )
+    outputs = read_outputs(image_dir)
+    assert len(outputs) == 7 * 11
+    for output_bytes in outputs.values():
+        output_img = cv2.imdecode(np.frombuffer(output_bytes, np.uint8), 1)
+        assert output_img.shape[:2] in ((16, 24), (24, 16))
+
+
+def test_switching_to_cache_makes_outputs_stale(tmp_path):
+    image_dir = make_image_dir(tmp_path)
+    augment_images(AUGMENTATION_CONF, image_dir, seed=1)
+
+    decode_cache = build_decode_cache(image_dir, "train", (16, 24))
+    pending = augment_images(
+        AUGMENTATION_CONF,
+        image_dir,
+        dry_run=True,
+        io_conf=IOConf(decode_cache=decode_cache),
+    )
+    assert set(pending.values()) == {7}
@@ -0,0 +1,85 @@
+import pathlib
+
+import pytest
+
+from image_aug_ml.utils import (
+    get_all_original_train_images,
+    get_all_test_images,
+    get_all_train_images,
+    load_file_index,
+)
+from image_aug_ml.utils import file_index
+
+
+def make_image_tree(image_dir: pathlib.Path) -> pathlib.Path:
+    """Writes empty images under a few ops, splits and classes."""
+    for op in ("original", "rotate"):
+        for split in ("train", "val"):
+            for label in ("n00", "n01"):
+                class_dir = image_dir / op / split / label
+                class_dir.mkdir(parents=True)
+                for img_idx in range(2):
+                    (class_dir / f"img_{img_idx}.JPEG").write_bytes(b"0" * img_idx)
+    (image_dir / "rotate" / "train" / "0.shard").write_bytes(b"")
+    return image_dir
+
+
+@pytest.fixture
+def no_mtime_slack(monkeypatch):
+    monkeypatch.setattr(file_index, "MTIME_SLACK_NS", 0)
+
+
+def test_matches_glob(tmp_path):
+    image_dir = make_image_tree(tmp_path)
+    for get_images, pattern in (
+        (get_all_train_images, "*/train/**/*.JPEG"),
+        (get_all_original_train_images, "original/train/**/*.JPEG"),
+        (get_all_test_images, "*/val/**/*.JPEG"),
+    ):
+        assert get_images(image_dir) == sorted(image_dir.glob(pattern))
+
+
+def test_query(tmp_path):
+    image_dir = make_image_tree(tmp_path)
+    index = load_file_index(image_dir)
+
+    assert index.query(split="val", op="rotate", label="n01") == [
+        image_dir / "rotate" / "val" / "n01" / "img_0.JPEG",
+        image_dir / "rotate" / "val" / "n01" / "img_1.JPEG",
+    ]
+    assert index.query(op="rotate", suffix=".shard") == [
+        image_dir / "rotate" / "train" / "0.shard"
+    ]
+    (entry,) = [
+        entry
+        for entry in index.entries()
+        if entry["path"] == "original/train/n00/img_1.JPEG"
+    ]
+    assert entry["op"] == "original" and entry["split"] == "train"
+    assert entry["label"] == "n00" and entry["size"] == 1
+
+
+def test_incremental_refresh(tmp_path, no_mtime_slack):
+    image_dir = make_image_tree(tmp_path)
+    load_file_index(image_dir)
+
+    # saved index is reused without listing any directory
+    index = load_file_index(image_dir, refresh=False)
+    assert index.refresh() == 0
+    assert len(index.query()) == 16
+
+    # only modified directories are listed again
+    class_dir = image_dir / "rotate" / "train" / "n00"
+    (class_dir / "img_0.JPEG").unlink()
+    (class_dir / "img_2.JPEG").write_bytes(b"")
+    new_dir = image_dir / "resize" / "train" / "n00"
+    new_dir.mkdir(parents=True)
+    (new_dir / "img_0.JPEG").write_bytes(b"")
+
+    index = load_file_index(image_dir, refresh=False)
+    assert index.refresh() == 5
+    assert index.query(op="rotate", split="train", label="n00") == [
+        class_dir / "img_1.JPEG",
+        class_dir / "img_2.JPEG",
+    ]
+    assert index.query(op="resize") == [new_dir / "img_0.JPEG"]
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from image_aug_ml.augmentation.frequency.freq_filter import (
+    freq_filt,
+    freq_filt_batch,
+    freq_filt_half,
+    gaussian,
+    gaussian_cache,
+    gaussian_half,
+    gaussian_half_batch,
+    half_spectrum,
+)
+from image_aug_ml.utils import BufferPool
+
+
+def reference_freq_filt(orig_img: np.ndarray, transfer_func: np.ndarray) -> np.ndarray:
+    """Double precision complex FFT filter over the spatial axes."""
+    M, N = orig_img.shape[:2]
+    padded_img = np.pad(
+        orig_img.astype(np.float64),
+        ((M // 2, M - M // 2), (N // 2, N - N // 2), (0, 0)),
+    )
+    f_img = np.fft.fftshift(np.fft.fft2(padded_img, axes=(0, 1)), axes=(0, 1))
+    f_filtered = f_img * transfer_func[:, :, None]
+    filtered_img = np.real(
+        np.fft.ifft2(np.fft.ifftshift(f_filtered, axes=(0, 1)), axes=(0, 1))
+    )
+    filtered_img = filtered_img[M // 2 : M // 2 + M, N // 2 : N // 2 + N]
+    return (
+        255
+        * (filtered_img - filtered_img.min())
+        / (filtered_img.max() - filtered_img.min())
+    ).astype(np.uint8)
+
+
+@pytest.fixture(params=[(32, 48), (33, 27)])
+def image(request) -> np.ndarray:
+    return np.random.default_rng(0).integers(
+        0, 256, (*request.param, 3), dtype=np.uint8
+    )
+
+
+@pytest.mark.parametrize(
+    "make_transfer_func",
+    [
+        lambda dims: gaussian(dims, 5),
+        lambda dims: 1 - gaussian(dims, 12),
+        lambda dims: gaussian(dims, 20) - gaussian(dims, 4),
+    ],
+    ids=["lowpass", "highpass", "bandpass"],
+)
+def test_matches_complex_reference(image, make_transfer_func):
+    transfer_func = make_transfer_func((image.shape[0] * 2, image.shape[1] * 2))
+
+    result = freq_filt(image, transfer_func, workers=2)
+
+    difference = result.astype(int) - reference_freq_filt(image, transfer_func)
+    assert np.abs(difference).max() <= 1
+
+
+@pytest.mark.parametrize("dims", [(64, 96), (66, 54)])
+@pytest.mark.parametrize("cutoff_freq", [1, 7.3, 25])
+def test_gaussian_matches_direct_formula(dims, cutoff_freq):
+    m, n = [(dim - 1) / 2 for dim in dims]
+    yy, xx = np.ogrid[-m : m + 1, -n : n + 1]
+    tf = np.exp(-(xx ** 2 + yy ** 2) / (2 * cutoff_freq ** 2))
+    expected = (tf - tf.max()) / (tf.max() - tf.min())
+
+    np.testing.assert_allclose(gaussian(dims, cutoff_freq), expected, atol=1e-12)
+
+
+def test_gaussian_cache_snaps_cutoff():
+    gaussian_cache.clear()
+
+    first = gaussian((32, 32), 5.01, cutoff_quantum=0.1)
+    second = gaussian((32, 32), 4.99, cutoff_quantum=0.1)
+
+    assert first is second
+    assert gaussian_cache.stats()["hits"] == 1
+    np.testing.assert_allclose(first, gaussian((32, 32), 5.0), atol=1e-12)
+
+
+@pytest.mark.parametrize("cutoff_freq", [1, 7.3, 25])
+def test_gaussian_half_matches_half_spectrum(image, cutoff_freq):
+    dims = (image.shape[0] * 2, image.shape[1] * 2)
+    half_transfer_func = gaussian_half(dims, cutoff_freq)
+
+    np.testing.assert_allclose(
+        half_transfer_func, half_spectrum(gaussian(dims, cutoff_freq)), atol=1e-6
+    )
+    np.testing.assert_array_equal(
+        freq_filt_half(image, half_transfer_func),
+        freq_filt(image, gaussian(dims, cutoff_freq)),
+    )
+
+
+def test_gaussian_half_cache_snaps_cutoff():
+    gaussian_cache.clear()
+
+    first = gaussian_half((32, 32), 5.01, cutoff_quantum=0.1)
+    second = gaussian_half((32, 32), 4.99, cutoff_quantum=0.1)
+
+    assert first is second
+    assert first.shape == (32, 17)
+    assert gaussian_cache.stats()["hits"] == 1
+    np.testing.assert_array_equal(first, gaussian_half((32, 32), 5.0))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 16])
+def test_batch_matches_per_image(chunk_size):
+    images = np.random.default_rng(1).integers(0, 256, (3, 20, 30, 3), dtype=np.uint8)
+    cutoff_freqs = np.array([2.0, 7.5, 20.0])
+    dims = (40, 60)
+
+    result = freq_filt_batch(
+        images,
+        lambda chunk: 1 - gaussian_half_batch(dims, cutoff_freqs[chunk]),
+        chunk_size=chunk_size,
+    )
+
+    for batch_img, orig_img, cutoff_freq in zip(result, images, cutoff_freqs):
+        difference = batch_img.astype(int) - freq_filt(
+            orig_img, 1 - gaussian(dims, cutoff_freq)
+        )
+        assert np.abs(difference).max() <= 1
+
+
+def test_out_matches_allocating(image):
+    images = np.random.default_rng(2).integers(
+        0, 256, (3, *image.shape), dtype=np.uint8
+    )
+    dims = (2 * image.shape[0], 2 * image.shape[1])
+    cutoff_freqs = np.array([3.0, 9.0, 15.0])
+    workspace = BufferPool()
+
+    # padding buffer is reused, so each call relies on its border staying zero
+    out = np.full_like(image, 7)
+    for orig_img, cutoff_freq in zip(images, cutoff_freqs):
+        transfer_func = gaussian(dims, cutoff_freq)
+        result = freq_filt(orig_img, transfer_func, out=out, workspace=workspace)
+        assert result is out
+        np.testing.assert_array_equal(result, freq_filt(orig_img, transfer_func))
+
+    def make_transfer_funcs(chunk: slice) -> np.ndarray:
+        return gaussian_half_batch(dims, cutoff_freqs[chunk])
+
+    out_stack = np.full_like(images, 7)
+    for _ in range(2):
+        result = freq_filt_batch(
+            images,
+            make_transfer_funcs,
+            chunk_size=2,
+            out=out_stack,
+            workspace=workspace,
+        )
+        assert result is out_stack
+        np.testing.assert_array_equal(
+            result, freq_filt_batch(images, make_transfer_funcs, chunk_size=2)
+        )
@@ -0,0 +1,73 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+
+REPO_DIR = pathlib.Path(__file__).parents[1]
+
+# modules too slow to import at startup
+HEAVY_MODULES = ("tensorflow", "pandas", "plotly", "scipy")
+
+# wall time budget in seconds of each script's --help, including interpreter startup
+SCRIPT_BUDGETS = {
+    "augment.py": 2.0,
+    "benchmark.py": 2.0,
+    "classify.py": 2.0,
+    "evaluate.py": 2.0,
+    "gc_store.py": 2.0,
+    "plot_results.py": 2.0,
+}
+
+# runs a script's --help, then reports elapsed time and loaded heavy modules
+HELP_DRIVER = """
+import runpy, sys, time
+start = time.perf_counter()
+sys.argv = [sys.argv[1], "--help"]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy}))
+print(elapsed, *heavy, file=sys.stderr)
+"""
+
+
+def run_isolated(code: str, *args: str) -> subprocess.CompletedProcess:
+    """Runs code in a fresh interpreter from the repository root."""
+    return subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=REPO_DIR,
+        env={**os.environ, "PYTHONPATH": str(REPO_DIR)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.mark.parametrize("script", sorted(SCRIPT_BUDGETS))
+def test_script_help_within_budget(script):
+    result = run_isolated(
+        HELP_DRIVER.format(heavy=HEAVY_MODULES), str(REPO_DIR / "scripts" / script)
+    )
+    elapsed, *heavy_modules = result.stderr.split()
+
+    assert "usage:" in result.stdout
+    assert heavy_modules == []
+    assert float(elapsed) < SCRIPT_BUDGETS[script]
+
+
+def test_package_import_defers_ops():
+    result = run_isolated(
+        "import sys\n"
+        "import image_aug_ml.augmentation, image_aug_ml.classifier\n"
+        "print(*sorted(sys.modules))"
+    )
+    modules = result.stdout.split()
+
+    assert "image_aug_ml.augmentation.affine" not in modules
+    assert "image_aug_ml.augmentation.frequency" not in modules
+    assert not {module.split(".")[0] for module in modules} & set(HEAVY_MODULES)
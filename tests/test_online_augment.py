@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from image_aug_ml.classifier.online_augment import make_online_dataset  # noqa: E402
+
+
+AUGMENTATIONS = [
+    "image_aug_ml.augmentation.affine.flip_vertical",
+    "image_aug_ml.augmentation.affine.rotate",
+]
+
+
+def make_orig_dataset(num_imgs: int) -> tf.data.Dataset:
+    rng = np.random.default_rng(0)
+    imgs = rng.integers(0, 256, (num_imgs, 16, 16, 3)).astype(np.float32)
+    labels = tf.one_hot(np.arange(num_imgs) % 2, 2)
+    return tf.data.Dataset.from_tensor_slices((imgs, labels)).batch(4)
+
+
+def test_online_dataset_holds_original_and_augmented_copies():
+    online_ds = make_online_dataset(
+        make_orig_dataset(6), AUGMENTATIONS, 6, batch_size=5, shuffle_buffer=1
+    )
+    assert tf.data.experimental.cardinality(online_ds).numpy() == 4
+
+    imgs, labels = map(np.concatenate, zip(*online_ds.as_numpy_iterator()))
+    assert imgs.shape == (18, 16, 16, 3) and labels.shape == (18, 2)
+
+    # vertical flip copy follows each original
+    np.testing.assert_array_equal(imgs[1::3], imgs[0::3][:, ::-1])
+    np.testing.assert_array_equal(labels[1::3], labels[0::3])
+
+
+def test_online_dataset_redraws_each_epoch():
+    online_ds = make_online_dataset(
+        make_orig_dataset(4), AUGMENTATIONS[1:], 4, shuffle_buffer=1
+    )
+    epochs = [np.concatenate([imgs for imgs, _ in online_ds]) for _ in range(2)]
+    assert not np.array_equal(epochs[0][1::2], epochs[1][1::2])
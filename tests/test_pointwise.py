@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from image_aug_ml.augmentation.intensity import hist_eq, invert, pointwise
+from image_aug_ml.augmentation.intensity.pointwise import channel_hists
+
+
+def reference_hist_eq(orig_img: np.ndarray) -> np.ndarray:
+    """Histogram equalization by the combined histogram of all channels."""
+    hist_arr = np.bincount(orig_img.ravel())
+    cum_hist_arr = np.cumsum(hist_arr / np.sum(hist_arr))
+    return np.floor(255 * cum_hist_arr).astype(np.uint8)[orig_img]
+
+
+@pytest.fixture
+def image() -> np.ndarray:
+    # give channels different ranges, so per-channel tables differ
+    image = np.random.default_rng(0).integers(0, 256, (23, 17, 3), dtype=np.uint8)
+    return image // np.array([1, 3, 7], dtype=np.uint8)
+
+
+def test_channel_hists_match_bincount(image):
+    hists = channel_hists(image)
+
+    assert hists.shape == (3, 256)
+    for channel, hist in enumerate(hists):
+        np.testing.assert_array_equal(
+            hist, np.bincount(image[..., channel].ravel(), minlength=256)
+        )
+
+
+def test_hist_eq_matches_reference(image):
+    np.testing.assert_array_equal(hist_eq(image), reference_hist_eq(image))
+
+
+def test_per_channel_hist_eq_equalizes_each_channel(image):
+    result = hist_eq(image, per_channel=True)
+
+    for channel in range(image.shape[-1]):
+        np.testing.assert_array_equal(
+            result[..., channel], reference_hist_eq(image[..., channel])
+        )
+
+
+@pytest.mark.parametrize(
+    "ops, op_kwargs, reference",
+    [
+        (["invert", "hist_eq"], None, lambda img: hist_eq(invert(img))),
+        (["hist_eq", "invert"], None, lambda img: invert(hist_eq(img))),
+        (["invert", "invert"], None, lambda img: img),
+        (
+            ["invert", "hist_eq"],
+            {"hist_eq": {"per_channel": True}},
+            lambda img: hist_eq(invert(img), per_channel=True),
+        ),
+        (
+            ["hist_eq", "invert", "hist_eq"],
+            {"hist_eq": {"per_channel": True}},
+            lambda img: hist_eq(invert(hist_eq(img, True)), True),
+        ),
+    ],
+)
+def test_fused_matches_chained(image, ops, op_kwargs, reference):
+    np.testing.assert_array_equal(
+        pointwise(image, ops, op_kwargs), reference(image.copy())
+    )
+
+
+def test_out_matches_allocating(image):
+    out = np.full_like(image, 7)
+
+    result = pointwise(image, ["hist_eq"], {"hist_eq": {"per_channel": True}}, out=out)
+    assert result is out
+    np.testing.assert_array_equal(result, hist_eq(image, per_channel=True))
+
+
+def test_unknown_op_rejected(image):
+    with pytest.raises(AssertionError):
+        pointwise(image, ["gamma"])
@@ -0,0 +1,78 @@
+import csv
+import json
+
+import pytest
+
+from image_aug_ml.augmentation import augment_images
+from image_aug_ml.utils import Profiler, profile
+from image_aug_ml.utils.profiler import NULL_TIMER
+
+from tests.test_augment import AUGMENTATION_CONF, make_image_dir, read_outputs
+
+
+def test_profile_accumulates_stage_counters():
+    profiler = Profiler()
+    for _ in range(3):
+        with profile(profiler, "encode", items=2) as timer:
+            timer.num_bytes = 10
+
+    assert profiler.stats["encode"][:2] == [3, 6]
+    assert profiler.stats["encode"][3] == 30
+
+    # merging adds counters of each stage
+    profiler.merge({"encode": [1, 1, 0.5, 5], "write": [1, 1, 0.25, 5]})
+    assert profiler.stats["encode"][:2] == [4, 7]
+    assert profiler.stats["write"] == [1, 1, 0.25, 5]
+
+
+def test_profile_is_noop_when_off():
+    with profile(None, "encode") as timer:
+        timer.num_bytes = 10
+    assert timer is NULL_TIMER
+
+
+def test_summary_saved_as_json_and_csv(tmp_path):
+    profiler = Profiler({"op/rotate": [2, 4, 2.0, 2 ** 21], "read": [1, 4, 0.5, 8]})
+    assert profiler.op_throughput() == "rotate 2.0/s"
+
+    profiler.save(tmp_path / "profile.json")
+    rows = json.loads((tmp_path / "profile.json").read_text())
+    assert [row["stage"] for row in rows] == ["op/rotate", "read"]
+    assert rows[0]["mb_per_s"] == 1.0
+
+    profiler.save(tmp_path / "profile.csv")
+    with open(tmp_path / "profile.csv", newline="") as profile_file:
+        csv_rows = list(csv.DictReader(profile_file))
+    assert [row["stage"] for row in csv_rows] == ["op/rotate", "read"]
+    assert float(csv_rows[1]["items_per_s"]) == 8.0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_augment_images_profiles_stages(tmp_path, workers):
+    outputs = []
+    profiler = Profiler()
+    for profile_run in (False, True):
+        image_dir = make_image_dir(tmp_path / f"profile_{profile_run}")
+        augment_images(
+            AUGMENTATION_CONF,
+            image_dir,
+            workers=workers,
+            chunk_size=3,
+            seed=1234,
+            profiler=profiler if profile_run else None,
+        )
+        outputs.append(read_outputs(image_dir))
+
+    # profiling does not change outputs
+    assert outputs[0] == outputs[1]
+
+    # every image is read and decoded once, and every output encoded and written
+    stats = profiler.stats
+    for stage in ("read", "decode"):
+        assert stats[stage][1] == 7
+    for stage in ("op/rotate", "op/bandpass", "op/resize_translate"):
+        assert stats[stage][:2] == [7, 7]
+    for stage in ("mkdir", "encode", "write"):
+        assert stats[stage][1] == 7 * 3
+    assert stats["encode"][3] == stats["write"][3] > 0
+    assert stats["run"][:2] == [1, 7]
@@ -0,0 +1,120 @@
+import importlib.metadata
+
+import pytest
+
+from image_aug_ml.augmentation import (
+    load_augment_op,
+    load_batch_augment_op,
+    load_tf_augment_op,
+    register_op,
+    resolve_op_path,
+    resolve_tf_op_path,
+)
+from image_aug_ml.augmentation import registry
+from image_aug_ml.augmentation.affine import rotate, rotate_batch
+from image_aug_ml.augmentation.intensity import invert
+from image_aug_ml.augmentation.loader import augment_op_key
+
+
+def tf_negative(imgs, max_value=255):
+    """Stands in for a TensorFlow op, without importing TensorFlow."""
+    return max_value - imgs
+
+
+def test_short_name_loads_builtin_op():
+    assert load_augment_op("rotate") == ("rotate", rotate)
+    assert load_batch_augment_op("rotate") is rotate_batch
+
+    augment_name, augment_op = load_augment_op(
+        {"quarter_turn": {"op": "rotate", "max_theta": 90}}
+    )
+    assert augment_name == "quarter_turn"
+    assert augment_op.func is rotate
+
+
+def test_short_name_shares_op_key_with_path():
+    assert augment_op_key("rotate") == augment_op_key(
+        "image_aug_ml.augmentation.affine.rotate"
+    )
+    assert augment_op_key(
+        {"small": {"op": "rotate", "max_theta": 10}}
+    ) == augment_op_key(
+        {"other": {"op": "image_aug_ml.augmentation.affine.rotate", "max_theta": 10}}
+    )
+
+
+def test_registered_op_resolved(monkeypatch):
+    monkeypatch.setattr(registry, "registered_ops", {})
+    register_op("negative", "image_aug_ml.augmentation.intensity.invert")
+
+    assert load_augment_op("negative") == ("negative", invert)
+
+
+def test_entry_point_op_resolved(monkeypatch):
+    entry_point = importlib.metadata.EntryPoint(
+        "negative",
+        "image_aug_ml.augmentation.intensity:invert",
+        registry.ENTRY_POINT_GROUP,
+    )
+    monkeypatch.setattr(
+        importlib.metadata,
+        "entry_points",
+        lambda: importlib.metadata.EntryPoints([entry_point]),
+    )
+    registry.entry_point_ops.cache_clear()
+
+    try:
+        assert resolve_op_path("negative") == (
+            "image_aug_ml.augmentation.intensity.invert"
+        )
+        assert load_augment_op("negative") == ("negative", invert)
+    finally:
+        registry.entry_point_ops.cache_clear()
+
+
+def test_registered_tf_op_resolved(monkeypatch):
+    monkeypatch.setattr(registry, "registered_ops", {})
+    monkeypatch.setattr(registry, "registered_tf_ops", {})
+    register_op(
+        "negative",
+        "image_aug_ml.augmentation.intensity.invert",
+        "tests.test_registry.tf_negative",
+    )
+
+    assert load_tf_augment_op("negative") is tf_negative
+    tf_op = load_tf_augment_op({"neg": {"op": "negative", "max_value": 1}})
+    assert tf_op.func is tf_negative and tf_op.keywords == {"max_value": 1}
+
+    # registering op again without a variant drops it
+    register_op("negative", "image_aug_ml.augmentation.intensity.invert")
+    assert resolve_tf_op_path("negative") is None
+
+
+def test_entry_point_tf_op_resolved(monkeypatch):
+    entry_points = [
+        importlib.metadata.EntryPoint(
+            "negative",
+            "image_aug_ml.augmentation.intensity:invert",
+            registry.ENTRY_POINT_GROUP,
+        ),
+        importlib.metadata.EntryPoint(
+            "negative", "tests.test_registry:tf_negative", registry.TF_ENTRY_POINT_GROUP
+        ),
+    ]
+    monkeypatch.setattr(
+        importlib.metadata,
+        "entry_points",
+        lambda: importlib.metadata.EntryPoints(entry_points),
+    )
+    registry.entry_point_ops.cache_clear()
+
+    try:
+        assert resolve_tf_op_path("negative") == "tests.test_registry.tf_negative"
+        assert load_tf_augment_op("negative") is tf_negative
+    finally:
+        registry.entry_point_ops.cache_clear()
+
+
+def test_unknown_op_rejected():
+    with pytest.raises(AssertionError):
+        resolve_op_path("not_an_op")
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from image_aug_ml.augmentation import IOConf, augment_images  # noqa: E402
+from image_aug_ml.classifier.shard_dataset import make_shard_dataset  # noqa: E402
+from image_aug_ml.utils import EncodeConf  # noqa: E402
+
+from tests.test_augment import make_image_dir  # noqa: E402
+
+
+def test_shard_dataset_round_trip(tmp_path):
+    # pack lossless outputs, and save the same outputs to files to compare against
+    conf = {"augmentations": ["image_aug_ml.augmentation.affine.rotate"]}
+    for image_dir, max_shard_bytes in (("files", None), ("shards", 4096)):
+        augment_images(
+            conf,
+            make_image_dir(tmp_path / image_dir),
+            batch_size=3,
+            seed=1,
+            io_conf=IOConf(
+                encode_conf=EncodeConf("png"), max_shard_bytes=max_shard_bytes
+            ),
+        )
+
+    class_names = ["n00", "n01"]
+    expected = []
+    for img_path in sorted((tmp_path / "files" / "rotate" / "train").glob("*/*.png")):
+        img = cv2.cvtColor(cv2.imread(str(img_path)), cv2.COLOR_BGR2RGB)
+        expected.append(
+            (
+                class_names.index(img_path.parent.name),
+                tf.image.resize(img, [24, 32]).numpy(),
+            )
+        )
+
+    shard_ds = make_shard_dataset(
+        tmp_path / "shards" / "rotate" / "train", class_names, [24, 32], batch_size=4
+    )
+    assert tf.data.experimental.cardinality(shard_ds).numpy() == 2
+
+    # records are interleaved from shards in any order, so match them up by pixels
+    loaded = [
+        (int(np.argmax(label)), img)
+        for imgs, labels in shard_ds.as_numpy_iterator()
+        for img, label in zip(imgs, labels)
+    ]
+    assert len(loaded) == len(expected)
+    for label, img in expected:
+        matches = [
+            loaded_label
+            for loaded_label, loaded_img in loaded
+            if np.array_equal(loaded_img, img)
+        ]
+        assert matches == [label]
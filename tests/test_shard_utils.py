@@ -0,0 +1,73 @@
+import os
+
+from image_aug_ml.utils import (
+    ShardWriter,
+    compact_shards,
+    has_shards,
+    intact_records,
+    load_shard_index,
+    read_shard_record,
+)
+
+
+def test_records_round_trip(tmp_path):
+    shard_writer = ShardWriter(tmp_path, max_shard_bytes=250)
+    payloads = {f"rec_{idx}": bytes([idx]) * (20 + idx) for idx in range(20)}
+    for key, payload in payloads.items():
+        shard_writer.append(payload, {"key": key, "label": "n00"})
+
+    # records of full shards are indexed, those of the open shard once flushed
+    assert has_shards(tmp_path)
+    assert len(load_shard_index(tmp_path)) < len(payloads)
+    shard_writer.close()
+
+    # records span several capped shards
+    index_entries = load_shard_index(tmp_path)
+    assert len({index_entry["shard"] for index_entry in index_entries}) > 1
+    assert {
+        index_entry["key"]: read_shard_record(index_entry)
+        for index_entry in index_entries
+    } == payloads
+
+
+def test_later_records_supersede(tmp_path):
+    for payload in (b"old", b"new"):
+        shard_writer = ShardWriter(tmp_path)
+        shard_writer.append(payload, {"key": "rec"})
+        shard_writer.close()
+
+    (index_entry,) = load_shard_index(tmp_path)
+    assert read_shard_record(index_entry) == b"new"
+
+
+def test_compaction_drops_superseded_records(tmp_path):
+    for payload in (b"old" * 10, b"new" * 10):
+        shard_writer = ShardWriter(tmp_path)
+        for key in ("rec_0", "rec_1"):
+            shard_writer.append(payload, {"key": key, "label": "n00"})
+        shard_writer.close()
+
+    # half of the shard bytes are stale, which is not yet worth rewriting
+    assert not compact_shards(tmp_path, max_stale_fraction=0.5)
+    assert compact_shards(tmp_path, max_stale_fraction=0.25)
+
+    index_entries = load_shard_index(tmp_path)
+    assert len(list(tmp_path.glob("*.shard"))) == 1
+    assert {
+        index_entry["key"]: (index_entry["label"], read_shard_record(index_entry))
+        for index_entry in index_entries
+    } == {"rec_0": ("n00", b"new" * 10), "rec_1": ("n00", b"new" * 10)}
+
+
+def test_truncated_shard_records_not_intact(tmp_path):
+    shard_writer = ShardWriter(tmp_path)
+    for key in ("rec_0", "rec_1"):
+        shard_writer.append(b"0" * 10, {"key": key})
+    shard_writer.close()
+
+    (shard_path,) = tmp_path.glob("*.shard")
+    os.truncate(shard_path, shard_path.stat().st_size - 1)
+    assert [index_entry["key"] for index_entry in intact_records(tmp_path)] == ["rec_0"]
+
+    shard_path.unlink()
+    assert intact_records(tmp_path) == []
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+from image_aug_ml.augmentation import load_tf_augment_op  # noqa: E402
+from image_aug_ml.augmentation.affine import tf_ops as affine_tf  # noqa: E402
+from image_aug_ml.augmentation.affine.affine_transform import (  # noqa: E402
+    affine_transform_batch,
+)
+from image_aug_ml.augmentation.affine.rotate import rotate_mats  # noqa: E402
+from image_aug_ml.augmentation.affine.resize import resize_mats  # noqa: E402
+from image_aug_ml.augmentation.frequency import tf_ops as freq_tf  # noqa: E402
+from image_aug_ml.augmentation.frequency.freq_filter import (  # noqa: E402
+    freq_filt_batch,
+    gaussian_half_batch,
+)
+from image_aug_ml.augmentation.intensity import amf, hist_eq, invert  # noqa: E402
+from image_aug_ml.augmentation.intensity import tf_ops as intensity_tf  # noqa: E402
+from image_aug_ml.utils import use_rng  # noqa: E402
+
+
+@pytest.fixture(params=[(24, 32), (17, 15)])
+def images(request) -> np.ndarray:
+    return np.random.default_rng(0).integers(
+        0, 256, (3, *request.param, 3), dtype=np.uint8
+    )
+
+
+def mismatch_fraction(result: np.ndarray, expected: np.ndarray, atol: int) -> float:
+    difference = np.abs(result.astype(int) - expected.astype(int))
+    return np.mean(difference > atol)
+
+
+@pytest.mark.parametrize("make_mats", [rotate_mats, resize_mats])
+@pytest.mark.parametrize("interpolation", ["nearest", "bilinear"])
+def test_affine_transform_matches_numpy(images, make_mats, interpolation):
+    with use_rng(np.random.default_rng(1)):
+        transform_mats = make_mats(images.shape[1:], len(images))
+
+    expected = affine_transform_batch(images, transform_mats, interpolation)
+    result = affine_tf.affine_transform(
+        tf.constant(images), tf.constant(transform_mats), interpolation
+    ).numpy()
+
+    # single precision coordinates may round the other way on pixel boundaries
+    assert result.dtype == np.uint8
+    assert mismatch_fraction(result, expected, atol=1) < 0.01
+
+
+@pytest.mark.parametrize("op_name", ["flip_vertical", "flip_horizontal"])
+def test_flips_match_numpy(images, op_name):
+    from image_aug_ml.augmentation import affine
+
+    np_op, tf_op = getattr(affine, op_name), getattr(affine_tf, op_name)
+
+    expected = np.stack([np_op(img) for img in images])
+    np.testing.assert_array_equal(tf_op(tf.constant(images)).numpy(), expected)
+
+
+@pytest.mark.parametrize("op_name", ["resize", "rotate", "translate", "compose"])
+def test_random_affine_ops_keep_shape(images, op_name):
+    result = getattr(affine_tf, op_name)(tf.constant(images))
+    assert result.shape == images.shape and result.dtype == tf.uint8
+
+
+def test_invert_matches_numpy(images):
+    expected = np.stack([invert(img) for img in images])
+    result = intensity_tf.invert(tf.constant(images)).numpy()
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("per_channel", [False, True])
+def test_hist_eq_matches_numpy(images, per_channel):
+    # give channels different ranges, so per-channel tables differ
+    images = images // np.array([1, 2, 4], dtype=np.uint8)
+
+    expected = np.stack([hist_eq(img, per_channel) for img in images])
+    result = intensity_tf.hist_eq(tf.constant(images), per_channel).numpy()
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("centered", [False, True])
+def test_amf_matches_numpy(images, centered):
+    # salt and pepper noise makes kernels grow
+    noisy = images.copy()
+    noise = np.random.default_rng(2).random(noisy.shape)
+    noisy[noise < 0.1], noisy[noise > 0.9] = 0, 255
+
+    expected = np.stack([amf(img, 3, 7, centered) for img in noisy])
+    result = intensity_tf.amf(tf.constant(noisy), 3, 7, centered).numpy()
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize(
+    "make_transfer_funcs",
+    [
+        lambda gaussians, dims: gaussians(dims, [5, 12, 20]),
+        lambda gaussians, dims: 1 - gaussians(dims, [2, 9, 25]),
+        lambda gaussians, dims: gaussians(dims, [10, 15, 20])
+        - gaussians(dims, [3, 7, 12]),
+    ],
+    ids=["lowpass", "highpass", "bandpass"],
+)
+def test_freq_filt_matches_numpy(images, make_transfer_funcs):
+    dims = (images.shape[1] * 2, images.shape[2] * 2)
+
+    expected = freq_filt_batch(
+        images, lambda chunk: make_transfer_funcs(gaussian_half_batch, dims)[chunk]
+    )
+    result = freq_tf.freq_filt(
+        tf.constant(images), make_transfer_funcs(freq_tf.gaussian_half_batch, dims)
+    ).numpy()
+
+    difference = result.astype(int) - expected
+    assert np.abs(difference).max() <= 1
+
+
+@pytest.mark.parametrize("op_name", ["lowpass", "highpass", "bandpass"])
+def test_random_freq_ops_keep_shape(images, op_name):
+    result = getattr(freq_tf, op_name)(tf.constant(images))
+    assert result.shape == images.shape and result.dtype == tf.uint8
+
+
+def test_loads_tf_variant_under_same_name():
+    assert (
+        load_tf_augment_op("image_aug_ml.augmentation.intensity.invert")
+        is intensity_tf.invert
+    )
+
+    # keyword arguments only the NumPy op takes are dropped
+    amf_op = load_tf_augment_op(
+        {"amf": {"op": "image_aug_ml.augmentation.intensity.amf", "backend": "sort"}}
+    )
+    assert amf_op.keywords == {}
+    lowpass_op = load_tf_augment_op(
+        {"lp": {"op": "image_aug_ml.augmentation.frequency.lowpass", "workers": 2}}
+    )
+    assert lowpass_op.func is freq_tf.lowpass and lowpass_op.keywords == {}